@@ -0,0 +1,358 @@
+/**
+ * Headless label renderer for Node
+ *
+ * Renders the same label templates as the editor (the fields of
+ * PrintHistoryItem) without a browser, using @napi-rs/canvas for the
+ * 2D context. Text and icons are placed with the editor's layout helpers
+ * (labelLayout, textFit), so a template prints as it previews. Output is
+ * packed 1-bit rows already rotated for the print head, ready for the
+ * ESC/POS encoder.
+ */
+
+import JsBarcode from 'jsbarcode';
+import QRCode from 'qrcode';
+import type { PrintHistoryItem } from '../src/lib/printHistory';
+import { packPixels } from '../src/lib/escpos';
+import {
+  TEXT_ICON_GAP,
+  firstBaseline,
+  getFitBox,
+  getIconScaleFactor,
+  placeTextIcon,
+  textIconFitOptions
+} from '../src/lib/labelLayout';
+import { DEFAULT_LINE_HEIGHT, MeasureContext, TextMeasurer, fitText } from '../src/lib/textFit';
+
+type CanvasModule = typeof import('@napi-rs/canvas');
+type Canvas = import('@napi-rs/canvas').Canvas;
+type Context = import('@napi-rs/canvas').SKRSContext2D;
+
+/**
+ * A label job: the fields stored in print history, with dimensions optional
+ */
+export type LabelTemplate = Omit<PrintHistoryItem, 'id' | 'timestamp' | 'previewDataUrl' | 'dimensions' | 'autoWidth'> & {
+  dimensions?: Partial<PrintHistoryItem['dimensions']>;
+  autoWidth?: boolean;
+  minWidthMm?: number;
+  imagePath?: string; // Alternative to imageDataUrl for local files (CLI only, the spooler rejects it)
+};
+
+interface FittedTemplate {
+  template: LabelTemplate; // With the solved font and icon sizes
+  lines?: string[]; // Line breaks chosen by the fit solver
+}
+
+export interface RenderedLabel {
+  raster: Uint8Array;
+  bytesPerRow: number;
+  widthPx: number; // Preview orientation (along the tape)
+  heightPx: number;
+  widthMm: number;
+}
+
+// Same defaults as the editor
+const DEFAULT_DIMENSIONS = { widthMm: 40, heightMm: 12, pixelsPerMm: 8 };
+const DEFAULT_MIN_WIDTH_MM = 20;
+
+let canvasModule: Promise<CanvasModule> | null = null;
+let measurer: TextMeasurer | null = null; // Shared so batches reuse cached metrics
+
+/**
+ * Load the optional canvas backend
+ */
+export function loadCanvas(): Promise<CanvasModule> {
+  canvasModule ??= import('@napi-rs/canvas').catch(() => {
+    throw new Error('Headless rendering requires @napi-rs/canvas (npm install @napi-rs/canvas)');
+  });
+  return canvasModule;
+}
+
+/**
+ * Register every font file in a directory so templates can reference it
+ */
+export async function registerFonts(dir: string): Promise<number> {
+  const { GlobalFonts } = await loadCanvas();
+  return GlobalFonts.loadFontsFromDir(dir);
+}
+
+function textFont(template: LabelTemplate, fontSize?: number): string {
+  if (template.tab === 'texticon') {
+    const fontStyle = template.textIconItalic ? 'italic' : 'normal';
+    const fontVariant = template.textIconSmallCaps ? 'small-caps' : 'normal';
+    const family = template.textIconFont?.family ?? 'Arial';
+    return `${fontStyle} ${fontVariant} ${template.textIconFontWeight ?? 400} ${fontSize ?? template.textIconFontSize ?? 120}px ${family}`;
+  }
+  return `${fontSize ?? template.fontSize ?? 120}px ${template.selectedFont?.family ?? 'Arial'}`;
+}
+
+function displayText(template: LabelTemplate): string {
+  if (template.tab === 'texticon') {
+    const text = template.textIconText ?? '';
+    return template.textIconAllCaps ? text.toUpperCase() : text;
+  }
+  return template.text ?? '';
+}
+
+function isAutoWidth(template: LabelTemplate): boolean {
+  return template.autoWidth ?? template.dimensions?.widthMm === undefined;
+}
+
+/**
+ * Replace the font size (and icon size) of a fitText template with the
+ * largest one that fits the label, so variable-length fields size themselves
+ */
+function fitTemplate(ctx: Context, template: LabelTemplate, heightMm: number, pixelsPerMm: number): FittedTemplate {
+  if (!template.fitText || (template.tab !== 'text' && template.tab !== 'texticon')) {
+    return { template };
+  }
+
+  measurer ??= new TextMeasurer(ctx as unknown as MeasureContext);
+  const widthMm = template.dimensions?.widthMm ?? DEFAULT_DIMENSIONS.widthMm;
+  const box = getFitBox(widthMm, heightMm, pixelsPerMm, isAutoWidth(template));
+  const font = (size: number) => textFont(template, size);
+
+  if (template.tab === 'text') {
+    const fitted = fitText(measurer, displayText(template), font, box);
+    return { template: { ...template, fontSize: fitted.fontSize }, lines: fitted.lines };
+  }
+
+  // The icon keeps its size relative to the font
+  const fontSize = template.textIconFontSize ?? 120;
+  const iconSize = template.textIconIconSize ?? 120;
+  const iconRatio = template.textIconIconSvg ? (iconSize * getIconScaleFactor(template.textIconIconSvg)) / fontSize : 0;
+  const fitted = fitText(measurer, displayText(template), font, textIconFitOptions(box, iconRatio));
+  return {
+    template: {
+      ...template,
+      textIconFontSize: fitted.fontSize,
+      textIconIconSize: iconSize * (fitted.fontSize / fontSize)
+    }
+  };
+}
+
+/**
+ * Label width along the tape, following the editor's auto-width rules
+ */
+function resolveWidthMm(ctx: Context, template: LabelTemplate, heightMm: number, pixelsPerMm: number): number {
+  if (!isAutoWidth(template)) {
+    return template.dimensions?.widthMm ?? DEFAULT_DIMENSIONS.widthMm;
+  }
+
+  const minWidthMm = template.minWidthMm ?? DEFAULT_MIN_WIDTH_MM;
+  let contentWidthPx = 0;
+
+  switch (template.tab) {
+    case 'text':
+      ctx.font = textFont(template);
+      contentWidthPx = Math.max(...displayText(template).split('\n').map(line => ctx.measureText(line).width));
+      break;
+    case 'texticon': {
+      ctx.font = textFont(template);
+      const iconSize = template.textIconIconSize ?? 120;
+      // Fitted: the drawn icon plus its gap, as the editor's fit solver counts it
+      const iconWidth = template.fitText && template.textIconIconSvg
+        ? iconSize * getIconScaleFactor(template.textIconIconSvg) * (1 + TEXT_ICON_GAP)
+        : iconSize;
+      contentWidthPx = ctx.measureText(displayText(template)).width + iconWidth;
+      break;
+    }
+    case 'icons':
+    case 'qr':
+      contentWidthPx = heightMm * pixelsPerMm;
+      break;
+    case 'barcode':
+      contentWidthPx = Math.max((template.barcodeData ?? '').length * 12, 100);
+      break;
+    case 'image':
+      contentWidthPx = minWidthMm * pixelsPerMm;
+      break;
+  }
+
+  return Math.max(Math.ceil(contentWidthPx / pixelsPerMm), minWidthMm);
+}
+
+/**
+ * Draw lines centered on their actual bounds (as CanvasRenderer.drawText)
+ */
+function drawTextLines(ctx: Context, lines: string[], fontSize: number, width: number, height: number): void {
+  const startY = firstBaseline(ctx as unknown as MeasureContext, lines, fontSize, DEFAULT_LINE_HEIGHT);
+
+  ctx.fillStyle = 'black';
+  ctx.textAlign = 'center';
+  ctx.textBaseline = 'alphabetic';
+  lines.forEach((line, i) => {
+    ctx.fillText(line, width / 2, height / 2 + startY + i * fontSize * DEFAULT_LINE_HEIGHT);
+  });
+}
+
+async function drawSvg(
+  lib: CanvasModule,
+  ctx: Context,
+  svg: string,
+  x: number,
+  y: number,
+  size: number
+): Promise<{ width: number; height: number }> {
+  const img = await lib.loadImage(Buffer.from(svg));
+  const aspectRatio = img.width / img.height;
+  const drawWidth = aspectRatio >= 1 ? size : size * aspectRatio;
+  const drawHeight = aspectRatio >= 1 ? size / aspectRatio : size;
+  ctx.drawImage(img, x, y - drawHeight / 2, drawWidth, drawHeight);
+  return { width: drawWidth, height: drawHeight };
+}
+
+/**
+ * Image bytes of a template: the local file, or the decoded data URL
+ *
+ * Data URLs are decoded here rather than handed to loadImage, which would
+ * also accept a file path or a remote URL in their place.
+ */
+function imageSource(template: LabelTemplate): string | Buffer | null {
+  if (template.imagePath) return template.imagePath;
+  if (!template.imageDataUrl) return null;
+
+  const match = /^data:[^,]*?(;base64)?,(.*)$/s.exec(template.imageDataUrl);
+  if (!match) {
+    throw new Error('imageDataUrl must be a data: URL');
+  }
+  return match[1] ? Buffer.from(match[2], 'base64') : Buffer.from(decodeURIComponent(match[2]));
+}
+
+async function drawLabel(lib: CanvasModule, canvas: Canvas, { template, lines }: FittedTemplate): Promise<void> {
+  const ctx = canvas.getContext('2d');
+  const { width, height } = canvas;
+
+  ctx.fillStyle = 'white';
+  ctx.fillRect(0, 0, width, height);
+
+  switch (template.tab) {
+    case 'text':
+      ctx.font = textFont(template);
+      drawTextLines(ctx, lines ?? displayText(template).split('\n'), template.fontSize ?? 120, width, height);
+      break;
+
+    case 'texticon': {
+      ctx.font = textFont(template);
+      const text = displayText(template);
+      const textWidth = ctx.measureText(text).width;
+      const iconSvg = template.textIconIconSvg;
+      const img = iconSvg ? await lib.loadImage(Buffer.from(iconSvg)) : null;
+      const placement = img && iconSvg
+        ? placeTextIcon(textWidth, img.width, img.height, template.textIconIconSize ?? 120, getIconScaleFactor(iconSvg))
+        : null;
+
+      // One line, centered on its actual bounds like drawText
+      const baseline = firstBaseline(ctx as unknown as MeasureContext, [text], template.textIconFontSize ?? 120, DEFAULT_LINE_HEIGHT);
+      ctx.fillStyle = 'black';
+      ctx.textAlign = 'left';
+      ctx.textBaseline = 'alphabetic';
+      ctx.fillText(text, width / 2 + (placement?.textX ?? -textWidth / 2), height / 2 + baseline);
+
+      if (img && placement) {
+        const { x, y, width: drawWidth, height: drawHeight } = placement.icon;
+        ctx.drawImage(img, width / 2 + x, height / 2 + y, drawWidth, drawHeight);
+      }
+      break;
+    }
+
+    case 'icons': {
+      if (!template.selectedIcon) break;
+      const iconSize = Math.min(width, height) * 0.6;
+      const yOffset = template.iconLabel ? -20 : 0;
+      await drawSvg(lib, ctx, template.selectedIcon.svg, (width - iconSize) / 2, height / 2 + yOffset, iconSize);
+      if (template.iconLabel) {
+        ctx.fillStyle = 'black';
+        ctx.font = '16px Arial';
+        ctx.textAlign = 'center';
+        ctx.textBaseline = 'top';
+        ctx.fillText(template.iconLabel, width / 2, height / 2 + iconSize / 2 + yOffset + 10);
+      }
+      break;
+    }
+
+    case 'barcode': {
+      if (!template.barcodeData) break;
+      const barcode = lib.createCanvas(1, 1);
+      // JsBarcode only draws through getContext('2d'), which @napi-rs/canvas provides
+      JsBarcode(barcode as unknown as HTMLCanvasElement, template.barcodeData, {
+        format: 'CODE128',
+        width: 2,
+        height: Math.floor(height * 0.7),
+        displayValue: true,
+        fontSize: 14,
+        margin: 10,
+      });
+      const scale = Math.min((width * 0.9) / barcode.width, (height * 0.9) / barcode.height);
+      const drawWidth = barcode.width * scale;
+      const drawHeight = barcode.height * scale;
+      ctx.drawImage(barcode, (width - drawWidth) / 2, (height - drawHeight) / 2, drawWidth, drawHeight);
+      break;
+    }
+
+    case 'qr': {
+      if (!template.qrData) break;
+      // Draw modules directly, no intermediate image needed
+      const qr = QRCode.create(template.qrData, { errorCorrectionLevel: 'M' });
+      const margin = 2;
+      const size = Math.min(width, height) * 0.8;
+      const moduleSize = size / (qr.modules.size + margin * 2);
+      const originX = (width - size) / 2 + margin * moduleSize;
+      const originY = (height - size) / 2 + margin * moduleSize;
+      ctx.fillStyle = 'black';
+      for (let row = 0; row < qr.modules.size; row++) {
+        for (let col = 0; col < qr.modules.size; col++) {
+          if (qr.modules.get(row, col)) {
+            ctx.fillRect(originX + col * moduleSize, originY + row * moduleSize, moduleSize, moduleSize);
+          }
+        }
+      }
+      break;
+    }
+
+    case 'image': {
+      const source = imageSource(template);
+      if (!source) break;
+      const img = await lib.loadImage(source);
+      const scale = Math.min(width / img.width, height / img.height) * 0.9;
+      const drawWidth = img.width * scale;
+      const drawHeight = img.height * scale;
+      ctx.drawImage(img, (width - drawWidth) / 2, (height - drawHeight) / 2, drawWidth, drawHeight);
+      break;
+    }
+  }
+}
+
+/**
+ * Render a template to packed printer rows
+ */
+export async function renderLabel(input: LabelTemplate): Promise<RenderedLabel> {
+  const lib = await loadCanvas();
+  const { heightMm, pixelsPerMm } = { ...DEFAULT_DIMENSIONS, ...input.dimensions };
+  const heightPx = Math.round(heightMm * pixelsPerMm);
+
+  const scratch = lib.createCanvas(1, 1).getContext('2d');
+  const fitted = fitTemplate(scratch, input, heightMm, pixelsPerMm);
+  const widthMm = resolveWidthMm(scratch, fitted.template, heightMm, pixelsPerMm);
+
+  // Ensure width is multiple of 8 for proper byte alignment
+  const widthPx = Math.ceil(Math.round(widthMm * pixelsPerMm) / 8) * 8;
+
+  const canvas = lib.createCanvas(widthPx, heightPx);
+  await drawLabel(lib, canvas, fitted);
+
+  // Rotate 90° clockwise for the print head
+  const rotated = lib.createCanvas(heightPx, widthPx);
+  const rctx = rotated.getContext('2d');
+  rctx.translate(heightPx / 2, widthPx / 2);
+  rctx.rotate(Math.PI / 2);
+  rctx.drawImage(canvas, -widthPx / 2, -heightPx / 2);
+
+  const pixels = rctx.getImageData(0, 0, heightPx, widthPx).data;
+  return {
+    raster: packPixels(pixels, heightPx, widthPx),
+    bytesPerRow: Math.ceil(heightPx / 8),
+    widthPx,
+    heightPx,
+    widthMm
+  };
+}
@@ -0,0 +1,236 @@
+/**
+ * Headless Phomemo D30 print CLI
+ *
+ * Renders label templates without a browser and writes the ESC/POS byte
+ * stream to a device node (RFCOMM or serial, e.g. /dev/rfcomm0), a file
+ * or stdout. Bytes and time per label are reported on stderr.
+ *
+ * Usage:
+ *   npm run print:cli -- [options] [input.json|-]
+ *
+ * Input is a single template, a JSON array of templates or JSON Lines,
+ * read from the given file or stdin. Templates use the same fields as
+ * print history items, e.g. {"tab":"text","text":"Hello","fontSize":80}.
+ *
+ * Options:
+ *   -o, --out <path>     Output device/file, '-' for stdout (default '-')
+ *   --fonts <dir>        Register font files from a directory
+ *   --footer <mode>      Footer mode (default: template value or 'standard')
+ *   --media <type>       gaps | continuous | marks
+ *   --feed <mm>          Extra feed after each label (and between copies on continuous media)
+ *   --copies <n>         Copies of each label (default: template value or 1),
+ *                        encoded once and repeated within the label's job
+ *   --pack               Send all labels as one continuous job instead of one job each
+ *   --profiles <file>    Pick speed/density per label from raster coverage,
+ *                        using a JSON profile table ('auto' for the built-in one)
+ *   -q, --quiet          Only print the summary
+ */
+
+import { readFile } from 'node:fs/promises';
+import { parseArgs } from 'node:util';
+import {
+  EncodeOptions,
+  FOOTER_MODES,
+  FooterMode,
+  LabelRaster,
+  MEDIA_TYPES,
+  MediaType,
+  countLabels,
+  encodeJob,
+  encodeLabels,
+  serializeJob
+} from '../src/lib/escpos';
+import { createProfileSelector } from '../src/lib/printProfiles';
+import { LabelTemplate, registerFonts, renderLabel } from './headlessRenderer';
+import { loadProfileTable } from './profiles';
+import { openSink } from './sink';
+
+/**
+ * Parse a single template, a JSON array or JSON Lines
+ */
+function parseTemplates(input: string): LabelTemplate[] {
+  const trimmed = input.trim();
+  if (!trimmed) return [];
+
+  try {
+    const parsed = JSON.parse(trimmed);
+    return Array.isArray(parsed) ? parsed : [parsed];
+  } catch {
+    return trimmed
+      .split('\n')
+      .filter(line => line.trim())
+      .map((line, i) => {
+        try {
+          return JSON.parse(line) as LabelTemplate;
+        } catch (error) {
+          throw new Error(`Invalid JSON on line ${i + 1}: ${error instanceof Error ? error.message : error}`);
+        }
+      });
+  }
+}
+
+async function readInput(path: string | undefined): Promise<string> {
+  if (path && path !== '-') {
+    return readFile(path, 'utf8');
+  }
+
+  const chunks: Buffer[] = [];
+  for await (const chunk of process.stdin) {
+    chunks.push(chunk as Buffer);
+  }
+  return Buffer.concat(chunks).toString('utf8');
+}
+
+const USAGE = 'Usage: npm run print:cli -- [-o path] [--fonts dir] [--footer mode] [--media type] ' +
+  '[--feed mm] [--copies n] [--pack] [--profiles file|auto] [-q] [input.json|-]';
+
+/**
+ * Error for bad command line values, reported together with the usage line
+ */
+class UsageError extends Error {}
+
+function parseChoice<T extends string>(flag: string, value: string | undefined, choices: readonly T[]): T | undefined {
+  if (value === undefined) return undefined;
+  if (!(choices as readonly string[]).includes(value)) {
+    throw new UsageError(`Invalid --${flag} '${value}', expected one of: ${choices.join(', ')}`);
+  }
+  return value as T;
+}
+
+function parseNumber(flag: string, value: string | undefined, min: number, integer: boolean): number | undefined {
+  if (value === undefined) return undefined;
+  const number = Number(value);
+  if (value.trim() === '' || !Number.isFinite(number) || number < min || (integer && !Number.isInteger(number))) {
+    throw new UsageError(`Invalid --${flag} '${value}', expected ${integer ? 'an integer' : 'a number'} of at least ${min}`);
+  }
+  return number;
+}
+
+function parseCommandLine() {
+  try {
+    return parseArgs({
+      allowPositionals: true,
+      options: {
+        out: { type: 'string', short: 'o', default: '-' },
+        fonts: { type: 'string' },
+        footer: { type: 'string' },
+        media: { type: 'string' },
+        feed: { type: 'string' },
+        profiles: { type: 'string' },
+        copies: { type: 'string' },
+        pack: { type: 'boolean', default: false },
+        quiet: { type: 'boolean', short: 'q', default: false }
+      }
+    });
+  } catch (error) {
+    // Unknown flags and missing flag values
+    throw new UsageError(error instanceof Error ? error.message : String(error));
+  }
+}
+
+async function main(): Promise<void> {
+  const { values, positionals } = parseCommandLine();
+
+  const footerMode = parseChoice<FooterMode>('footer', values.footer, FOOTER_MODES);
+  const mediaType = parseChoice<MediaType>('media', values.media, MEDIA_TYPES);
+  const feedMm = parseNumber('feed', values.feed, 0, false);
+  const copies = parseNumber('copies', values.copies, 1, true);
+
+  if (values.fonts) {
+    const count = await registerFonts(values.fonts);
+    if (!values.quiet) console.error(`Registered ${count} fonts from ${values.fonts}`);
+  }
+
+  const profile = values.profiles ? createProfileSelector(await loadProfileTable(values.profiles)) : undefined;
+  const templates = parseTemplates(await readInput(positionals[0]));
+  if (templates.length === 0) {
+    throw new Error('No label templates in input');
+  }
+
+  const getEncodeOptions = (template: LabelTemplate): EncodeOptions => {
+    const extraFeedMm = feedMm ?? template.extraFeedMm;
+    return {
+      footerMode: footerMode ?? template.footerMode,
+      mediaType: mediaType ?? template.mediaType,
+      extraFeedMm,
+      profile,
+      copies: copies ?? template.copies,
+      labelGapMm: extraFeedMm
+    };
+  };
+
+  const sink = await openSink(values.out!);
+  const started = performance.now();
+  let totalBytes = 0;
+  let totalLabels = 0;
+
+  try {
+    if (values.pack) {
+      // One job for the whole batch; job-wide settings come from the first template
+      const t0 = performance.now();
+      const labels: LabelRaster[] = [];
+      for (const template of templates) {
+        const label = await renderLabel(template);
+        labels.push({ raster: label.raster, bytesPerRow: label.bytesPerRow, copies: getEncodeOptions(template).copies });
+      }
+      const t1 = performance.now();
+
+      const job = encodeLabels(labels, getEncodeOptions(templates[0]));
+      const bytes = serializeJob(job);
+      const t2 = performance.now();
+
+      await sink.write(bytes);
+      const t3 = performance.now();
+      totalBytes = bytes.length;
+      totalLabels = countLabels(job);
+
+      if (!values.quiet) {
+        console.error(
+          `packed job: ${totalLabels} labels, ${bytes.length} bytes, ` +
+          `${job.profile.name} profile (${(job.coverage.peak * 100).toFixed(0)}% peak black), ` +
+          `render ${(t1 - t0).toFixed(1)}ms, encode ${(t2 - t1).toFixed(1)}ms, write ${(t3 - t2).toFixed(1)}ms`
+        );
+      }
+    } else {
+      for (const [index, template] of templates.entries()) {
+        const t0 = performance.now();
+        const label = await renderLabel(template);
+        const t1 = performance.now();
+
+        const job = encodeJob(label.raster, label.bytesPerRow, getEncodeOptions(template));
+        const bytes = serializeJob(job);
+        const t2 = performance.now();
+
+        await sink.write(bytes);
+        const t3 = performance.now();
+        totalBytes += bytes.length;
+        totalLabels += countLabels(job);
+
+        if (!values.quiet) {
+          console.error(
+            `label ${index + 1}/${templates.length}: ${label.widthMm}mm × ${countLabels(job)}, ${bytes.length} bytes, ` +
+            `${job.profile.name} profile (${(job.coverage.peak * 100).toFixed(0)}% peak black), ` +
+            `render ${(t1 - t0).toFixed(1)}ms, encode ${(t2 - t1).toFixed(1)}ms, write ${(t3 - t2).toFixed(1)}ms`
+          );
+        }
+      }
+    }
+  } finally {
+    await sink.close();
+  }
+
+  const elapsedMs = performance.now() - started;
+  console.error(
+    `${totalLabels} labels, ${totalBytes} bytes in ${(elapsedMs / 1000).toFixed(2)}s ` +
+    `(${((totalLabels / elapsedMs) * 60000).toFixed(1)} labels/min)`
+  );
+}
+
+main().catch((error) => {
+  console.error(error instanceof Error ? error.message : error);
+  if (error instanceof UsageError) {
+    console.error(USAGE);
+    process.exit(2);
+  }
+  process.exit(1);
+});
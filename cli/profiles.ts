@@ -0,0 +1,21 @@
+/**
+ * Print profile tables for the CLI and the spooler
+ */
+
+import { readFile } from 'node:fs/promises';
+import { DEFAULT_PROFILE_TABLE, ProfileRule, isValidProfileTable } from '../src/lib/printProfiles';
+
+/**
+ * Load a profile table for --profiles ('auto' for the built-in one)
+ */
+export async function loadProfileTable(path: string): Promise<ProfileRule[]> {
+  if (path === 'auto') {
+    return DEFAULT_PROFILE_TABLE;
+  }
+
+  const table = JSON.parse(await readFile(path, 'utf8'));
+  if (!isValidProfileTable(table)) {
+    throw new Error(`Invalid profile table in ${path}: expected [{name, maxCoverage, speed, density}, ...]`);
+  }
+  return table;
+}
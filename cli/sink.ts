@@ -0,0 +1,48 @@
+/**
+ * Byte-stream outputs for the CLI and spooler: device nodes, files, stdout
+ */
+
+import { execFileSync } from 'node:child_process';
+import { open } from 'node:fs/promises';
+import { isatty } from 'node:tty';
+
+export interface Sink {
+  write(bytes: Uint8Array): Promise<void>;
+  close(): Promise<void>;
+}
+
+/**
+ * Open the output; terminals (serial ports, ptys) are switched to raw mode
+ * so the tty layer does not rewrite bytes such as 0x0a
+ */
+export async function openSink(path: string): Promise<Sink> {
+  if (path === '-') {
+    return {
+      write: (bytes) =>
+        new Promise((resolve, reject) => {
+          process.stdout.write(bytes, (error) => (error ? reject(error) : resolve()));
+        }),
+      close: async () => {}
+    };
+  }
+
+  const handle = await open(path, 'w');
+  if (isatty(handle.fd)) {
+    try {
+      execFileSync('stty', ['-F', path, 'raw', '-echo']);
+    } catch (error) {
+      console.warn(`Could not set ${path} to raw mode: ${error instanceof Error ? error.message : error}`);
+    }
+  }
+
+  return {
+    write: async (bytes) => {
+      let offset = 0;
+      while (offset < bytes.length) {
+        const { bytesWritten } = await handle.write(bytes, offset, bytes.length - offset);
+        offset += bytesWritten;
+      }
+    },
+    close: () => handle.close()
+  };
+}
@@ -0,0 +1,259 @@
+/**
+ * Persistent job queue for the print spooler
+ *
+ * Job records and state transitions are appended to queue.jsonl in the
+ * spool directory; encoded ESC/POS data is stored next to it as
+ * <id>.prn. On startup the log is replayed and compacted, so queued
+ * jobs survive a restart. Jobs interrupted mid-render go back to the
+ * queue. Jobs that were being sent, or whose client claim expired, may
+ * already have printed, so they are marked failed rather than sent again;
+ * requeue() puts them back once someone has checked the printer.
+ *
+ * Finished jobs are kept for status queries and metrics until they exceed
+ * the retention limits; prune() then drops them with their data files and
+ * rewrites the log.
+ */
+
+import { randomUUID } from 'node:crypto';
+import { appendFile, mkdir, readFile, rm, writeFile } from 'node:fs/promises';
+import { join } from 'node:path';
+import type { LabelTemplate } from './headlessRenderer';
+
+export type SpoolJobState = 'queued' | 'rendering' | 'ready' | 'sending' | 'done' | 'failed' | 'cancelled';
+
+export interface SpoolJobTimes {
+  queuedAt: number;
+  renderStartedAt?: number;
+  renderedAt?: number;
+  sentAt?: number;
+  completedAt?: number;
+  finishedAt?: number; // Reached done, failed or cancelled
+}
+
+export interface SpoolJob {
+  id: string;
+  state: SpoolJobState;
+  template: LabelTemplate;
+  times: SpoolJobTimes;
+  bytes?: number;
+  widthMm?: number;
+  error?: string;
+  claimExpiresAt?: number; // Lease of a client that claimed the job
+}
+
+export interface SpoolRetention {
+  maxFinished?: number; // Finished jobs to keep
+  maxAgeMs?: number; // Drop finished jobs older than this
+}
+
+const FINISHED_STATES: SpoolJobState[] = ['done', 'failed', 'cancelled'];
+const MAY_HAVE_PRINTED = 'may have printed, requeue it to print again';
+const DEFAULT_RETENTION: Required<SpoolRetention> = { maxFinished: 1000, maxAgeMs: 7 * 24 * 60 * 60 * 1000 };
+
+type LogRecord =
+  | { type: 'job'; job: SpoolJob }
+  | { type: 'update'; id: string; patch: Partial<SpoolJob>; unset?: (keyof SpoolJob)[] }; // JSON drops cleared (undefined) fields
+
+export class SpoolQueue {
+  private jobs = new Map<string, SpoolJob>();
+  private readonly logPath: string;
+  private readonly retention: Required<SpoolRetention>;
+  private writes: Promise<void> = Promise.resolve();
+
+  public onChange?: (job: SpoolJob) => void;
+
+  constructor(private readonly dir: string, retention: SpoolRetention = {}) {
+    this.logPath = join(dir, 'queue.jsonl');
+    this.retention = { ...DEFAULT_RETENTION, ...retention };
+  }
+
+  /**
+   * Replay the log, reset interrupted jobs and compact the file
+   */
+  async open(): Promise<void> {
+    await mkdir(this.dir, { recursive: true });
+
+    let log = '';
+    try {
+      log = await readFile(this.logPath, 'utf8');
+    } catch {
+      // No queue yet
+    }
+
+    for (const line of log.split('\n')) {
+      if (!line.trim()) continue;
+      try {
+        const record = JSON.parse(line) as LogRecord;
+        if (record.type === 'job') {
+          this.jobs.set(record.job.id, record.job);
+        } else {
+          const job = this.jobs.get(record.id);
+          if (job) {
+            Object.assign(job, record.patch);
+            for (const key of record.unset ?? []) delete job[key];
+          }
+        }
+      } catch {
+        console.warn('Skipping corrupt spool log line');
+      }
+    }
+
+    const now = Date.now();
+    for (const job of this.jobs.values()) {
+      if (job.state === 'rendering') job.state = 'queued';
+      if (job.state === 'sending') {
+        job.state = 'failed';
+        job.error = `Interrupted while sending, ${MAY_HAVE_PRINTED}`;
+        job.times.finishedAt = now;
+      }
+      delete job.claimExpiresAt;
+    }
+
+    if (!(await this.prune())) {
+      await this.compact();
+    }
+  }
+
+  /**
+   * Drop finished jobs beyond the retention limits, with their data files
+   *
+   * Returns the number of jobs removed; the log is rewritten when any were.
+   */
+  async prune(now: number = Date.now()): Promise<number> {
+    const finishedAt = (job: SpoolJob) => job.times.finishedAt ?? job.times.completedAt ?? job.times.queuedAt;
+    const finished = this.list()
+      .filter(job => FINISHED_STATES.includes(job.state))
+      .sort((a, b) => finishedAt(a) - finishedAt(b));
+
+    const excess = finished.length - this.retention.maxFinished;
+    const expired = finished.filter((job, i) => i < excess || now - finishedAt(job) > this.retention.maxAgeMs);
+    if (expired.length === 0) return 0;
+
+    for (const job of expired) {
+      this.jobs.delete(job.id);
+      await this.removeData(job.id);
+    }
+    await this.compact();
+    return expired.length;
+  }
+
+  /**
+   * Rewrite the log as one record per job
+   */
+  private compact(): Promise<void> {
+    return this.write(() => {
+      const snapshot = [...this.jobs.values()].map(job => JSON.stringify({ type: 'job', job }));
+      return writeFile(this.logPath, snapshot.length ? snapshot.join('\n') + '\n' : '');
+    });
+  }
+
+  /**
+   * Run log writes one at a time so appends never race a rewrite
+   */
+  private write(op: () => Promise<void>): Promise<void> {
+    const result = this.writes.then(op);
+    this.writes = result.catch(() => undefined);
+    return result;
+  }
+
+  /**
+   * Add a job to the queue
+   */
+  async add(template: LabelTemplate): Promise<SpoolJob> {
+    const job: SpoolJob = {
+      id: randomUUID(),
+      state: 'queued',
+      template,
+      times: { queuedAt: Date.now() }
+    };
+    this.jobs.set(job.id, job);
+    await this.write(() => appendFile(this.logPath, JSON.stringify({ type: 'job', job }) + '\n'));
+    this.onChange?.(job);
+    return job;
+  }
+
+  /**
+   * Apply and persist a partial update
+   */
+  async update(id: string, patch: Partial<SpoolJob>): Promise<SpoolJob> {
+    const job = this.jobs.get(id);
+    if (!job) throw new Error(`Unknown job ${id}`);
+
+    if (patch.state && FINISHED_STATES.includes(patch.state)) {
+      patch = { ...patch, times: { ...job.times, ...patch.times, finishedAt: Date.now() } };
+    } else if (patch.times) {
+      patch = { ...patch, times: { ...job.times, ...patch.times } };
+    }
+    const unset = (Object.keys(patch) as (keyof SpoolJob)[]).filter(key => patch[key] === undefined);
+    Object.assign(job, patch);
+    for (const key of unset) delete job[key];
+    const record: LogRecord = { type: 'update', id, patch, ...(unset.length ? { unset } : {}) };
+    await this.write(() => appendFile(this.logPath, JSON.stringify(record) + '\n'));
+    this.onChange?.(job);
+    return job;
+  }
+
+  /**
+   * Fail claimed jobs whose lease has run out
+   *
+   * The client may have printed them before it went away, so they are not
+   * handed out again on their own.
+   */
+  async expireClaims(now: number = Date.now()): Promise<SpoolJob[]> {
+    const expired = this.list('sending').filter(job => job.claimExpiresAt !== undefined && job.claimExpiresAt < now);
+    for (const job of expired) {
+      await this.update(job.id, { state: 'failed', error: `Claim expired, ${MAY_HAVE_PRINTED}`, claimExpiresAt: undefined });
+    }
+    return expired;
+  }
+
+  /**
+   * Put a failed job back in line: ready when it was rendered, otherwise queued
+   */
+  async requeue(id: string): Promise<SpoolJob> {
+    const job = this.jobs.get(id);
+    if (!job) throw new Error(`Unknown job ${id}`);
+    if (job.state !== 'failed') throw new Error(`Cannot requeue a job that is ${job.state}`);
+
+    return this.update(id, {
+      state: job.bytes !== undefined ? 'ready' : 'queued',
+      error: undefined,
+      times: { ...job.times, finishedAt: undefined }
+    });
+  }
+
+  get(id: string): SpoolJob | undefined {
+    return this.jobs.get(id);
+  }
+
+  list(state?: SpoolJobState): SpoolJob[] {
+    const jobs = [...this.jobs.values()];
+    return state ? jobs.filter(job => job.state === state) : jobs;
+  }
+
+  /**
+   * Oldest job in the given state (queue order is insertion order)
+   */
+  next(state: SpoolJobState): SpoolJob | undefined {
+    for (const job of this.jobs.values()) {
+      if (job.state === state) return job;
+    }
+    return undefined;
+  }
+
+  dataPath(id: string): string {
+    return join(this.dir, `${id}.prn`);
+  }
+
+  async saveData(id: string, bytes: Uint8Array): Promise<void> {
+    await writeFile(this.dataPath(id), bytes);
+  }
+
+  async readData(id: string): Promise<Uint8Array> {
+    return readFile(this.dataPath(id));
+  }
+
+  async removeData(id: string): Promise<void> {
+    await rm(this.dataPath(id), { force: true });
+  }
+}
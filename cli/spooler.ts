@@ -0,0 +1,460 @@
+/**
+ * Local print spooler service
+ *
+ * Accepts label jobs over HTTP (the same fields as print history items),
+ * queues them persistently, renders them in a worker pool and hands the
+ * encoded ESC/POS jobs to a printer transport: either a device node
+ * written by the spooler itself (--out), or browser/CLI clients that
+ * claim jobs over HTTP and are notified through server-sent events.
+ *
+ * Usage:
+ *   npm run spooler -- [--port 8630] [--dir ./spool] [--workers N] [--out /dev/rfcomm0] [--fonts dir]
+ *                      [--profiles table.json|auto] [--origin http://localhost:3000 ...] [--keep 1000] [--keep-days 7] [--claim-timeout 300]
+ *
+ * --profiles picks speed and density per job from raster coverage, as the
+ * CLI does; without it every job uses the default profile.
+ *
+ * Requests must name a local host (which also defeats DNS rebinding), and
+ * browsers may only call the spooler from the --origin pages. Finished jobs
+ * are kept up to --keep jobs and --keep-days days. A claimed job that is not
+ * completed within --claim-timeout seconds, or one that was being sent when
+ * the spooler stopped, may have printed: it is marked failed and only
+ * printed again when requeued.
+ *
+ * API (localhost only):
+ *   POST   /jobs               Queue a template or an array of templates (images as data: URLs)
+ *   GET    /jobs[?state=]      List jobs
+ *   GET    /jobs/:id           Job status and latency metrics
+ *   GET    /jobs/:id/data      Encoded job (application/octet-stream)
+ *   DELETE /jobs/:id           Cancel a job that has not been sent
+ *   POST   /claim              Take the next rendered job (204 if none), described by
+ *                              X-Job-Id, X-Job-Label (URI-encoded) and X-Job-Length-Mm
+ *   POST   /jobs/:id/complete  Report the result of a claimed job: {"ok": true}
+ *   POST   /jobs/:id/requeue   Print a failed job again
+ *   GET    /events             Server-sent events for job state changes
+ *   GET    /metrics            Queue depth and latency percentiles
+ */
+
+import { createServer, IncomingMessage, ServerResponse } from 'node:http';
+import { availableParallelism } from 'node:os';
+import { parseArgs } from 'node:util';
+import { Worker } from 'node:worker_threads';
+import { getPreviewLabel } from '../src/lib/printHistory';
+import { LabelTemplate, registerFonts } from './headlessRenderer';
+import { loadProfileTable } from './profiles';
+import { openSink, Sink } from './sink';
+import { SpoolJob, SpoolJobState, SpoolQueue } from './spoolQueue';
+import type { RenderRequest, RenderResponse, RenderWorkerData } from './spoolerWorker';
+
+const MAX_BODY_BYTES = 16 * 1024 * 1024; // Templates may embed image data URLs
+const DEFAULT_ORIGINS = ['http://localhost:3000', 'http://127.0.0.1:3000']; // Vite dev server
+const LOCAL_HOSTNAMES = ['localhost', '127.0.0.1', '[::1]'];
+const MAINTENANCE_INTERVAL_MS = 5000;
+
+/**
+ * Fixed-size pool of render workers
+ */
+class RenderPool {
+  private idle: Worker[] = [];
+  private busy = new Map<Worker, string>();
+  private closed = false;
+
+  constructor(
+    size: number,
+    private readonly workerData: RenderWorkerData,
+    private readonly onResult: (response: RenderResponse) => void
+  ) {
+    for (let i = 0; i < size; i++) {
+      this.spawn();
+    }
+  }
+
+  private spawn(): void {
+    // Pass our exec arguments on so workers load TypeScript the same way (tsx)
+    const worker = new Worker(new URL('./spoolerWorker.ts', import.meta.url), {
+      execArgv: process.execArgv,
+      workerData: this.workerData
+    });
+
+    worker.on('message', (response: RenderResponse) => {
+      this.busy.delete(worker);
+      this.idle.push(worker);
+      this.onResult(response);
+    });
+
+    // 'exit' follows 'error', but a worker can also exit without one
+    let crash: Error | undefined;
+    worker.on('error', (error) => {
+      crash = error;
+    });
+
+    worker.on('exit', (code) => {
+      const id = this.busy.get(worker);
+      this.busy.delete(worker);
+      this.idle = this.idle.filter(w => w !== worker);
+      if (this.closed) return;
+
+      this.spawn();
+      if (id) {
+        this.onResult({ id, ok: false, error: `Render worker crashed: ${crash?.message ?? `exited with code ${code}`}` });
+      }
+    });
+
+    this.idle.push(worker);
+  }
+
+  get available(): number {
+    return this.idle.length;
+  }
+
+  run(request: RenderRequest): void {
+    const worker = this.idle.pop();
+    if (!worker) throw new Error('No idle render worker');
+    this.busy.set(worker, request.id);
+    worker.postMessage(request);
+  }
+
+  async close(): Promise<void> {
+    this.closed = true;
+    await Promise.all([...this.idle, ...this.busy.keys()].map(worker => worker.terminate()));
+  }
+}
+
+/**
+ * Per-job latency breakdown in milliseconds
+ */
+function jobLatency(job: SpoolJob) {
+  const { queuedAt, renderStartedAt, renderedAt, sentAt, completedAt } = job.times;
+  const span = (from?: number, to?: number) => (from !== undefined && to !== undefined ? to - from : undefined);
+
+  return {
+    queueWaitMs: span(queuedAt, renderStartedAt),
+    renderMs: span(renderStartedAt, renderedAt),
+    readyWaitMs: span(renderedAt, sentAt),
+    printMs: span(sentAt, completedAt),
+    totalMs: span(queuedAt, completedAt)
+  };
+}
+
+function summarize(job: SpoolJob, includeTemplate = false) {
+  const { template, ...rest } = job;
+  return { ...rest, latency: jobLatency(job), ...(includeTemplate ? { template } : {}) };
+}
+
+function percentiles(values: number[]) {
+  const sorted = [...values].sort((a, b) => a - b);
+  const at = (p: number) => (sorted.length ? sorted[Math.min(sorted.length - 1, Math.floor(p * sorted.length))] : null);
+  return { count: sorted.length, p50: at(0.5), p95: at(0.95), max: at(1) };
+}
+
+async function readJson(req: IncomingMessage): Promise<unknown> {
+  const chunks: Buffer[] = [];
+  let size = 0;
+  for await (const chunk of req) {
+    size += (chunk as Buffer).length;
+    if (size > MAX_BODY_BYTES) throw new Error('Request body too large');
+    chunks.push(chunk as Buffer);
+  }
+  const body = Buffer.concat(chunks).toString('utf8');
+  return body ? JSON.parse(body) : {};
+}
+
+function sendJson(res: ServerResponse, status: number, body: unknown): void {
+  res.writeHead(status, { 'Content-Type': 'application/json' });
+  res.end(JSON.stringify(body));
+}
+
+/**
+ * Check that the Host header names this machine (or the address we listen on)
+ */
+function isLocalHost(host: string | undefined, listenHost: string): boolean {
+  if (!host) return false;
+  try {
+    const { hostname } = new URL(`http://${host}`);
+    return LOCAL_HOSTNAMES.includes(hostname) || hostname === listenHost;
+  } catch {
+    return false;
+  }
+}
+
+/**
+ * Reject template fields that would make the spooler read local files or URLs
+ */
+function validateTemplate(template: LabelTemplate): string | null {
+  if (!template || typeof template.tab !== 'string') {
+    return 'Each job needs a "tab" field';
+  }
+  if (template.imagePath !== undefined) {
+    return 'imagePath is only supported by the CLI, send the image as imageDataUrl';
+  }
+  if (template.imageDataUrl !== undefined && !template.imageDataUrl.startsWith('data:')) {
+    return 'imageDataUrl must be a data: URL';
+  }
+  return null;
+}
+
+async function main(): Promise<void> {
+  const { values } = parseArgs({
+    options: {
+      port: { type: 'string', default: '8630' },
+      host: { type: 'string', default: '127.0.0.1' },
+      dir: { type: 'string', default: './spool' },
+      workers: { type: 'string' },
+      out: { type: 'string' },
+      fonts: { type: 'string' },
+      profiles: { type: 'string' },
+      origin: { type: 'string', multiple: true, default: DEFAULT_ORIGINS },
+      keep: { type: 'string', default: '1000' },
+      'keep-days': { type: 'string', default: '7' },
+      'claim-timeout': { type: 'string', default: '300' }
+    }
+  });
+
+  const origins = new Set(values.origin);
+  const claimTimeoutMs = Number(values['claim-timeout']) * 1000;
+
+  if (values.fonts) {
+    await registerFonts(values.fonts);
+  }
+
+  const queue = new SpoolQueue(values.dir!, {
+    maxFinished: Number(values.keep),
+    maxAgeMs: Number(values['keep-days']) * 24 * 60 * 60 * 1000
+  });
+  await queue.open();
+
+  const events = new Set<ServerResponse>();
+  const broadcast = (job: SpoolJob) => {
+    const message = `event: job\ndata: ${JSON.stringify(summarize(job))}\n\n`;
+    for (const client of events) client.write(message);
+  };
+  queue.onChange = broadcast;
+
+  const persist = (promise: Promise<unknown>) =>
+    promise.catch(error => console.error('Failed to persist spool state:', error));
+
+  // Device transport: the spooler writes rendered jobs itself, in queue order
+  const sink: Sink | null = values.out ? await openSink(values.out) : null;
+  let delivering = false;
+  const deliver = async () => {
+    if (!sink || delivering) return;
+    delivering = true;
+    try {
+      for (let job = queue.next('ready'); job; job = queue.next('ready')) {
+        await queue.update(job.id, { state: 'sending', times: { ...job.times, sentAt: Date.now() } });
+        try {
+          await sink.write(await queue.readData(job.id));
+          await queue.update(job.id, { state: 'done', times: { ...job.times, completedAt: Date.now() } });
+        } catch (error) {
+          await queue.update(job.id, { state: 'failed', error: error instanceof Error ? error.message : String(error) });
+        }
+      }
+    } finally {
+      delivering = false;
+    }
+  };
+
+  const pump = () => {
+    while (pool.available > 0) {
+      const job = queue.next('queued');
+      if (!job) break;
+      // update() applies the state synchronously, so next() will not return this job again
+      persist(queue.update(job.id, { state: 'rendering', times: { ...job.times, renderStartedAt: Date.now() } }));
+      pool.run({ id: job.id, template: job.template });
+    }
+  };
+
+  const workerCount = Number(values.workers ?? Math.max(1, availableParallelism() - 1));
+  const profiles = values.profiles ? await loadProfileTable(values.profiles) : undefined;
+  const pool = new RenderPool(
+    workerCount,
+    { profiles },
+    async (response) => {
+      const job = queue.get(response.id);
+      if (job && job.state === 'rendering') {
+        try {
+          if (!response.ok) throw new Error(response.error);
+          await queue.saveData(job.id, response.bytes);
+          await queue.update(job.id, {
+            state: 'ready',
+            bytes: response.bytes.length,
+            widthMm: response.widthMm,
+            times: { ...job.times, renderedAt: Date.now() }
+          });
+          persist(deliver());
+        } catch (error) {
+          await persist(queue.update(job.id, { state: 'failed', error: error instanceof Error ? error.message : String(error) }));
+        }
+      }
+      pump();
+    }
+  );
+
+  // Claims whose client went away are failed (they may have printed); old finished jobs are dropped
+  const maintain = async () => {
+    const now = Date.now();
+    for (const job of await queue.expireClaims(now)) {
+      console.error(`Claim of job ${job.id} expired, marked failed`);
+    }
+    await queue.prune(now);
+  };
+  const maintenance = setInterval(() => persist(maintain()), MAINTENANCE_INTERVAL_MS);
+
+  const server = createServer(async (req, res) => {
+    if (!isLocalHost(req.headers.host, values.host!)) {
+      sendJson(res, 403, { error: 'Host not allowed' });
+      return;
+    }
+
+    // The editor runs on a different origin; only its pages may call us from a browser
+    const origin = req.headers.origin;
+    if (origin !== undefined) {
+      if (!origins.has(origin)) {
+        sendJson(res, 403, { error: 'Origin not allowed' });
+        return;
+      }
+      res.setHeader('Access-Control-Allow-Origin', origin);
+      res.setHeader('Vary', 'Origin');
+      res.setHeader('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS');
+      res.setHeader('Access-Control-Allow-Headers', 'Content-Type');
+      res.setHeader('Access-Control-Expose-Headers', 'X-Job-Id, X-Job-Label, X-Job-Length-Mm');
+    }
+    if (req.method === 'OPTIONS') {
+      res.writeHead(204).end();
+      return;
+    }
+
+    const url = new URL(req.url ?? '/', `http://${req.headers.host}`);
+    const [, resource, id, action] = url.pathname.split('/');
+
+    try {
+      if (resource === 'jobs' && !id && req.method === 'POST') {
+        const body = await readJson(req);
+        const templates = (Array.isArray(body) ? body : [body]) as LabelTemplate[];
+        const invalid = templates.map(validateTemplate).find(error => error !== null);
+        if (invalid) {
+          sendJson(res, 400, { error: invalid });
+          return;
+        }
+        const jobs: SpoolJob[] = [];
+        for (const template of templates) {
+          jobs.push(await queue.add(template));
+        }
+        pump();
+        sendJson(res, 201, { ids: jobs.map(job => job.id) });
+      } else if (resource === 'jobs' && !id && req.method === 'GET') {
+        const state = url.searchParams.get('state') as SpoolJobState | null;
+        sendJson(res, 200, queue.list(state ?? undefined).map(job => summarize(job)));
+      } else if (resource === 'jobs' && id) {
+        const job = queue.get(id);
+        if (!job) {
+          sendJson(res, 404, { error: 'Unknown job' });
+        } else if (!action && req.method === 'GET') {
+          sendJson(res, 200, summarize(job, true));
+        } else if (!action && req.method === 'DELETE') {
+          if (job.state !== 'queued' && job.state !== 'ready') {
+            sendJson(res, 409, { error: `Cannot cancel a job that is ${job.state}` });
+            return;
+          }
+          await queue.update(id, { state: 'cancelled' });
+          await queue.removeData(id);
+          sendJson(res, 200, summarize(job));
+        } else if (action === 'data' && req.method === 'GET') {
+          if (job.bytes === undefined) {
+            sendJson(res, 409, { error: `Job is ${job.state}` });
+            return;
+          }
+          res.writeHead(200, { 'Content-Type': 'application/octet-stream' });
+          res.end(await queue.readData(id));
+        } else if (action === 'complete' && req.method === 'POST') {
+          if (job.state !== 'sending') {
+            sendJson(res, 409, { error: `Job is ${job.state}` });
+            return;
+          }
+          const result = (await readJson(req)) as { ok?: boolean; error?: string };
+          await queue.update(id, result.ok
+            ? { state: 'done', times: { ...job.times, completedAt: Date.now() } }
+            : { state: 'failed', error: result.error ?? 'Client reported failure' });
+          sendJson(res, 200, summarize(job));
+        } else if (action === 'requeue' && req.method === 'POST') {
+          if (job.state !== 'failed') {
+            sendJson(res, 409, { error: `Cannot requeue a job that is ${job.state}` });
+            return;
+          }
+          await queue.requeue(id);
+          pump();
+          persist(deliver());
+          sendJson(res, 200, summarize(job));
+        } else {
+          sendJson(res, 405, { error: 'Method not allowed' });
+        }
+      } else if (resource === 'claim' && req.method === 'POST') {
+        const job = sink ? undefined : queue.next('ready');
+        if (!job) {
+          res.writeHead(204).end();
+          return;
+        }
+        const now = Date.now();
+        await queue.update(job.id, { state: 'sending', claimExpiresAt: now + claimTimeoutMs, times: { ...job.times, sentAt: now } });
+        res.writeHead(200, {
+          'Content-Type': 'application/octet-stream',
+          'X-Job-Id': job.id,
+          'X-Job-Label': encodeURIComponent(getPreviewLabel(job.template)),
+          ...(job.widthMm !== undefined ? { 'X-Job-Length-Mm': String(job.widthMm) } : {})
+        });
+        res.end(await queue.readData(job.id));
+      } else if (resource === 'events' && req.method === 'GET') {
+        res.writeHead(200, { 'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', Connection: 'keep-alive' });
+        res.write(`event: hello\ndata: ${JSON.stringify({ ready: queue.list('ready').length })}\n\n`);
+        events.add(res);
+        req.on('close', () => events.delete(res));
+      } else if (resource === 'metrics' && req.method === 'GET') {
+        const jobs = queue.list();
+        const done = jobs.filter(job => job.state === 'done').map(jobLatency);
+        const pick = (key: keyof ReturnType<typeof jobLatency>) =>
+          percentiles(done.map(l => l[key]).filter((v): v is number => v !== undefined));
+
+        const states: Partial<Record<SpoolJobState, number>> = {};
+        for (const job of jobs) states[job.state] = (states[job.state] ?? 0) + 1;
+
+        sendJson(res, 200, {
+          states,
+          workers: { total: workerCount, idle: pool.available },
+          latencyMs: {
+            queueWait: pick('queueWaitMs'),
+            render: pick('renderMs'),
+            readyWait: pick('readyWaitMs'),
+            print: pick('printMs'),
+            total: pick('totalMs')
+          }
+        });
+      } else {
+        sendJson(res, 404, { error: 'Not found' });
+      }
+    } catch (error) {
+      sendJson(res, 500, { error: error instanceof Error ? error.message : String(error) });
+    }
+  });
+
+  server.listen(Number(values.port), values.host, () => {
+    console.error(`Spooler listening on http://${values.host}:${values.port} (${queue.list('queued').length} queued)`);
+    pump();
+    persist(deliver());
+  });
+
+  const shutdown = async () => {
+    clearInterval(maintenance);
+    server.close();
+    for (const client of events) client.end();
+    await pool.close();
+    await sink?.close();
+    process.exit(0);
+  };
+  process.on('SIGINT', shutdown);
+  process.on('SIGTERM', shutdown);
+}
+
+main().catch((error) => {
+  console.error(error instanceof Error ? error.message : error);
+  process.exit(1);
+});
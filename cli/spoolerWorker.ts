@@ -0,0 +1,49 @@
+/**
+ * Render worker for the print spooler
+ *
+ * Receives label templates, renders and encodes them, and posts the
+ * serialized ESC/POS job back to the spooler (transferring the buffer).
+ * With a profile table in workerData, speed and density are chosen per
+ * job from its coverage as in the editor and the CLI.
+ */
+
+import { parentPort, workerData } from 'node:worker_threads';
+import { encodeJob, serializeJob } from '../src/lib/escpos';
+import { ProfileRule, createProfileSelector } from '../src/lib/printProfiles';
+import { LabelTemplate, renderLabel } from './headlessRenderer';
+
+export interface RenderWorkerData {
+  profiles?: ProfileRule[];
+}
+
+export interface RenderRequest {
+  id: string;
+  template: LabelTemplate;
+}
+
+export type RenderResponse =
+  | { id: string; ok: true; bytes: Uint8Array; widthMm: number }
+  | { id: string; ok: false; error: string };
+
+const { profiles } = (workerData ?? {}) as RenderWorkerData;
+const profile = profiles ? createProfileSelector(profiles) : undefined;
+
+parentPort!.on('message', async ({ id, template }: RenderRequest) => {
+  try {
+    const label = await renderLabel(template);
+    const bytes = serializeJob(encodeJob(label.raster, label.bytesPerRow, {
+      footerMode: template.footerMode,
+      mediaType: template.mediaType,
+      extraFeedMm: template.extraFeedMm,
+      profile,
+      copies: template.copies,
+      labelGapMm: template.extraFeedMm
+    }));
+
+    const response: RenderResponse = { id, ok: true, bytes, widthMm: label.widthMm };
+    parentPort!.postMessage(response, [bytes.buffer as ArrayBuffer]);
+  } catch (error) {
+    const response: RenderResponse = { id, ok: false, error: error instanceof Error ? error.message : String(error) };
+    parentPort!.postMessage(response);
+  }
+});
@@ -1,11 +1,21 @@
 import { useState, useEffect, useRef } from 'react';
-import { PhomemoD30Printer, PrinterDebugInfo } from './lib/PhomemoD30Printer';
-import { CanvasRenderer, LabelDimensions } from './lib/CanvasRenderer';
+import { PhomemoD30Printer, PrinterDebugInfo, PrinterState, PrinterStatus } from './lib/PhomemoD30Printer';
+import { getBlockedReason } from './lib/printerStatus';
+import { CanvasRenderer, LabelDimensions, PREVIEW_PX_PER_MM, textFontAt, textIconFontAt } from './lib/CanvasRenderer';
+import { FitOptions } from './lib/textFit';
 import { iconLibrary } from './lib/icons';
 import { FontSelector } from './components/FontSelector';
 import { IconSearch } from './components/IconSearch';
 import { FontDefinition } from './lib/fonts';
+import { PrintMetrics, PrintProgress } from './lib/printMetrics';
+import { SpoolerClient } from './lib/spoolerClient';
+import { PrintCoordinator, PrinterRole } from './lib/printCoordinator';
 import { PrintHistoryItem, getPrintHistory, savePrintJob, deletePrintJob, clearPrintHistory, getPreviewLabel } from './lib/printHistory';
+import { CompiledJobMeta, compileCanvas, saveCompiledJob, loadCompiledJob, getCompiledJob, getCompiledJobIds, deleteCompiledJobs, pruneCompiledJobs, exportCompiledJob } from './lib/compiledJobs';
+import { DEFAULT_PROFILE, EncodeOptions, EncodedJob } from './lib/escpos';
+import { DEFAULT_PROFILE_TABLE, ProfileRule, createProfileSelector, getProfileTable, saveProfileTable } from './lib/printProfiles';
+import { JournalEntry, PrintJournal } from './lib/printJournal';
+import { LABEL_MARGIN_MM, getFitBox } from './lib/labelLayout';
 import './App.css';
 
 type Tab = 'text' | 'texticon' | 'icons' | 'barcode' | 'qr' | 'image';
@@ -14,6 +24,8 @@ function App() {
   const canvasRef = useRef<HTMLCanvasElement>(null);
   const rendererRef = useRef<CanvasRenderer | null>(null);
   const printerRef = useRef<PhomemoD30Printer | null>(null);
+  const coordinatorRef = useRef<PrintCoordinator | null>(null);
+  const spoolerRef = useRef<SpoolerClient | null>(null);
 
   const [activeTab, setActiveTab] = useState<Tab>('texticon');
   const [dimensions, setDimensions] = useState<LabelDimensions>({
@@ -27,7 +39,7 @@ function App() {
   // Physical label is 15mm but only 12mm is printable
   const labelHeightMm = 15; // Physical label height
   const printableHeightMm = 12; // Printable area
-  const marginMm = 2; // Horizontal margins on each side
+  const marginMm = LABEL_MARGIN_MM; // Horizontal margins on each side
 
   // Text tab state
   const [text, setText] = useState('Hello World!');
@@ -49,6 +61,9 @@ function App() {
   const [textIconItalic, setTextIconItalic] = useState(false);
   const [textIconFontWeight, setTextIconFontWeight] = useState(400);
 
+  // Solve the font size to fit the label (text and texticon tabs)
+  const [fitToLabel, setFitToLabel] = useState(false);
+
   // Icons tab state
   const [selectedIcon, setSelectedIcon] = useState<typeof iconLibrary[0] | null>(null);
   const [iconLabel, setIconLabel] = useState('');
@@ -64,12 +79,26 @@ function App() {
 
   // Printer state
   const [printerConnected, setprinterConnected] = useState(false);
+  const [printerStatus, setPrinterStatus] = useState<PrinterStatus>('disconnected');
+  const [printerState, setPrinterState] = useState<PrinterState | null>(null);
+  const [printerRole, setPrinterRole] = useState<PrinterRole>('none');
+  const [queuedJobs, setQueuedJobs] = useState(0); // In the owning tab's queue
   const [statusMessage, setStatusMessage] = useState('');
   const [statusType, setStatusType] = useState<'info' | 'success' | 'error'>('info');
   const [debugInfo, setDebugInfo] = useState<PrinterDebugInfo | null>(null);
   const [footerMode, setFooterMode] = useState<'standard' | 'nofeed' | 'formfeed' | 'cut' | 'simple' | 'reset' | 'multi' | 'none'>('standard');
   const [mediaType, setMediaType] = useState<'gaps' | 'continuous' | 'marks'>('continuous');
   const [extraFeedMm, setExtraFeedMm] = useState(2);
+  const [copies, setCopies] = useState(1);
+  const [metricsEnabled, setMetricsEnabled] = useState(false);
+  const [adaptiveProfiles, setAdaptiveProfiles] = useState(false);
+  const [profileTable, setProfileTable] = useState<ProfileRule[]>(() => getProfileTable());
+  const [printProgress, setPrintProgress] = useState<PrintProgress | null>(null);
+  const [spoolerUrl, setSpoolerUrl] = useState('http://127.0.0.1:8630');
+  const [spoolerEnabled, setSpoolerEnabled] = useState(false);
+
+  // Show the thresholded print raster instead of the display-resolution preview
+  const [monochromePreview, setMonochromePreview] = useState(false);
 
   // Accordion state
   const [dimensionsExpanded, setDimensionsExpanded] = useState(false);
@@ -79,15 +108,42 @@ function App() {
   // Print history state
   const [printHistory, setPrintHistory] = useState<PrintHistoryItem[]>([]);
   const [historyExpanded, setHistoryExpanded] = useState(false);
+  const [compiledJobIds, setCompiledJobIds] = useState<Set<string>>(new Set());
+  const [unfinishedJobs, setUnfinishedJobs] = useState<JournalEntry[]>([]);
 
   // Initialize canvas renderer and printer
   useEffect(() => {
     if (canvasRef.current && !rendererRef.current) {
       rendererRef.current = new CanvasRenderer(canvasRef.current, dimensions);
       printerRef.current = new PhomemoD30Printer();
-      printerRef.current.onStatusChange = (status) => {
-        setprinterConnected(status === 'connected' || status === 'printing');
+
+      // One tab owns the Bluetooth connection, the others print through it
+      const coordinator = new PrintCoordinator(printerRef.current);
+      let lastRole: PrinterRole = coordinator.role;
+      coordinator.onStatusChange = (status, state, role) => {
+        setprinterConnected(status !== 'disconnected' && status !== 'connecting');
+        setPrinterStatus(status);
+        setPrinterState(state ? { ...state } : null);
+        setPrinterRole(role);
+        setQueuedJobs(coordinator.queued);
+        if (role !== lastRole) {
+          // The journal belongs to whichever tab owns the printer now
+          lastRole = role;
+          refreshUnfinishedJobs();
+        }
+        if (status === 'connected') {
+          // Pick up spooled jobs that arrived while disconnected or busy
+          spoolerRef.current?.drain();
+        }
       };
+      coordinator.onProgress = setPrintProgress;
+      coordinatorRef.current = coordinator;
+
+      // Journal every job so an interrupted run can be resumed after a reload
+      const journal = new PrintJournal();
+      printerRef.current.journal = journal;
+      window.addEventListener('pagehide', () => journal.flush());
+      refreshUnfinishedJobs(true);
 
       // Preload default font (Bebas Neue)
       import('./lib/fonts').then(({ fontLoader }) => {
@@ -100,13 +156,34 @@ function App() {
     }
 
     // Load print history from localStorage
-    setPrintHistory(getPrintHistory());
+    const history = getPrintHistory();
+    setPrintHistory(history);
+
+    // Drop compiled jobs whose history item was evicted, then see which items can be replayed
+    pruneCompiledJobs(history.map(item => item.id))
+      .then(getCompiledJobIds)
+      .then(setCompiledJobIds);
   }, []);
 
+  useEffect(() => {
+    rendererRef.current?.setPreviewMode(monochromePreview ? 'monochrome' : 'display');
+  }, [monochromePreview]);
+
   // Update preview when inputs change
   useEffect(() => {
     updatePreview();
-  }, [activeTab, text, fontSize, selectedFont, textIconText, textIconFont, textIconFontSize, textIconIconSvg, textIconIconSize, textIconAllCaps, textIconSmallCaps, textIconItalic, textIconFontWeight, selectedIcon, iconLabel, barcodeData, qrData, imageFile, dimensions, autoWidth]);
+  }, [activeTab, text, fontSize, selectedFont, textIconText, textIconFont, textIconFontSize, textIconIconSvg, textIconIconSize, textIconAllCaps, textIconSmallCaps, textIconItalic, textIconFontWeight, fitToLabel, selectedIcon, iconLabel, barcodeData, qrData, imageFile, dimensions, autoWidth]);
+
+  // Fit box for the text solver (the headless renderer uses the same one)
+  const getFitOptions = (): FitOptions =>
+    getFitBox(dimensions.widthMm, dimensions.heightMm, dimensions.pixelsPerMm, autoWidth);
+
+  const textIconStyle = {
+    allCaps: textIconAllCaps,
+    smallCaps: textIconSmallCaps,
+    italic: textIconItalic,
+    fontWeight: textIconFontWeight
+  };
 
   const calculateAutoWidth = (): number => {
     if (!canvasRef.current) return dimensions.widthMm;
@@ -115,14 +192,31 @@ function App() {
     if (!ctx) return dimensions.widthMm;
 
     let contentWidthPx = 0;
+    const renderer = rendererRef.current;
 
     switch (activeTab) {
       case 'text':
+        if (fitToLabel && renderer) {
+          contentWidthPx = renderer.fitText(text, textFontAt({ fontFamily: selectedFont.family }), getFitOptions()).width;
+          break;
+        }
         ctx.font = `${fontSize}px ${selectedFont.family}`;
         const lines = text.split('\n');
         contentWidthPx = Math.max(...lines.map(line => ctx.measureText(line).width));
         break;
       case 'texticon': {
+        if (fitToLabel && renderer) {
+          contentWidthPx = renderer.fitTextWithIcon(
+            textIconAllCaps ? textIconText.toUpperCase() : textIconText,
+            textIconFontSize,
+            textIconFontAt(textIconFont.family, textIconStyle),
+            textIconIconSvg,
+            textIconIconSize,
+            getFitOptions()
+          ).width;
+          break;
+        }
+
         // Calculate width for text + icon
         const fontStyle = textIconItalic ? 'italic' : 'normal';
         const fontVariant = textIconSmallCaps ? 'small-caps' : 'normal';
@@ -180,49 +274,54 @@ function App() {
 
     rendererRef.current.setDimensions(effectiveDimensions);
 
-    try {
+    const renderer = rendererRef.current;
+    const render = async () => {
       switch (activeTab) {
         case 'text':
-          rendererRef.current.drawText({ text, fontSize, fontFamily: selectedFont.family });
+          renderer.drawText({
+            text,
+            fontSize,
+            fontFamily: selectedFont.family,
+            fit: fitToLabel ? getFitOptions() : undefined
+          });
           break;
         case 'texticon':
           if (textIconText || textIconIconSvg) {
-            await rendererRef.current.drawTextWithIcon(
+            await renderer.drawTextWithIcon(
               textIconText,
               textIconFontSize,
               textIconFont.family,
               textIconIconSvg,
               textIconIconSize,
-              {
-                allCaps: textIconAllCaps,
-                smallCaps: textIconSmallCaps,
-                italic: textIconItalic,
-                fontWeight: textIconFontWeight
-              }
+              { ...textIconStyle, fit: fitToLabel ? getFitOptions() : undefined }
             );
           }
           break;
         case 'icons':
           if (selectedIcon) {
-            await rendererRef.current.drawIcon(selectedIcon.svg, iconLabel);
+            await renderer.drawIcon(selectedIcon.svg, iconLabel);
           }
           break;
         case 'barcode':
           if (barcodeData) {
-            await rendererRef.current.drawBarcode(barcodeData);
+            await renderer.drawBarcode(barcodeData);
           }
           break;
         case 'qr':
           if (qrData) {
-            await rendererRef.current.drawQRCode(qrData);
+            await renderer.drawQRCode(qrData);
           }
           break;
         case 'image':
           if (imageFile) {
-            await rendererRef.current.drawImage(imageFile);
+            await renderer.drawImage(imageFile);
           }
           break;
       }
+    };
+
+    try {
+      await render();
     } catch (error) {
       console.error('Preview error:', error);
       showStatus(`Preview error: ${error}`, 'error');
@@ -230,7 +329,7 @@ function App() {
   };
 
   const handlePrint = async () => {
-    if (!printerRef.current || !canvasRef.current) return;
+    if (!printerRef.current || !coordinatorRef.current || !rendererRef.current) return;
 
     try {
       // Use auto-calculated width if enabled
@@ -240,20 +339,35 @@ function App() {
       // Note: dimensions are swapped because the printer rotates the canvas 90°
       // Preview shows: width × height (horizontal)
       // Printer receives: height × width (rotated vertical)
-      const debug = await printerRef.current.print(
-        canvasRef.current,
-        dimensions.heightMm, // Swapped: preview height becomes print width
-        printWidth,          // Swapped: preview width becomes print height
+      // The print raster is rendered here; its time goes to the job when metrics are enabled
+      const renderer = rendererRef.current;
+      const metrics = printerRef.current.metrics;
+      const printCanvas = metrics
+        ? await metrics.timeRender(() => renderer.getPrintCanvas())
+        : renderer.getPrintCanvas();
+      const encoded = printerRef.current.encode(printCanvas, getEncodeOptions());
+      const printStart = performance.now();
+      const debug = await coordinatorRef.current.print(encoded, {
+        label: getPreviewLabel({ tab: activeTab, text, textIconText, iconLabel, selectedIcon: selectedIcon ?? undefined, barcodeData, qrData }),
+        widthMm: dimensions.heightMm, // Swapped: preview height becomes print width
+        heightMm: printWidth          // Swapped: preview width becomes print height
+      });
+      const printDurationMs = Math.round(performance.now() - printStart);
+      const compiledMeta: CompiledJobMeta = {
+        widthMm: dimensions.heightMm,
+        heightMm: printWidth,
+        pixelsPerMm: dimensions.pixelsPerMm,
         footerMode,
         mediaType,
         extraFeedMm
-      );
+      };
 
       setDebugInfo(debug);
+      setPrintProgress(null);
       showStatus('Print complete!', 'success');
 
-      // Capture canvas preview
-      const previewDataUrl = canvasRef.current.toDataURL('image/png');
+      // Capture the printed raster as preview
+      const previewDataUrl = printCanvas.toDataURL('image/png');
 
       // Save to print history
       const printJob: Omit<PrintHistoryItem, 'id' | 'timestamp'> = {
@@ -264,6 +378,9 @@ function App() {
         footerMode,
         mediaType,
         extraFeedMm,
+        printProfile: getHistoryProfile(encoded),
+        printDurationMs,
+        copies: copies > 1 ? copies : undefined,
       };
 
       // Add tab-specific data
@@ -271,6 +388,7 @@ function App() {
         printJob.text = text;
         printJob.fontSize = fontSize;
         printJob.selectedFont = selectedFont;
+        printJob.fitText = fitToLabel;
       } else if (activeTab === 'texticon') {
         printJob.textIconText = textIconText;
         printJob.textIconFont = textIconFont;
@@ -281,6 +399,7 @@ function App() {
         printJob.textIconSmallCaps = textIconSmallCaps;
         printJob.textIconItalic = textIconItalic;
         printJob.textIconFontWeight = textIconFontWeight;
+        printJob.fitText = fitToLabel;
       } else if (activeTab === 'icons') {
         printJob.selectedIcon = selectedIcon ? { name: selectedIcon.name, svg: selectedIcon.svg } : undefined;
         printJob.iconLabel = iconLabel;
@@ -293,21 +412,155 @@ function App() {
         const reader = new FileReader();
         reader.onload = () => {
           printJob.imageDataUrl = reader.result as string;
-          savePrintJob(printJob);
-          setPrintHistory(getPrintHistory());
+          saveToHistory(printJob, encoded, compiledMeta);
         };
         reader.readAsDataURL(imageFile);
         return; // Early return, history will be saved in onload
       }
 
-      savePrintJob(printJob);
-      setPrintHistory(getPrintHistory());
+      saveToHistory(printJob, encoded, compiledMeta);
+    } catch (error) {
+      setPrintProgress(null);
+      showStatus(`Error: ${error}`, 'error');
+      console.error(error);
+      refreshUnfinishedJobs();
+    }
+  };
+
+
+  // Speed and density: chosen per job from its coverage, or the fixed default.
+  // Copies on continuous media are spaced like separately printed labels.
+  const getEncodeOptions = (labelCopies: number = copies): EncodeOptions => ({
+    footerMode,
+    mediaType,
+    extraFeedMm,
+    profile: adaptiveProfiles ? createProfileSelector(profileTable) : DEFAULT_PROFILE,
+    copies: labelCopies,
+    labelGapMm: extraFeedMm
+  });
+
+  const getHistoryProfile = (encoded: EncodedJob): PrintHistoryItem['printProfile'] => ({
+    name: encoded.profile.name,
+    speed: encoded.profile.speed,
+    density: encoded.profile.density,
+    peakCoverage: encoded.coverage.peak
+  });
+
+  const updateProfileTable = (table: ProfileRule[]) => {
+    setProfileTable(table);
+    saveProfileTable(table);
+  };
+
+  const saveToHistory = (
+    printJob: Omit<PrintHistoryItem, 'id' | 'timestamp'>,
+    encoded: EncodedJob,
+    meta: CompiledJobMeta
+  ) => {
+    const item = savePrintJob(printJob);
+    const history = getPrintHistory();
+    setPrintHistory(history);
+    if (!item) return;
+
+    // Keep the exact byte stream next to the history item for instant reprint
+    saveCompiledJob(item.id, encoded, meta)
+      .then(() => pruneCompiledJobs(history.map(h => h.id)))
+      .then(getCompiledJobIds)
+      .then(setCompiledJobIds);
+  };
+
+  const reprintJob = async (item: PrintHistoryItem) => {
+    const coordinator = coordinatorRef.current;
+    if (!coordinator || coordinator.status === 'disconnected') {
+      showStatus('Connect to the printer first', 'error');
+      return;
+    }
+
+    try {
+      const encoded = await loadCompiledJob(item.id);
+      if (!encoded) {
+        showStatus('No compiled job stored for this label, load and print it instead', 'error');
+        return;
+      }
+
+      showStatus('Reprinting...', 'info');
+      const debug = await coordinator.print(encoded, {
+        label: getPreviewLabel(item),
+        widthMm: item.dimensions.heightMm,
+        heightMm: item.dimensions.widthMm
+      });
+      setDebugInfo(debug);
+      setPrintProgress(null);
+      showStatus('Print complete!', 'success');
     } catch (error) {
+      setPrintProgress(null);
       showStatus(`Error: ${error}`, 'error');
       console.error(error);
+      refreshUnfinishedJobs();
     }
   };
 
+  // Only the owning tab, or any tab while no other owns the printer, reads the
+  // journal: entries another owner is printing must not be resumed here
+  const refreshUnfinishedJobs = async (prune: boolean = false) => {
+    const coordinator = coordinatorRef.current;
+    const journal = printerRef.current?.journal;
+    if (!coordinator || !journal) return;
+
+    try {
+      if (await coordinator.isOwnedElsewhere()) {
+        setUnfinishedJobs([]);
+        return;
+      }
+      if (prune) await journal.prune();
+      setUnfinishedJobs(await journal.getUnfinished());
+    } catch (err) {
+      console.error('Failed to read print journal:', err);
+    }
+  };
+
+  // Continue interrupted jobs in order, skipping whatever already reached the printer
+  const resumeUnfinishedJobs = async () => {
+    const coordinator = coordinatorRef.current;
+    if (printerRole === 'remote') {
+      showStatus('Resume from the tab that is connected to the printer', 'error');
+      return;
+    }
+    if (!coordinator || coordinator.status !== 'connected') {
+      showStatus('Connect to the printer first', 'error');
+      return;
+    }
+
+    try {
+      for (const [i, entry] of unfinishedJobs.entries()) {
+        showStatus(`Resuming ${i + 1}/${unfinishedJobs.length}: ${entry.label}`, 'info');
+        const debug = await coordinator.resume(entry.id);
+        if (debug) setDebugInfo(debug);
+      }
+      setPrintProgress(null);
+      showStatus('Interrupted jobs finished', 'success');
+    } catch (error) {
+      setPrintProgress(null);
+      showStatus(`Error: ${error}`, 'error');
+      console.error(error);
+    } finally {
+      refreshUnfinishedJobs();
+    }
+  };
+
+  const discardUnfinishedJobs = async () => {
+    await printerRef.current?.journal?.discard(unfinishedJobs.map(entry => entry.id));
+    refreshUnfinishedJobs();
+    showStatus('Interrupted jobs discarded', 'info');
+  };
+
+  const exportJob = async (item: PrintHistoryItem) => {
+    const record = await getCompiledJob(item.id);
+    if (!record) {
+      showStatus('No compiled job stored for this label', 'error');
+      return;
+    }
+    exportCompiledJob(record, getPreviewLabel(item));
+  };
 
   const showStatus = (message: string, type: 'info' | 'success' | 'error') => {
     setStatusMessage(message);
@@ -330,6 +583,7 @@ function App() {
     if (item.footerMode) setFooterMode(item.footerMode);
     if (item.mediaType) setMediaType(item.mediaType);
     if (item.extraFeedMm !== undefined) setExtraFeedMm(item.extraFeedMm);
+    setFitToLabel(item.fitText ?? false);
 
     // Load tab-specific data
     if (item.tab === 'text' && item.text !== undefined) {
@@ -368,14 +622,26 @@ function App() {
   };
 
   const handleSaveLabel = async () => {
-    if (!canvasRef.current) return;
+    if (!rendererRef.current) return;
 
     try {
       // Calculate width if needed
       const printWidth = autoWidth ? calculateAutoWidth() : dimensions.widthMm;
 
-      // Capture canvas preview
-      const previewDataUrl = canvasRef.current.toDataURL('image/png');
+      // Capture the print raster as preview
+      const printCanvas = rendererRef.current.getPrintCanvas();
+      const previewDataUrl = printCanvas.toDataURL('image/png');
+
+      // Compile the label now so it can be printed later without re-rendering
+      const encoded = compileCanvas(printCanvas, getEncodeOptions(1));
+      const compiledMeta: CompiledJobMeta = {
+        widthMm: dimensions.heightMm,
+        heightMm: printWidth,
+        pixelsPerMm: dimensions.pixelsPerMm,
+        footerMode,
+        mediaType,
+        extraFeedMm
+      };
 
       // Create print job
       const printJob: Omit<PrintHistoryItem, 'id' | 'timestamp'> = {
@@ -386,6 +652,7 @@ function App() {
         footerMode,
         mediaType,
         extraFeedMm,
+        printProfile: getHistoryProfile(encoded),
       };
 
       // Add tab-specific data
@@ -393,6 +660,7 @@ function App() {
         printJob.text = text;
         printJob.fontSize = fontSize;
         printJob.selectedFont = selectedFont;
+        printJob.fitText = fitToLabel;
       } else if (activeTab === 'texticon') {
         printJob.textIconText = textIconText;
         printJob.textIconFont = textIconFont;
@@ -403,6 +671,7 @@ function App() {
         printJob.textIconSmallCaps = textIconSmallCaps;
         printJob.textIconItalic = textIconItalic;
         printJob.textIconFontWeight = textIconFontWeight;
+        printJob.fitText = fitToLabel;
       } else if (activeTab === 'icons') {
         printJob.selectedIcon = selectedIcon ? { name: selectedIcon.name, svg: selectedIcon.svg } : undefined;
         printJob.iconLabel = iconLabel;
@@ -415,16 +684,14 @@ function App() {
         const reader = new FileReader();
         reader.onload = () => {
           printJob.imageDataUrl = reader.result as string;
-          savePrintJob(printJob);
-          setPrintHistory(getPrintHistory());
+          saveToHistory(printJob, encoded, compiledMeta);
           showStatus('Label saved to history', 'success');
         };
         reader.readAsDataURL(imageFile);
         return; // Early return, history will be saved in onload
       }
 
-      savePrintJob(printJob);
-      setPrintHistory(getPrintHistory());
+      saveToHistory(printJob, encoded, compiledMeta);
       showStatus('Label saved to history', 'success');
     } catch (error) {
       showStatus(`Error: ${error}`, 'error');
@@ -493,9 +760,19 @@ function App() {
                       fontSize={fontSize}
                     />
                   </div>
+                  <div className="form-group">
+                    <label style={{ display: 'flex', alignItems: 'center', cursor: 'pointer', userSelect: 'none' }}>
+                      <input
+                        type="checkbox"
+                        checked={fitToLabel}
+                        onChange={(e) => setFitToLabel(e.target.checked)}
+                      />
+                      Fit text to label{!autoWidth && ' (wraps up to 3 lines)'}
+                    </label>
+                  </div>
                   <div className="form-group">
                     <label htmlFor="font-size">
-                      Font Size: <span>{fontSize}px</span>
+                      Font Size: <span>{fitToLabel ? 'auto' : `${fontSize}px`}</span>
                     </label>
                     <input
                       type="range"
@@ -504,6 +781,7 @@ function App() {
                       min="12"
                       max="120"
                       value={fontSize}
+                      disabled={fitToLabel}
                       onChange={(e) => setFontSize(Number(e.target.value))}
                     />
                   </div>
@@ -523,6 +801,16 @@ function App() {
                       placeholder="Enter text..."
                     />
                   </div>
+                  <div className="form-group">
+                    <label style={{ display: 'flex', alignItems: 'center', cursor: 'pointer', userSelect: 'none' }}>
+                      <input
+                        type="checkbox"
+                        checked={fitToLabel}
+                        onChange={(e) => setFitToLabel(e.target.checked)}
+                      />
+                      Fit text and icon to label
+                    </label>
+                  </div>
 
                   <div className={`settings-panel ${!textIconStyleExpanded ? 'collapsed' : ''}`}>
                     <div
@@ -544,7 +832,7 @@ function App() {
                         </div>
                         <div className="form-group">
                           <label htmlFor="texticon-font-size">
-                            Font Size: <span>{textIconFontSize}px</span>
+                            Font Size: <span>{fitToLabel ? 'auto' : `${textIconFontSize}px`}</span>
                           </label>
                           <input
                             type="range"
@@ -553,6 +841,7 @@ function App() {
                             min="12"
                             max="120"
                             value={textIconFontSize}
+                            disabled={fitToLabel}
                             onChange={(e) => setTextIconFontSize(Number(e.target.value))}
                           />
                         </div>
@@ -857,6 +1146,145 @@ function App() {
                   This should match the D30's protocol better than M02.
                 </small>
               </div>
+
+              <div className="form-group">
+                <label style={{ display: 'flex', alignItems: 'center', cursor: 'pointer', userSelect: 'none' }}>
+                  <input
+                    type="checkbox"
+                    checked={adaptiveProfiles}
+                    onChange={(e) => setAdaptiveProfiles(e.target.checked)}
+                  />
+                  Adaptive speed/density
+                </label>
+                <small style={{ display: 'block', marginTop: '4px' }}>
+                  Picks the first profile whose max black % covers the label's densest block.
+                  Off: speed 5, density 15 for every label.
+                </small>
+                {adaptiveProfiles && (<>
+                  <table style={{ width: '100%', marginTop: '8px', fontSize: '0.7rem' }}>
+                    <thead>
+                      <tr>
+                        <th style={{ textAlign: 'left' }}>Profile</th>
+                        <th>Max black %</th>
+                        <th>Speed (1-5)</th>
+                        <th>Density (1-15)</th>
+                      </tr>
+                    </thead>
+                    <tbody>
+                      {profileTable.map((rule, i) => {
+                        const setRule = (changes: Partial<ProfileRule>) =>
+                          updateProfileTable(profileTable.map((r, j) => (j === i ? { ...r, ...changes } : r)));
+                        return (
+                          <tr key={rule.name}>
+                            <td>{rule.name}</td>
+                            <td>
+                              <input
+                                type="number"
+                                className="form-control"
+                                min="0"
+                                max="100"
+                                value={Math.round(rule.maxCoverage * 100)}
+                                onChange={(e) => setRule({ maxCoverage: Math.min(100, Math.max(0, Number(e.target.value))) / 100 })}
+                              />
+                            </td>
+                            <td>
+                              <input
+                                type="number"
+                                className="form-control"
+                                min="1"
+                                max="5"
+                                value={rule.speed}
+                                onChange={(e) => setRule({ speed: Math.min(5, Math.max(1, Math.round(Number(e.target.value)))) })}
+                              />
+                            </td>
+                            <td>
+                              <input
+                                type="number"
+                                className="form-control"
+                                min="1"
+                                max="15"
+                                value={rule.density}
+                                onChange={(e) => setRule({ density: Math.min(15, Math.max(1, Math.round(Number(e.target.value)))) })}
+                              />
+                            </td>
+                          </tr>
+                        );
+                      })}
+                    </tbody>
+                  </table>
+                  <button
+                    className="btn"
+                    onClick={() => updateProfileTable(DEFAULT_PROFILE_TABLE)}
+                    style={{ fontSize: '0.65rem', padding: '6px 12px', marginTop: '8px' }}
+                  >
+                    Reset Profiles
+                  </button>
+                </>)}
+              </div>
+
+              <div className="form-group">
+                <label style={{ display: 'flex', alignItems: 'center', cursor: 'pointer', userSelect: 'none' }}>
+                  <input
+                    type="checkbox"
+                    checked={metricsEnabled}
+                    onChange={(e) => {
+                      setMetricsEnabled(e.target.checked);
+                      if (printerRef.current) {
+                        printerRef.current.metrics = e.target.checked ? new PrintMetrics() : null;
+                      }
+                    }}
+                  />
+                  Record print metrics
+                </label>
+                <small style={{ display: 'block', marginTop: '4px' }}>
+                  Times each pipeline stage and BLE write. Disabling discards the current session.
+                </small>
+                {metricsEnabled && (
+                  <button
+                    className="btn"
+                    onClick={() => printerRef.current?.metrics?.downloadReport()}
+                    style={{ fontSize: '0.65rem', padding: '6px 12px', marginTop: '8px' }}
+                  >
+                    Download Metrics Report
+                  </button>
+                )}
+              </div>
+
+              <div className="form-group">
+                <label style={{ display: 'flex', alignItems: 'center', cursor: 'pointer', userSelect: 'none' }}>
+                  <input
+                    type="checkbox"
+                    checked={spoolerEnabled}
+                    onChange={(e) => {
+                      spoolerRef.current?.stop();
+                      spoolerRef.current = null;
+                      if (e.target.checked && coordinatorRef.current) {
+                        const client = new SpoolerClient(spoolerUrl, coordinatorRef.current);
+                        client.onJob = (job) => {
+                          if (job.state === 'done') showStatus('Spooled job printed', 'success');
+                          if (job.state === 'failed') showStatus(`Spooled job failed: ${job.error}`, 'error');
+                        };
+                        client.onError = (error) => showStatus(error.message, 'error');
+                        client.start();
+                        spoolerRef.current = client;
+                      }
+                      setSpoolerEnabled(e.target.checked);
+                    }}
+                  />
+                  Accept jobs from local spooler
+                </label>
+                <input
+                  type="text"
+                  className="form-control"
+                  value={spoolerUrl}
+                  disabled={spoolerEnabled}
+                  onChange={(e) => setSpoolerUrl(e.target.value)}
+                  style={{ marginTop: '8px' }}
+                />
+                <small style={{ display: 'block', marginTop: '4px' }}>
+                  Prints jobs queued with <code>npm run spooler</code> on the connected printer.
+                </small>
+              </div>
               </>)}
             </div>
 
@@ -881,7 +1309,9 @@ function App() {
                           className="btn"
                           onClick={() => {
                             clearPrintHistory();
+                            deleteCompiledJobs();
                             setPrintHistory([]);
+                            setCompiledJobIds(new Set());
                             showStatus('Print history cleared', 'info');
                           }}
                           style={{ fontSize: '0.65rem', padding: '6px 12px' }}
@@ -924,7 +1354,17 @@ function App() {
                               </div>
                               <div style={{ fontSize: '0.65rem', color: '#666' }}>
                                 {new Date(item.timestamp).toLocaleString()} • {item.dimensions.widthMm}×{item.dimensions.heightMm}mm
+                                {item.copies && ` • ${item.copies} copies`}
                               </div>
+                              {item.printProfile && (
+                                <div
+                                  style={{ fontSize: '0.65rem', color: '#666' }}
+                                  title={`Speed ${item.printProfile.speed}, density ${item.printProfile.density}`}
+                                >
+                                  {item.printProfile.name} profile • {Math.round(item.printProfile.peakCoverage * 100)}% peak black
+                                  {item.printDurationMs !== undefined && ` • ${(item.printDurationMs / 1000).toFixed(1)}s to print`}
+                                </div>
+                              )}
                             </div>
                             <div style={{ display: 'flex', gap: '6px', flexShrink: 0 }}>
                               <button
@@ -934,10 +1374,37 @@ function App() {
                               >
                                 Load
                               </button>
+                              {compiledJobIds.has(item.id) && (
+                                <>
+                                  <button
+                                    className="btn"
+                                    onClick={() => reprintJob(item)}
+                                    disabled={!printerConnected}
+                                    title="Send the stored byte stream again without re-rendering"
+                                    style={{ fontSize: '0.65rem', padding: '6px 12px', whiteSpace: 'nowrap' }}
+                                  >
+                                    Reprint
+                                  </button>
+                                  <button
+                                    className="btn"
+                                    onClick={() => exportJob(item)}
+                                    title="Download the raw ESC/POS job (.prn)"
+                                    style={{ fontSize: '0.65rem', padding: '6px 12px', whiteSpace: 'nowrap' }}
+                                  >
+                                    .prn
+                                  </button>
+                                </>
+                              )}
                               <button
                                 className="btn"
                                 onClick={() => {
                                   deletePrintJob(item.id);
+                                  deleteCompiledJobs([item.id]);
+                                  setCompiledJobIds(ids => {
+                                    const next = new Set(ids);
+                                    next.delete(item.id);
+                                    return next;
+                                  });
                                   setPrintHistory(getPrintHistory());
                                   showStatus('Print job deleted', 'info');
                                 }}
@@ -961,6 +1428,49 @@ function App() {
               </div>
             )}
 
+            {unfinishedJobs.length > 0 && printerRole !== 'remote' && (
+              <div className="status-message error">
+                ⚠ {unfinishedJobs.length} interrupted print job{unfinishedJobs.length > 1 ? 's' : ''}:{' '}
+                {unfinishedJobs.map(entry =>
+                  entry.state === 'sending'
+                    ? `${entry.label} (stopped at block ${Math.min(entry.checkpoint, entry.blockCount)}/${entry.blockCount})`
+                    : entry.label
+                ).join(', ')}
+                <div style={{ display: 'flex', gap: '6px', marginTop: '8px' }}>
+                  <button
+                    className="btn"
+                    onClick={resumeUnfinishedJobs}
+                    disabled={!printerConnected}
+                    style={{ fontSize: '0.65rem', padding: '6px 12px' }}
+                  >
+                    Resume
+                  </button>
+                  <button
+                    className="btn"
+                    onClick={discardUnfinishedJobs}
+                    style={{ fontSize: '0.65rem', padding: '6px 12px' }}
+                  >
+                    Discard
+                  </button>
+                </div>
+              </div>
+            )}
+
+            {printerState && (printerStatus === 'paused' || getBlockedReason(printerState)) && (
+              <div className="status-message error">
+                ⏸ {getBlockedReason(printerState) ?? 'Waiting for printer'}
+                {printerStatus === 'paused' && ' (printing resumes automatically)'}
+              </div>
+            )}
+
+            {printProgress && (
+              <div className="status-message info">
+                Printing... {printProgress.percent !== null
+                  ? `${printProgress.percent}% (block ${printProgress.blockIndex + 1}/${printProgress.blockCount})`
+                  : `${(printProgress.bytesSent / 1024).toFixed(1)} KiB (block ${printProgress.blockIndex + 1})`}
+              </div>
+            )}
+
             {debugInfo && (
               <div className="debug-panel">
                 <h3>🐛 Debug Information</h3>
@@ -969,9 +1479,32 @@ function App() {
                   <div>Label: {debugInfo.widthMm}×{debugInfo.heightMm}mm</div>
                   <div>Bytes per row: {debugInfo.bytesPerRow}</div>
                   <div>Total bytes: {debugInfo.totalBytes}</div>
+                  {debugInfo.labels !== undefined && debugInfo.labels > 1 && <div>Labels in job: {debugInfo.labels}</div>}
                   <div>Pixels/mm: {debugInfo.pixelsPerMm}</div>
                   <div>Header: {debugInfo.headerBytes}</div>
                   <div>Footer: {debugInfo.footerBytes}</div>
+                  {debugInfo.profile && (
+                    <div>
+                      Profile: {debugInfo.profile.name} (speed {debugInfo.profile.speed}, density {debugInfo.profile.density})
+                      {debugInfo.coverage && ` • black coverage mean ${(debugInfo.coverage.mean * 100).toFixed(1)}%, peak ${(debugInfo.coverage.peak * 100).toFixed(1)}%`}
+                    </div>
+                  )}
+                  {debugInfo.metrics && (
+                    <>
+                      <div>Duration: {debugInfo.metrics.durationMs.toFixed(0)}ms</div>
+                      <div>Throughput: {(debugInfo.metrics.bytesPerSecond / 1024).toFixed(1)} KiB/s</div>
+                      <div>
+                        Write latency: p50 {debugInfo.metrics.writeLatency.p50Ms.toFixed(1)}ms •
+                        p95 {debugInfo.metrics.writeLatency.p95Ms.toFixed(1)}ms •
+                        max {debugInfo.metrics.writeLatency.maxMs.toFixed(1)}ms
+                      </div>
+                      <div>
+                        Stages: {Object.entries(debugInfo.metrics.stagesMs)
+                          .map(([stage, ms]) => `${stage} ${(ms ?? 0).toFixed(0)}ms`)
+                          .join(' • ')}
+                      </div>
+                    </>
+                  )}
                 </div>
               </div>
             )}
@@ -980,15 +1513,23 @@ function App() {
           <div className="card preview-section">
             <div className="preview-header">
               <h2>Preview</h2>
+              <label style={{ display: 'flex', alignItems: 'center', gap: '6px', cursor: 'pointer', userSelect: 'none' }}>
+                <input
+                  type="checkbox"
+                  checked={monochromePreview}
+                  onChange={(e) => setMonochromePreview(e.target.checked)}
+                />
+                <small>1-bit print preview</small>
+              </label>
             </div>
             <div className="canvas-container">
               <div
                 className="label-wrapper"
                 style={{
-                  paddingTop: `${((labelHeightMm - printableHeightMm) / 2) * dimensions.pixelsPerMm}px`,
-                  paddingBottom: `${((labelHeightMm - printableHeightMm) / 2) * dimensions.pixelsPerMm}px`,
-                  paddingLeft: `${marginMm * dimensions.pixelsPerMm}px`,
-                  paddingRight: `${marginMm * dimensions.pixelsPerMm}px`
+                  paddingTop: `${((labelHeightMm - printableHeightMm) / 2) * PREVIEW_PX_PER_MM}px`,
+                  paddingBottom: `${((labelHeightMm - printableHeightMm) / 2) * PREVIEW_PX_PER_MM}px`,
+                  paddingLeft: `${marginMm * PREVIEW_PX_PER_MM}px`,
+                  paddingRight: `${marginMm * PREVIEW_PX_PER_MM}px`
                 }}
               >
                 <div className="printable-area">
@@ -1008,11 +1549,24 @@ function App() {
                 <button className="btn" onClick={handleSaveLabel}>
                   💾 Save Label
                 </button>
+                {printerRole === 'remote' && (
+                  <span
+                    style={{ fontSize: '0.7rem', color: '#888', alignSelf: 'center' }}
+                    title="Another tab owns the Bluetooth connection; labels printed here are queued there"
+                  >
+                    🔗 Via other tab{queuedJobs > 0 && ` • ${queuedJobs} queued`}
+                  </span>
+                )}
+                {printerState?.batteryPercent != null && (
+                  <span style={{ fontSize: '0.7rem', color: '#888', alignSelf: 'center' }}>
+                    🔋 {printerState.batteryPercent}%
+                  </span>
+                )}
                 {!printerConnected ? (
                   <button className="btn btn-connect" onClick={async () => {
                     try {
                       showStatus('Connecting to printer...', 'info');
-                      await printerRef.current?.connect();
+                      await coordinatorRef.current?.connect();
                       showStatus('Connected!', 'success');
                     } catch (error) {
                       showStatus(`Connection error: ${error}`, 'error');
@@ -1021,9 +1575,22 @@ function App() {
                     🔌 Connect Printer
                   </button>
                 ) : (
-                  <button className="btn btn-print" onClick={handlePrint}>
-                    🖨️ Print Label
-                  </button>
+                  <>
+                    <label className="copies-input" title="Copies, printed in one job">
+                      ×
+                      <input
+                        type="number"
+                        className="form-control"
+                        min={1}
+                        max={99}
+                        value={copies}
+                        onChange={(e) => setCopies(Math.min(99, Math.max(1, Math.floor(Number(e.target.value)) || 1)))}
+                      />
+                    </label>
+                    <button className="btn btn-print" onClick={handlePrint}>
+                      🖨️ Print {copies > 1 ? `${copies} Labels` : 'Label'}
+                    </button>
+                  </>
                 )}
               </div>
             </div>
@@ -1,138 +1,77 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useMemo } from 'react';
+import { IconLibraryType, getLibraryType, splitIconId, tagIconSvg } from '../lib/iconifyApi';
+import { listIconifyCollection, loadIconifySvgs, searchIconify } from '../lib/iconAtlas';
+import { IconGridItem, VirtualIconGrid } from './VirtualIconGrid';
 import './IconSearch.css';
 
-interface IconSearchResult {
-  name: string;
-  library: 'fa' | 'fa7' | 'lucide' | 'ph' | 'game-icons' | 'cbi' | 'material-symbols' | 'solar' | 'tabler' | 'iconamoon';
-  svg: string;
-}
-
 interface IconSearchProps {
   onIconSelect: (svg: string) => void;
 }
 
+const ALL_COLLECTIONS = ['fa7-solid', 'fa7-regular', 'fa-solid', 'fa-regular', 'lucide', 'ph', 'game-icons', 'cbi', 'material-symbols', 'solar', 'tabler', 'iconamoon'];
+
+function getCollections(library: IconLibraryType | 'all'): string[] {
+  return library === 'all'
+    ? ALL_COLLECTIONS
+    : library === 'fa'
+      ? ['fa-solid', 'fa-regular']
+      : library === 'fa7'
+        ? ['fa7-solid', 'fa7-regular']
+        : [library];
+}
+
 export function IconSearch({ onIconSelect }: IconSearchProps) {
   const [searchTerm, setSearchTerm] = useState('');
-  const [selectedLibrary, setSelectedLibrary] = useState<'fa' | 'fa7' | 'lucide' | 'ph' | 'game-icons' | 'cbi' | 'material-symbols' | 'solar' | 'tabler' | 'iconamoon' | 'all'>('all');
-  const [results, setResults] = useState<IconSearchResult[]>([]);
+  const [selectedLibrary, setSelectedLibrary] = useState<IconLibraryType | 'all'>('all');
+  const [iconIds, setIconIds] = useState<string[]>([]);
   const [loading, setLoading] = useState(false);
 
-  // Fetch icons from Iconify API
-  const searchIcons = async (query: string, library: string) => {
-    if (!query || query.length < 2) {
-      setResults([]);
+  // Debounced search; an empty query browses the whole selected library
+  useEffect(() => {
+    const query = searchTerm.trim();
+    if (query.length < 2 && (query || selectedLibrary === 'all')) {
+      setIconIds([]);
+      setLoading(false);
       return;
     }
 
-    setLoading(true);
-    try {
-      const collections = library === 'all'
-        ? ['fa7-solid', 'fa7-regular', 'fa-solid', 'fa-regular', 'lucide', 'ph', 'game-icons', 'cbi', 'material-symbols', 'solar', 'tabler', 'iconamoon']
-        : library === 'fa'
-          ? ['fa-solid', 'fa-regular']
-          : library === 'fa7'
-            ? ['fa7-solid', 'fa7-regular']
-            : [library];
-
-      const allResults: IconSearchResult[] = [];
-
-      for (const collection of collections) {
-        try {
-          // Search for icons
-          const searchResponse = await fetch(
-            `https://api.iconify.design/search?query=${encodeURIComponent(query)}&collection=${collection}&limit=20`
-          );
-          const searchData = await searchResponse.json();
-
-          if (searchData.icons && searchData.icons.length > 0) {
-            // Fetch SVG for each icon
-            for (const iconName of searchData.icons.slice(0, 10)) {
-              try {
-                // Check if iconName already includes the collection prefix
-                const fullIconId = iconName.includes(':')
-                  ? iconName  // Already has collection prefix
-                  : `${collection}:${iconName}`;  // Add collection prefix
-
-                const svgResponse = await fetch(
-                  `https://api.iconify.design/${fullIconId}.svg?color=currentColor`
-                );
-
-                if (!svgResponse.ok) {
-                  console.error(`Failed to fetch ${fullIconId}: ${svgResponse.status}`);
-                  continue;
-                }
-
-                const svgText = await svgResponse.text();
-
-                // Verify we got valid SVG
-                if (!svgText || !svgText.includes('<svg')) {
-                  console.error(`Invalid SVG for ${fullIconId}`);
-                  continue;
-                }
-
-                const libraryType = collection.startsWith('fa7-') ? 'fa7' :
-                                   collection.startsWith('fa-') ? 'fa' :
-                                   collection === 'lucide' ? 'lucide' :
-                                   collection === 'ph' ? 'ph' :
-                                   collection === 'game-icons' ? 'game-icons' :
-                                   collection === 'cbi' ? 'cbi' :
-                                   collection === 'material-symbols' ? 'material-symbols' :
-                                   collection === 'solar' ? 'solar' :
-                                   collection === 'tabler' ? 'tabler' :
-                                   collection === 'iconamoon' ? 'iconamoon' : 'fa' as any;
-
-                // Extract just the icon name (without collection prefix)
-                const displayName = iconName.includes(':')
-                  ? iconName.split(':')[1]
-                  : iconName;
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      setLoading(true);
+      try {
+        const collections = getCollections(selectedLibrary);
+        const ids = query
+          ? await searchIconify(query, collections)
+          : (await Promise.all(collections.map(listIconifyCollection))).flat();
+        if (!cancelled) setIconIds(ids);
+      } catch (error) {
+        console.error('Icon search error:', error);
+        if (!cancelled) setIconIds([]);
+      } finally {
+        if (!cancelled) setLoading(false);
+      }
+    }, query ? 500 : 0);
 
-                // Embed library type as HTML comment in SVG for detection
-                const libraryTag = libraryType === 'fa' ? 'font-awesome' :
-                                   libraryType === 'fa7' ? 'font-awesome-7' :
-                                   libraryType === 'lucide' ? 'lucide' :
-                                   libraryType === 'ph' ? 'phosphor' :
-                                   libraryType === 'game-icons' ? 'game-icons' :
-                                   libraryType === 'cbi' ? 'cbi' :
-                                   libraryType === 'material-symbols' ? 'material-symbols' :
-                                   libraryType === 'solar' ? 'solar' :
-                                   libraryType === 'tabler' ? 'tabler' :
-                                   libraryType === 'iconamoon' ? 'iconamoon' : libraryType;
-                const taggedSvg = svgText.replace('<svg', `<!-- ${libraryTag} --><svg`);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm, selectedLibrary]);
 
-                console.log(`Loaded icon: ${fullIconId}`);
-                allResults.push({
-                  name: displayName,
-                  library: libraryType,
-                  svg: taggedSvg
-                });
-              } catch (err) {
-                console.error(`Failed to fetch ${iconName}:`, err);
-              }
-            }
-          }
-        } catch (err) {
-          console.error(`Failed to search ${collection}:`, err);
-        }
+  const handleSelect = async (item: IconGridItem) => {
+    try {
+      const svg = (await loadIconifySvgs([item.id])).get(item.id);
+      if (!svg) {
+        console.error(`Failed to fetch ${item.id}`);
+        return;
       }
-
-      setResults(allResults);
+      onIconSelect(tagIconSvg(splitIconId(item.id)[0], svg));
     } catch (error) {
-      console.error('Icon search error:', error);
-    } finally {
-      setLoading(false);
+      console.error(`Failed to fetch ${item.id}:`, error);
     }
   };
 
-  // Debounced search
-  useEffect(() => {
-    const timer = setTimeout(() => {
-      searchIcons(searchTerm, selectedLibrary);
-    }, 500);
-
-    return () => clearTimeout(timer);
-  }, [searchTerm, selectedLibrary]);
-
-  const getLibraryLabel = (lib: 'fa' | 'fa7' | 'lucide' | 'ph' | 'game-icons' | 'cbi' | 'material-symbols' | 'solar' | 'tabler' | 'iconamoon') => {
+  const getLibraryLabel = (lib: IconLibraryType) => {
     switch (lib) {
       case 'fa': return 'Font Awesome';
       case 'fa7': return 'Font Awesome 7';
@@ -147,6 +86,18 @@ export function IconSearch({ onIconSelect }: IconSearchProps) {
     }
   };
 
+  const items = useMemo<IconGridItem[]>(() => iconIds.map(id => {
+    const [collection, name] = splitIconId(id);
+    const library = getLibraryType(collection);
+    return {
+      id,
+      label: name,
+      title: `${getLibraryLabel(library)}: ${name}`,
+      badge: library.toUpperCase(),
+      badgeClassName: `icon-search-result-badge ${library}`
+    };
+  }), [iconIds]);
+
   return (
     <div className="icon-search">
       <div className="icon-search-controls">
@@ -180,39 +131,29 @@ export function IconSearch({ onIconSelect }: IconSearchProps) {
         <div className="icon-search-loading">Searching icons...</div>
       )}
 
-      {!loading && searchTerm && results.length === 0 && (
+      {!loading && searchTerm && iconIds.length === 0 && (
         <div className="icon-search-empty">
           No icons found. Try a different search term.
         </div>
       )}
 
-      {!loading && results.length > 0 && (
-        <div className="icon-search-results">
-          {results.map((result, index) => (
-            <div
-              key={`${result.library}-${result.name}-${index}`}
-              className="icon-search-result"
-              onClick={() => onIconSelect(result.svg)}
-              title={`${getLibraryLabel(result.library)}: ${result.name}`}
-            >
-              <div
-                className="icon-search-result-svg"
-                dangerouslySetInnerHTML={{ __html: result.svg }}
-              />
-              <div className="icon-search-result-info">
-                <span className="icon-search-result-name">{result.name}</span>
-                <span className={`icon-search-result-badge ${result.library}`}>
-                  {result.library.toUpperCase()}
-                </span>
-              </div>
-            </div>
-          ))}
-        </div>
+      {!loading && iconIds.length > 0 && (
+        <>
+          <div className="icon-search-count">{iconIds.length.toLocaleString()} icons</div>
+          <VirtualIconGrid
+            items={items}
+            source="iconify"
+            onSelect={handleSelect}
+            className="icon-search-results"
+            cellClassName="icon-search-result"
+            labelClassName="icon-search-result-name"
+          />
+        </>
       )}
 
-      {!searchTerm && (
+      {!searchTerm && selectedLibrary === 'all' && (
         <div className="icon-search-hint">
-          <p>🔍 Search thousands of icons from multiple libraries</p>
+          <p>🔍 Search thousands of icons from multiple libraries, or pick a library to browse all of it</p>
           <p style={{ fontSize: '0.85rem', marginTop: '8px' }}>
             Try searching for: star, home, user, heart, settings, check, arrow, etc.
           </p>
@@ -2,9 +2,10 @@
  * Rich Text Editor component for creating labels with inline icons
  */
 
-import { useState, useRef } from 'react';
+import { useState, useRef, useMemo } from 'react';
 import { RichTextSegment, createTextSegment, createIconSegment } from '../lib/types';
 import { IconDefinition, iconLibraries, searchIcons } from '../lib/iconLibraries';
+import { IconGridItem, VirtualIconGrid } from './VirtualIconGrid';
 import './RichTextEditor.css';
 
 interface RichTextEditorProps {
@@ -36,7 +37,15 @@ export function RichTextEditor({ segments, onChange, fontSize }: RichTextEditorP
     return library ? library.icons : [];
   };
 
-  const availableIcons = getAvailableIcons();
+  const availableIcons = useMemo(getAvailableIcons, [iconSearchQuery, selectedLibrary]);
+  const iconsById = useMemo(
+    () => new Map(availableIcons.map(icon => [`${icon.library}:${icon.name}`, icon])),
+    [availableIcons]
+  );
+  const iconGridItems = useMemo<IconGridItem[]>(
+    () => [...iconsById].map(([id, icon]) => ({ id, label: icon.name, svg: icon.svg, title: `${icon.name} (${icon.library})` })),
+    [iconsById]
+  );
 
   // Insert an icon at the current cursor position
   const insertIcon = (iconDef: IconDefinition) => {
@@ -201,25 +210,24 @@ export function RichTextEditor({ segments, onChange, fontSize }: RichTextEditorP
             </div>
           </div>
 
-          <div className="icon-picker-grid">
-            {availableIcons.length === 0 ? (
-              <div className="no-icons-message">
-                {iconSearchQuery ? 'No icons found matching your search' : 'No icons available in this library'}
-              </div>
-            ) : (
-              availableIcons.map((icon, idx) => (
-                <div
-                  key={`${icon.library}-${icon.name}-${idx}`}
-                  className="icon-picker-item"
-                  onClick={() => insertIcon(icon)}
-                  title={`${icon.name} (${icon.library})`}
-                >
-                  <div dangerouslySetInnerHTML={{ __html: icon.svg }} />
-                  <span className="icon-picker-name">{icon.name}</span>
-                </div>
-              ))
-            )}
-          </div>
+          {availableIcons.length === 0 ? (
+            <div className="no-icons-message">
+              {iconSearchQuery ? 'No icons found matching your search' : 'No icons available in this library'}
+            </div>
+          ) : (
+            <VirtualIconGrid
+              items={iconGridItems}
+              source="local"
+              onSelect={(item) => insertIcon(iconsById.get(item.id)!)}
+              iconSize={32}
+              minCellWidth={80}
+              cellHeight={80}
+              gap={12}
+              className="icon-picker-grid"
+              cellClassName="icon-picker-item"
+              labelClassName="icon-picker-name"
+            />
+          )}
         </div>
       )}
     </div>
@@ -0,0 +1,162 @@
+/**
+ * Windowed icon grid
+ *
+ * Only the rows in view (plus a little overscan) are mounted, and each
+ * thumbnail is a small canvas copied from the shared icon atlas instead of
+ * an inline SVG, so grids with thousands of icons stay cheap to scroll.
+ */
+
+import { memo, useEffect, useLayoutEffect, useMemo, useRef, useState } from 'react';
+import { IconAtlas, getIconAtlas } from '../lib/iconAtlas';
+import './VirtualIconGrid.css';
+
+export interface IconGridItem {
+  id: string; // Atlas key, e.g. 'lucide:home'
+  label: string;
+  svg?: string; // Omit for Iconify icons; the atlas fetches them by id
+  title?: string;
+  badge?: string;
+  badgeClassName?: string;
+}
+
+interface VirtualIconGridProps {
+  items: IconGridItem[];
+  source: 'iconify' | 'local';
+  onSelect: (item: IconGridItem) => void;
+  iconSize?: number; // CSS px
+  minCellWidth?: number;
+  cellHeight?: number;
+  gap?: number;
+  overscanRows?: number;
+  className?: string;
+  cellClassName?: string;
+  labelClassName?: string;
+}
+
+interface ThumbnailProps {
+  atlas: IconAtlas;
+  id: string;
+  size: number;
+  version: number;
+}
+
+/**
+ * One thumbnail, redrawn whenever the atlas reports new slots
+ */
+const AtlasThumbnail = memo(function AtlasThumbnail({ atlas, id, size, version }: ThumbnailProps) {
+  const canvasRef = useRef<HTMLCanvasElement>(null);
+
+  useEffect(() => {
+    const canvas = canvasRef.current;
+    const ctx = canvas?.getContext('2d');
+    if (!canvas || !ctx) return;
+
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    const slot = atlas.getSlot(id);
+    if (slot) {
+      ctx.drawImage(slot.page, slot.x, slot.y, slot.size, slot.size, 0, 0, canvas.width, canvas.height);
+    }
+  }, [atlas, id, version]);
+
+  return (
+    <canvas
+      ref={canvasRef}
+      className="virtual-icon-grid-thumbnail"
+      width={atlas.cellSize}
+      height={atlas.cellSize}
+      style={{ width: size, height: size }}
+    />
+  );
+});
+
+export function VirtualIconGrid({
+  items,
+  source,
+  onSelect,
+  iconSize = 36,
+  minCellWidth = 70,
+  cellHeight = 84,
+  gap = 6,
+  overscanRows = 3,
+  className = '',
+  cellClassName = '',
+  labelClassName = ''
+}: VirtualIconGridProps) {
+  const containerRef = useRef<HTMLDivElement>(null);
+  const [viewport, setViewport] = useState({ width: 0, height: 0 });
+  const [firstRow, setFirstRow] = useState(0);
+  const [version, setVersion] = useState(0);
+
+  const atlas = useMemo(() => getIconAtlas(source, iconSize), [source, iconSize]);
+
+  useEffect(() => atlas.subscribe(() => setVersion(v => v + 1)), [atlas]);
+
+  useLayoutEffect(() => {
+    const container = containerRef.current;
+    if (!container) return;
+
+    const observer = new ResizeObserver(([entry]) => {
+      setViewport({ width: entry.contentRect.width, height: entry.contentRect.height });
+    });
+    observer.observe(container);
+    return () => observer.disconnect();
+  }, []);
+
+  // New results start at the top
+  useEffect(() => {
+    containerRef.current?.scrollTo({ top: 0 });
+    setFirstRow(0);
+  }, [items]);
+
+  const rowHeight = cellHeight + gap;
+  const columns = Math.max(1, Math.floor((viewport.width + gap) / (minCellWidth + gap)));
+  const cellWidth = (viewport.width - gap * (columns - 1)) / columns;
+  const rowCount = Math.ceil(items.length / columns);
+  const visibleRows = Math.ceil(viewport.height / rowHeight) + 1;
+
+  const startRow = Math.max(0, firstRow - overscanRows);
+  const endRow = Math.min(rowCount, firstRow + visibleRows + overscanRows);
+  const visible = items.slice(startRow * columns, endRow * columns);
+
+  // Rasterize what is on screen first; re-request after each batch in case a slot was recycled
+  useEffect(() => {
+    if (viewport.width > 0) {
+      atlas.request(visible.map(item => ({ id: item.id, svg: item.svg })));
+    }
+  }, [atlas, items, startRow, endRow, columns, version, viewport.width]);
+
+  const handleScroll = () => {
+    const row = Math.floor((containerRef.current?.scrollTop ?? 0) / rowHeight);
+    if (row !== firstRow) setFirstRow(row);
+  };
+
+  return (
+    <div ref={containerRef} className={`virtual-icon-grid ${className}`} onScroll={handleScroll}>
+      <div className="virtual-icon-grid-content" style={{ height: Math.max(0, rowCount * rowHeight - gap) }}>
+        {viewport.width > 0 && visible.map((item, i) => {
+          const index = startRow * columns + i;
+          const row = Math.floor(index / columns);
+          const column = index % columns;
+          return (
+            <div
+              key={item.id}
+              className={`virtual-icon-grid-cell ${cellClassName}`}
+              style={{
+                top: row * rowHeight,
+                left: column * (cellWidth + gap),
+                width: cellWidth,
+                height: cellHeight
+              }}
+              onClick={() => onSelect(item)}
+              title={item.title ?? item.label}
+            >
+              <AtlasThumbnail atlas={atlas} id={item.id} size={iconSize} version={version} />
+              <span className={`virtual-icon-grid-label ${labelClassName}`}>{item.label}</span>
+              {item.badge && <span className={item.badgeClassName}>{item.badge}</span>}
+            </div>
+          );
+        })}
+      </div>
+    </div>
+  );
+}
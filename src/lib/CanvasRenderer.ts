@@ -1,6 +1,37 @@
 import JsBarcode from "jsbarcode";
 import QRCode from "qrcode";
 import { RichTextSegment } from "./types";
+import { rotateCanvas, canvasToBytes } from "./raster";
+import {
+  DEFAULT_MAX_FONT_SIZE,
+  DEFAULT_MIN_FONT_SIZE,
+  FitOptions,
+  FittedText,
+  FontAt,
+  TextMeasurer,
+  fitText,
+  searchFontSize,
+} from "./textFit";
+import {
+  InlineIcon,
+  RichTextLayout,
+  RichTextLayoutOptions,
+  layoutRichText,
+} from "./richTextLayout";
+import {
+  firstBaseline,
+  getIconScaleFactor,
+  placeTextIcon,
+  textIconFitOptions,
+} from "./labelLayout";
+
+const MAX_CACHED_ICONS = 200;
+const MAX_CACHED_LAYOUTS = 200;
+
+// On-screen size of the preview in CSS px per mm, independent of the print resolution
+export const PREVIEW_PX_PER_MM = 8;
+
+export type PreviewMode = "display" | "monochrome";
 
 export interface LabelDimensions {
   widthMm: number;
@@ -15,40 +46,205 @@ export interface TextOptions {
   alignment?: "left" | "center" | "right";
   bold?: boolean;
   italic?: boolean;
+  fit?: FitOptions; // Solve font size (and line breaks) to fit the label instead of using fontSize
 }
 
 export interface ImageOptions {
   file: File;
 }
 
+export interface RichTextOptions {
+  maxWidth?: number; // Wrap lines at spaces beyond this width (default: single line)
+  lineHeight?: number; // Line advance as a multiple of font size
+  fit?: FitOptions; // Solve the font size (maxLines > 1 allows wrapping)
+}
+
+export interface TextIconStyle {
+  allCaps?: boolean;
+  smallCaps?: boolean;
+  italic?: boolean;
+  fontWeight?: number;
+}
+
+/**
+ * Font builder used by drawText
+ */
+export function textFontAt(options: Pick<TextOptions, "fontFamily" | "bold" | "italic">): FontAt {
+  const weight = options.bold ? "bold" : "normal";
+  const style = options.italic ? "italic" : "normal";
+  return (size) => `${style} ${weight} ${size}px ${options.fontFamily || "Arial"}`;
+}
+
+/**
+ * Font builder used by drawTextWithIcon
+ */
+export function textIconFontAt(fontFamily: string, options?: TextIconStyle): FontAt {
+  const fontWeight = options?.fontWeight || 400;
+  const fontStyle = options?.italic ? "italic" : "normal";
+  const fontVariant = options?.smallCaps ? "small-caps" : "normal";
+  return (size) => `${fontStyle} ${fontVariant} ${fontWeight} ${size}px ${fontFamily}`;
+}
+
+/**
+ * Paint laid out rich text centered on a label of the given size
+ */
+function paintRichText(
+  ctx: CanvasRenderingContext2D,
+  layout: RichTextLayout,
+  font: FontAt,
+  width: number,
+  height: number
+): void {
+  // Center positioning (no rotation for preview)
+  ctx.translate(width / 2, height / 2);
+
+  // Set text properties
+  ctx.fillStyle = "black";
+  ctx.font = font(layout.fontSize);
+  ctx.textBaseline = "alphabetic";
+  ctx.textAlign = "left";
+
+  // Center the block on its actual bounds, each line horizontally
+  let baseline = -layout.height / 2 + layout.lines[0].ascent;
+
+  for (const line of layout.lines) {
+    const lineX = -line.width / 2;
+
+    for (const run of line.runs) {
+      if (run.type === "text") {
+        ctx.fillText(run.text, lineX + run.x, baseline);
+      } else if (run.icon.image) {
+        // Align icon baseline with text baseline
+        const y = baseline - run.size * 0.8;
+        ctx.drawImage(run.icon.image, lineX + run.x, y - run.drawHeight / 2, run.drawWidth, run.drawHeight);
+      } else {
+        // Draw placeholder if icon fails
+        ctx.fillRect(lineX + run.x, baseline - run.size * 0.8, run.size, run.size);
+      }
+    }
+
+    baseline += layout.lineAdvance;
+  }
+}
+
+/**
+ * A vertical slice of the label, in preview (unrotated) pixel coordinates
+ */
+export interface RenderBand {
+  x: number;
+  width: number;
+}
+
+/**
+ * Paints the label in full-label coordinates; the context is already
+ * translated and clipped to the band being rendered.
+ */
+export type BandPainter = (
+  ctx: CanvasRenderingContext2D,
+  band: RenderBand
+) => void | Promise<void>;
+
+/**
+ * Paints a laid out label in label pixel coordinates (print resolution).
+ * Synchronous: everything async (images, fonts, layout) is resolved first.
+ */
+export type LabelPainter = (ctx: CanvasRenderingContext2D) => void;
+
+/**
+ * Renders labels to two targets from one layout:
+ *
+ * - the on-screen canvas, at PREVIEW_PX_PER_MM times devicePixelRatio,
+ *   repainted on every edit
+ * - an offscreen raster at the print resolution (pixelsPerMm), painted
+ *   only when printing or showing the 1-bit preview
+ *
+ * Each draw method does its async work and layout once and keeps a
+ * LabelPainter; both targets run the same painter, scaled to their size.
+ */
 export class CanvasRenderer {
-  private canvas: HTMLCanvasElement;
+  private canvas: HTMLCanvasElement; // On-screen preview
   private ctx: CanvasRenderingContext2D;
   private dimensions: LabelDimensions;
+  private widthPx = 0; // Label size at print resolution
+  private heightPx = 0;
+  private painter: LabelPainter = () => {};
+  private printCanvas: HTMLCanvasElement | null = null;
+  private printStale = true;
+  private monochromeCanvas: HTMLCanvasElement | null = null;
+  private monochromeStale = true;
+  private previewMode: PreviewMode = "display";
+  private measurer: TextMeasurer;
+  private iconImages = new Map<string, Promise<HTMLImageElement>>(); // Keyed by SVG source
+  private richTextLayouts = new Map<string, RichTextLayout | null>();
 
   constructor(canvas: HTMLCanvasElement, dimensions: LabelDimensions) {
     this.canvas = canvas;
     this.ctx = canvas.getContext("2d")!;
     this.dimensions = dimensions;
+    this.measurer = new TextMeasurer(this.ctx);
     this.updateSize();
+
+    // Cached line boxes were measured with fallback fonts until web fonts load
+    document.fonts?.addEventListener("loadingdone", () => this.richTextLayouts.clear());
+  }
+
+  /**
+   * Find the largest font size at which text fits the label
+   *
+   * maxWidth/maxHeight default to the current canvas; pass maxWidth
+   * Infinity to size by height only (auto width labels).
+   */
+  fitText(text: string, font: FontAt, fit: FitOptions = {}): FittedText {
+    return fitText(this.measurer, text, font, {
+      ...fit,
+      maxWidth: fit.maxWidth ?? this.widthPx,
+      maxHeight: fit.maxHeight ?? this.heightPx,
+    });
   }
 
   /**
-   * Update canvas size based on label dimensions
+   * Fit single-line text followed by an icon (see drawTextWithIcon)
+   *
+   * The icon keeps its size relative to the font.
+   */
+  fitTextWithIcon(
+    text: string,
+    fontSize: number,
+    font: FontAt,
+    iconSvg: string,
+    iconSize: number,
+    fit: FitOptions = {}
+  ): FittedText {
+    const iconRatio = iconSvg
+      ? (iconSize * getIconScaleFactor(iconSvg)) / fontSize
+      : 0;
+    return this.fitText(text, font, textIconFitOptions(fit, iconRatio));
+  }
+
+  /**
+   * Update label and preview canvas size based on label dimensions
    */
   updateSize(): void {
     // Direct mapping (no rotation for preview)
-    this.canvas.width = Math.round(
-      this.dimensions.widthMm * this.dimensions.pixelsPerMm
-    );
-    this.canvas.height = Math.round(
-      this.dimensions.heightMm * this.dimensions.pixelsPerMm
-    );
+    this.widthPx = Math.round(this.dimensions.widthMm * this.dimensions.pixelsPerMm);
+    this.heightPx = Math.round(this.dimensions.heightMm * this.dimensions.pixelsPerMm);
 
     // Ensure width is multiple of 8 for proper byte alignment
-    if (this.canvas.width % 8 !== 0) {
-      this.canvas.width = Math.ceil(this.canvas.width / 8) * 8;
+    if (this.widthPx % 8 !== 0) {
+      this.widthPx = Math.ceil(this.widthPx / 8) * 8;
     }
+
+    // The preview shows the same label area at screen resolution
+    const cssPxPerLabelPx = PREVIEW_PX_PER_MM / this.dimensions.pixelsPerMm;
+    const cssWidth = this.widthPx * cssPxPerLabelPx;
+    const cssHeight = this.heightPx * cssPxPerLabelPx;
+    const dpr = window.devicePixelRatio || 1;
+    this.canvas.width = Math.max(1, Math.round(cssWidth * dpr));
+    this.canvas.height = Math.max(1, Math.round(cssHeight * dpr));
+    this.canvas.style.width = `${cssWidth}px`;
+    this.canvas.style.height = `${cssHeight}px`;
+
+    this.invalidate();
   }
 
   /**
@@ -60,108 +256,167 @@ export class CanvasRenderer {
   }
 
   /**
-   * Clear canvas to white
+   * Show the label as designed, or as the thresholded print raster
+   */
+  setPreviewMode(mode: PreviewMode): void {
+    if (mode === this.previewMode) return;
+    this.previewMode = mode;
+    this.paintPreview();
+  }
+
+  /**
+   * Clear the label to white
    */
   clear(): void {
-    this.ctx.fillStyle = "white";
-    this.ctx.fillRect(0, 0, this.canvas.width, this.canvas.height);
+    this.commit(() => {});
   }
 
   /**
-   * Draw text on the canvas
+   * Make a painter the current label and repaint the preview
    */
-  drawText(options: TextOptions): void {
-    this.clear();
+  private commit(painter: LabelPainter): void {
+    this.painter = painter;
+    this.invalidate();
+    this.paintPreview();
+  }
 
-    this.ctx.save();
+  private invalidate(): void {
+    this.printStale = true;
+    this.monochromeStale = true;
+  }
+
+  /**
+   * Paint the on-screen canvas from the current painter
+   */
+  private paintPreview(): void {
+    const ctx = this.ctx;
+    ctx.setTransform(1, 0, 0, 1, 0, 0);
+    ctx.fillStyle = "white";
+    ctx.fillRect(0, 0, this.canvas.width, this.canvas.height);
+    if (this.widthPx === 0 || this.heightPx === 0) return;
+
+    ctx.save();
+    if (this.previewMode === "monochrome") {
+      // Exactly the printed dots, enlarged without smoothing
+      ctx.imageSmoothingEnabled = false;
+      ctx.drawImage(this.getMonochromeCanvas(), 0, 0, this.canvas.width, this.canvas.height);
+    } else {
+      ctx.scale(this.canvas.width / this.widthPx, this.canvas.height / this.heightPx);
+      this.painter(ctx);
+    }
+    ctx.restore();
+  }
+
+  /**
+   * The label at print resolution, ready for PhomemoD30Printer.encode
+   *
+   * Painted on first use after a change, then reused.
+   */
+  getPrintCanvas(): HTMLCanvasElement {
+    this.printCanvas ??= document.createElement("canvas");
+    if (!this.printStale) return this.printCanvas;
+
+    const canvas = this.printCanvas;
+    canvas.width = this.widthPx;
+    canvas.height = this.heightPx;
+    const ctx = canvas.getContext("2d")!;
+    ctx.fillStyle = "white";
+    ctx.fillRect(0, 0, canvas.width, canvas.height);
+    ctx.save();
+    this.painter(ctx);
+    ctx.restore();
+
+    this.printStale = false;
+    return canvas;
+  }
+
+  /**
+   * The print raster thresholded like packPixels, i.e. what the printer will print
+   */
+  getMonochromeCanvas(): HTMLCanvasElement {
+    this.monochromeCanvas ??= document.createElement("canvas");
+    if (!this.monochromeStale) return this.monochromeCanvas;
+
+    const source = this.getPrintCanvas();
+    const canvas = this.monochromeCanvas;
+    canvas.width = source.width;
+    canvas.height = source.height;
+    if (source.width > 0 && source.height > 0) {
+      const image = source.getContext("2d")!.getImageData(0, 0, source.width, source.height);
+      const data = image.data;
+      for (let i = 0; i < data.length; i += 4) {
+        const value = (data[i] + data[i + 1] + data[i + 2]) / 3 < 128 ? 0 : 255;
+        data[i] = data[i + 1] = data[i + 2] = value;
+        data[i + 3] = 255;
+      }
+      canvas.getContext("2d")!.putImageData(image, 0, 0);
+    }
+
+    this.monochromeStale = false;
+    return canvas;
+  }
 
-    // Center positioning (no rotation for preview)
-    this.ctx.translate(this.canvas.width / 2, this.canvas.height / 2);
+  /**
+   * Draw text on the canvas
+   */
+  drawText(options: TextOptions): void {
+    const fontAt = textFontAt(options);
 
-    // Set text properties
-    this.ctx.fillStyle = "black";
-    const weight = options.bold ? "bold" : "normal";
-    const style = options.italic ? "italic" : "normal";
-    this.ctx.font = `${style} ${weight} ${options.fontSize}px ${
-      options.fontFamily || "Arial"
-    }`;
-    this.ctx.textBaseline = "alphabetic";
+    // Fit to the label, possibly over several lines
+    const fitted = options.fit
+      ? this.fitText(options.text, fontAt, options.fit)
+      : null;
+    const fontSize = fitted?.fontSize ?? options.fontSize;
+    const font = fontAt(fontSize);
 
     // Handle text alignment
+    let textAlign: CanvasTextAlign;
     switch (options.alignment) {
       case "left":
-        this.ctx.textAlign = "left";
+        textAlign = "left";
         break;
       case "right":
-        this.ctx.textAlign = "right";
+        textAlign = "right";
         break;
       case "center":
       default:
-        this.ctx.textAlign = "center";
+        textAlign = "center";
         break;
     }
 
-    // No wrapping - keep text on single line
-    const lines = [options.text];
-
-    // Calculate actual text bounds for proper centering
-    const lineHeight = options.fontSize * 1.2;
-
-    // Measure the actual bounds of all text to center based on actual content
-    let maxAscent = 0;
-    let maxDescent = 0;
-
-    lines.forEach((line) => {
-      const metrics = this.ctx.measureText(line);
-      maxAscent = Math.max(
-        maxAscent,
-        metrics.actualBoundingBoxAscent ||
-          metrics.fontBoundingBoxAscent ||
-          options.fontSize * 0.8
-      );
-      maxDescent = Math.max(
-        maxDescent,
-        metrics.actualBoundingBoxDescent ||
-          metrics.fontBoundingBoxDescent ||
-          options.fontSize * 0.2
-      );
-    });
+    // Explicit line breaks only, unless the fit solver wrapped the text
+    const lines = fitted?.lines ?? options.text.split("\n");
 
     // Center based on actual text bounds, not font metrics
-    const actualTextHeight = maxAscent + maxDescent;
-    const verticalOffset = -actualTextHeight / 2 + maxAscent;
-    const startY = verticalOffset - ((lines.length - 1) * lineHeight) / 2;
+    const lineHeightRatio = options.fit?.lineHeight ?? 1.2;
+    const lineHeight = fontSize * lineHeightRatio;
+    this.ctx.font = font;
+    const startY = firstBaseline(this.ctx, lines, fontSize, lineHeightRatio);
 
     // Debug logging
-    console.log("Text-only font:", this.ctx.font);
+    console.log("Text-only font:", font);
     console.log("Text-only centering:", {
       text: options.text,
       fontFamily: options.fontFamily,
-      fontSize: options.fontSize,
-      actualBoundingBoxAscent: lines.map(
-        (l) => this.ctx.measureText(l).actualBoundingBoxAscent
-      ),
-      fontBoundingBoxAscent: lines.map(
-        (l) => this.ctx.measureText(l).fontBoundingBoxAscent
-      ),
-      actualBoundingBoxDescent: lines.map(
-        (l) => this.ctx.measureText(l).actualBoundingBoxDescent
-      ),
-      fontBoundingBoxDescent: lines.map(
-        (l) => this.ctx.measureText(l).fontBoundingBoxDescent
-      ),
-      maxAscent,
-      maxDescent,
-      actualTextHeight,
-      verticalOffset,
+      fontSize,
       startY,
     });
 
-    lines.forEach((line, i) => {
-      this.ctx.fillText(line, 0, startY + i * lineHeight);
-    });
+    const width = this.widthPx;
+    const height = this.heightPx;
+    this.commit((ctx) => {
+      // Center positioning (no rotation for preview)
+      ctx.translate(width / 2, height / 2);
 
-    this.ctx.restore();
+      ctx.fillStyle = "black";
+      ctx.font = font;
+      ctx.textBaseline = "alphabetic";
+      ctx.textAlign = textAlign;
+
+      lines.forEach((line, i) => {
+        ctx.fillText(line, 0, startY + i * lineHeight);
+      });
+    });
   }
 
 
@@ -169,47 +424,39 @@ export class CanvasRenderer {
    * Draw SVG icon on the canvas with optional label
    */
   async drawIcon(svgContent: string, label?: string): Promise<void> {
-    this.clear();
-
-    return new Promise((resolve, reject) => {
-      const img = new Image();
-
-      img.onload = () => {
-        this.ctx.save();
-        this.ctx.translate(this.canvas.width / 2, this.canvas.height / 2);
-
-        const iconSize = Math.min(this.canvas.width, this.canvas.height) * 0.6;
-        const yOffset = label ? -20 : 0;
-
-        // Draw icon
-        this.ctx.drawImage(
-          img,
-          -iconSize / 2,
-          -iconSize / 2 + yOffset,
-          iconSize,
-          iconSize
-        );
-
-        // Draw label if provided
-        if (label) {
-          this.ctx.fillStyle = "black";
-          this.ctx.font = "16px Arial";
-          this.ctx.textAlign = "center";
-          this.ctx.textBaseline = "top";
-          this.ctx.fillText(label, 0, iconSize / 2 + yOffset + 10);
-        }
-
-        this.ctx.restore();
-        URL.revokeObjectURL(img.src);
-        resolve();
-      };
+    let img: HTMLImageElement;
+    try {
+      img = await this.loadIcon(svgContent);
+    } catch {
+      this.clear();
+      throw new Error("Failed to load icon");
+    }
 
-      img.onerror = () => {
-        reject(new Error("Failed to load icon"));
-      };
+    const width = this.widthPx;
+    const height = this.heightPx;
+    this.commit((ctx) => {
+      ctx.translate(width / 2, height / 2);
+
+      const iconSize = Math.min(width, height) * 0.6;
+      const yOffset = label ? -20 : 0;
+
+      // Draw icon
+      ctx.drawImage(
+        img,
+        -iconSize / 2,
+        -iconSize / 2 + yOffset,
+        iconSize,
+        iconSize
+      );
 
-      const svgBlob = new Blob([svgContent], { type: "image/svg+xml" });
-      img.src = URL.createObjectURL(svgBlob);
+      // Draw label if provided
+      if (label) {
+        ctx.fillStyle = "black";
+        ctx.font = "16px Arial";
+        ctx.textAlign = "center";
+        ctx.textBaseline = "top";
+        ctx.fillText(label, 0, iconSize / 2 + yOffset + 10);
+      }
     });
   }
 
@@ -217,44 +464,45 @@ export class CanvasRenderer {
    * Draw barcode (CODE128)
    */
   async drawBarcode(data: string): Promise<void> {
-    this.clear();
+    const width = this.widthPx;
+    const height = this.heightPx;
 
-    return new Promise((resolve, reject) => {
-      try {
-        const tempCanvas = document.createElement("canvas");
-        JsBarcode(tempCanvas, data, {
-          format: "CODE128",
-          width: 2,
-          height: Math.floor(this.canvas.height * 0.7),
-          displayValue: true,
-          fontSize: 14,
-          margin: 10,
-        });
+    // Bars are rasterized once at print resolution and shared by both targets
+    const tempCanvas = document.createElement("canvas");
+    try {
+      JsBarcode(tempCanvas, data, {
+        format: "CODE128",
+        width: 2,
+        height: Math.floor(height * 0.7),
+        displayValue: true,
+        fontSize: 14,
+        margin: 10,
+      });
+    } catch (error) {
+      this.clear();
+      throw error;
+    }
 
-        this.ctx.save();
-        this.ctx.translate(this.canvas.width / 2, this.canvas.height / 2);
-
-        const scale = Math.min(
-          (this.canvas.width * 0.9) / tempCanvas.width,
-          (this.canvas.height * 0.9) / tempCanvas.height
-        );
-
-        const drawWidth = tempCanvas.width * scale;
-        const drawHeight = tempCanvas.height * scale;
-
-        this.ctx.drawImage(
-          tempCanvas,
-          -drawWidth / 2,
-          -drawHeight / 2,
-          drawWidth,
-          drawHeight
-        );
-
-        this.ctx.restore();
-        resolve();
-      } catch (error) {
-        reject(error);
-      }
+    const scale = Math.min(
+      (width * 0.9) / tempCanvas.width,
+      (height * 0.9) / tempCanvas.height
+    );
+
+    const drawWidth = tempCanvas.width * scale;
+    const drawHeight = tempCanvas.height * scale;
+
+    this.commit((ctx) => {
+      ctx.translate(width / 2, height / 2);
+
+      // Keep bar edges sharp when the preview scales them
+      ctx.imageSmoothingEnabled = false;
+      ctx.drawImage(
+        tempCanvas,
+        -drawWidth / 2,
+        -drawHeight / 2,
+        drawWidth,
+        drawHeight
+      );
     });
   }
 
@@ -262,90 +510,69 @@ export class CanvasRenderer {
    * Draw QR code
    */
   async drawQRCode(data: string): Promise<void> {
-    this.clear();
+    const width = this.widthPx;
+    const height = this.heightPx;
+    const size = Math.min(width, height) * 0.8;
 
+    let img: HTMLImageElement;
     try {
-      const size = Math.min(this.canvas.width, this.canvas.height) * 0.8;
       const qrDataUrl = await QRCode.toDataURL(data, {
         width: size,
         margin: 2,
         errorCorrectionLevel: "M",
       });
-
-      return new Promise((resolve, reject) => {
-        const img = new Image();
-
-        img.onload = () => {
-          this.ctx.save();
-          this.ctx.translate(this.canvas.width / 2, this.canvas.height / 2);
-
-          this.ctx.drawImage(img, -size / 2, -size / 2, size, size);
-
-          this.ctx.restore();
-          resolve();
-        };
-
-        img.onerror = () => {
-          reject(new Error("Failed to load QR code"));
-        };
-
-        img.src = qrDataUrl;
-      });
+      img = await this.loadImage(qrDataUrl, "Failed to load QR code");
     } catch (error) {
+      this.clear();
       throw new Error(`Failed to generate QR code: ${error}`);
     }
+
+    this.commit((ctx) => {
+      ctx.translate(width / 2, height / 2);
+
+      // Modules stay square in the enlarged preview
+      ctx.imageSmoothingEnabled = false;
+      ctx.drawImage(img, -size / 2, -size / 2, size, size);
+    });
   }
 
   /**
    * Draw uploaded image
    */
   async drawImage(file: File): Promise<void> {
-    this.clear();
+    let img: HTMLImageElement;
+    try {
+      const dataUrl = await new Promise<string>((resolve, reject) => {
+        const reader = new FileReader();
+        reader.onload = (event) => resolve(event.target?.result as string);
+        reader.onerror = () => reject(new Error("Failed to read file"));
+        reader.readAsDataURL(file);
+      });
+      img = await this.loadImage(dataUrl, "Failed to load image");
+    } catch (error) {
+      this.clear();
+      throw error;
+    }
 
-    return new Promise((resolve, reject) => {
-      const reader = new FileReader();
-
-      reader.onload = (event) => {
-        const img = new Image();
-
-        img.onload = () => {
-          this.ctx.save();
-          this.ctx.translate(this.canvas.width / 2, this.canvas.height / 2);
-
-          // Calculate scale to fit image within canvas
-          const scale =
-            Math.min(
-              this.canvas.width / img.width,
-              this.canvas.height / img.height
-            ) * 0.9;
-
-          const drawWidth = img.width * scale;
-          const drawHeight = img.height * scale;
-
-          this.ctx.drawImage(
-            img,
-            -drawWidth / 2,
-            -drawHeight / 2,
-            drawWidth,
-            drawHeight
-          );
-
-          this.ctx.restore();
-          resolve();
-        };
-
-        img.onerror = () => {
-          reject(new Error("Failed to load image"));
-        };
-
-        img.src = event.target?.result as string;
-      };
+    const width = this.widthPx;
+    const height = this.heightPx;
 
-      reader.onerror = () => {
-        reject(new Error("Failed to read file"));
-      };
+    // Calculate scale to fit image within canvas
+    const scale =
+      Math.min(width / img.width, height / img.height) * 0.9;
+
+    const drawWidth = img.width * scale;
+    const drawHeight = img.height * scale;
 
-      reader.readAsDataURL(file);
+    this.commit((ctx) => {
+      ctx.translate(width / 2, height / 2);
+      ctx.drawImage(
+        img,
+        -drawWidth / 2,
+        -drawHeight / 2,
+        drawWidth,
+        drawHeight
+      );
     });
   }
 
@@ -358,45 +585,37 @@ export class CanvasRenderer {
     fontFamily: string,
     iconSvg: string,
     iconSize: number,
-    options?: {
-      allCaps?: boolean;
-      smallCaps?: boolean;
-      italic?: boolean;
-      fontWeight?: number;
+    options?: TextIconStyle & {
+      fit?: FitOptions; // Solve the font size; the icon scales with it
     }
   ): Promise<void> {
-    this.clear();
-
     if (!text && !iconSvg) {
+      this.clear();
       return;
     }
 
-    this.ctx.save();
-
-    // Center positioning
-    this.ctx.translate(this.canvas.width / 2, this.canvas.height / 2);
-
     // Apply text transformations
     let displayText = text;
     if (options?.allCaps) {
       displayText = text.toUpperCase();
     }
 
-    // Set text properties
-    this.ctx.fillStyle = "black";
-
     // Build font string with weight, style, and variant
-    const fontWeight = options?.fontWeight || 400;
-    const fontStyle = options?.italic ? 'italic' : 'normal';
-    const fontVariant = options?.smallCaps ? 'small-caps' : 'normal';
+    const fontAt = textIconFontAt(fontFamily, options);
+
+    if (options?.fit) {
+      const fitted = this.fitTextWithIcon(displayText, fontSize, fontAt, iconSvg, iconSize, options.fit);
+      iconSize = (iconSize * fitted.fontSize) / fontSize;
+      fontSize = fitted.fontSize;
+    }
 
-    this.ctx.font = `${fontStyle} ${fontVariant} ${fontWeight} ${fontSize}px ${fontFamily}`;
-    this.ctx.textBaseline = "alphabetic";
+    const font = fontAt(fontSize);
 
     // Debug: log the font being used
-    console.log("Text+Icon font:", this.ctx.font);
+    console.log("Text+Icon font:", font);
 
     // Measure text (same logic as drawText method)
+    this.ctx.font = font;
     const textMetrics = this.ctx.measureText(displayText);
     const textWidth = textMetrics.width;
 
@@ -430,6 +649,8 @@ export class CanvasRenderer {
     });
 
     // Load icon first to get actual dimensions
+    let icon: { img: HTMLImageElement; x: number; y: number; width: number; height: number } | null = null;
+    let startX = -textWidth / 2;
     try {
       console.log(
         "Drawing icon, SVG length:",
@@ -437,92 +658,39 @@ export class CanvasRenderer {
         "Preview:",
         iconSvg?.substring(0, 100)
       );
-      const img = await this.loadSvgImage(iconSvg);
-
-      // Apply library-specific scale factor
-      const scaleFactor = this.getIconScaleFactor(iconSvg);
-      const scaledSize = iconSize * scaleFactor;
-
-      // Calculate aspect ratio and preserve it
-      const aspectRatio = img.width / img.height;
-      let drawWidth = scaledSize;
-      let drawHeight = scaledSize;
-
-      if (aspectRatio > 1) {
-        // Wide icon - constrain width, reduce height
-        drawHeight = scaledSize / aspectRatio;
-      } else if (aspectRatio < 1) {
-        // Tall icon - constrain height, reduce width
-        drawWidth = scaledSize * aspectRatio;
-      }
+      const img = await this.loadIcon(iconSvg);
 
-      // Add a small gap between text and icon (reduced from implicit spacing)
-      const gap = drawWidth * 0.05; // 5% of icon width as gap
-
-      // Now calculate total width with actual icon dimensions
-      const totalWidth = textWidth + gap + drawWidth;
-      const startX = -totalWidth / 2;
-
-      // Draw text (using exact same Y position as drawText for single line)
-      this.ctx.textAlign = "left";
-      this.ctx.fillText(displayText, startX, verticalOffset);
-
-      // Draw icon after text with gap, centered vertically (independent of text)
-      const iconX = startX + textWidth + gap;
-      const iconY = -drawHeight / 2;
-
-      this.ctx.drawImage(img, iconX, iconY, drawWidth, drawHeight);
+      // Library-specific scale factor, aspect ratio kept, icon after the text with a gap
+      const placement = placeTextIcon(textWidth, img.width, img.height, iconSize, getIconScaleFactor(iconSvg));
+      startX = placement.textX;
+      icon = { img, ...placement.icon };
     } catch (error) {
+      // Draw text only if icon fails, centered without icon
       console.error(
         "Failed to draw icon:",
         error,
         "SVG:",
         iconSvg?.substring(0, 200)
       );
-      // Draw text only if icon fails, centered without icon
-      const startX = -textWidth / 2;
-      this.ctx.textAlign = "left";
-      this.ctx.fillText(displayText, startX, verticalOffset);
     }
 
-    this.ctx.restore();
-  }
-
-  /**
-   * Detect icon library and return scale factor
-   * Lucide: 92/120 = 0.7667
-   * Phosphor: 100/120 = 0.8333 (increased from 97/120)
-   * Font Awesome: 85/120 = 0.7083
-   */
-  private getIconScaleFactor(svgContent: string): number {
-    let detectedLibrary = 'unknown';
-    let scaleFactor = 0.7667;
-
-    // Check for library-specific attributes in the SVG
-    // Check most specific patterns first
-    if (
-      svgContent.includes("font-awesome") ||
-      svgContent.includes("fa-")
-    ) {
-      // Font Awesome icons
-      detectedLibrary = 'font-awesome';
-      scaleFactor = 0.7083;
-    } else if (
-      svgContent.includes("phosphor") ||
-      svgContent.includes("Phosphor") ||
-      svgContent.includes("ph:")
-    ) {
-      // Phosphor icons often have "phosphor" or "Phosphor" in the SVG
-      detectedLibrary = 'phosphor';
-      scaleFactor = 0.8333;
-    } else if (svgContent.includes("lucide") || svgContent.includes("stroke-width")) {
-      // Lucide icons typically have stroke-width attribute
-      detectedLibrary = 'lucide';
-      scaleFactor = 0.7667;
-    }
+    const width = this.widthPx;
+    const height = this.heightPx;
+    this.commit((ctx) => {
+      // Center positioning
+      ctx.translate(width / 2, height / 2);
 
-    console.log('Icon library detected:', detectedLibrary, 'Scale factor:', scaleFactor);
-    return scaleFactor;
+      // Draw text (using exact same Y position as drawText for single line)
+      ctx.fillStyle = "black";
+      ctx.font = font;
+      ctx.textBaseline = "alphabetic";
+      ctx.textAlign = "left";
+      ctx.fillText(displayText, startX, verticalOffset);
+
+      if (icon) {
+        ctx.drawImage(icon.img, icon.x, icon.y, icon.width, icon.height);
+      }
+    });
   }
 
   /**
@@ -547,214 +715,290 @@ export class CanvasRenderer {
   }
 
   /**
-   * Draw rich text with inline icons
+   * Load an image from a URL (helper method)
    */
-  async drawRichText(
-    segments: RichTextSegment[],
-    fontSize: number,
-    fontFamily: string = "Arial"
-  ): Promise<void> {
-    this.clear();
-
-    if (segments.length === 0) {
-      return;
-    }
-
-    this.ctx.save();
-
-    // Center positioning (no rotation for preview)
-    this.ctx.translate(this.canvas.width / 2, this.canvas.height / 2);
-
-    // Set text properties
-    this.ctx.fillStyle = "black";
-    this.ctx.font = `${fontSize}px ${fontFamily}`;
-    this.ctx.textBaseline = "alphabetic";
+  private loadImage(src: string, errorMessage: string): Promise<HTMLImageElement> {
+    return new Promise((resolve, reject) => {
+      const img = new Image();
+      img.onload = () => resolve(img);
+      img.onerror = () => reject(new Error(errorMessage));
+      img.src = src;
+    });
+  }
 
-    // Measure total width and actual text bounds
-    let totalWidth = 0;
-    const segmentWidths: number[] = [];
-    let maxAscent = 0;
-    let maxDescent = 0;
+  /**
+   * Load an SVG icon once and reuse the decoded image across renders
+   */
+  private loadIcon(svgContent: string): Promise<HTMLImageElement> {
+    let image = this.iconImages.get(svgContent);
+    if (!image) {
+      image = this.loadSvgImage(svgContent).then(async (img) => {
+        await img.decode().catch(() => {
+          // Already decoded by onload in some browsers
+        });
+        return img;
+      });
+      // Let a failed icon be retried on the next render
+      image.catch(() => this.iconImages.delete(svgContent));
 
-    for (const segment of segments) {
-      if (segment.type === "text") {
-        const metrics = this.ctx.measureText(segment.content);
-        const width = metrics.width;
-        segmentWidths.push(width);
-        totalWidth += width;
-
-        // Track actual bounds
-        maxAscent = Math.max(
-          maxAscent,
-          metrics.actualBoundingBoxAscent ||
-            metrics.fontBoundingBoxAscent ||
-            fontSize * 0.8
-        );
-        maxDescent = Math.max(
-          maxDescent,
-          metrics.actualBoundingBoxDescent ||
-            metrics.fontBoundingBoxDescent ||
-            fontSize * 0.2
-        );
-      } else if (segment.type === "icon") {
-        const iconSize = segment.size || fontSize;
-        segmentWidths.push(iconSize);
-        totalWidth += iconSize;
-        // Icons take full height
-        maxAscent = Math.max(maxAscent, iconSize * 0.8);
-        maxDescent = Math.max(maxDescent, iconSize * 0.2);
+      if (this.iconImages.size >= MAX_CACHED_ICONS) {
+        this.iconImages.delete(this.iconImages.keys().next().value!);
       }
+      this.iconImages.set(svgContent, image);
     }
+    return image;
+  }
 
-    // Calculate vertical offset based on actual text bounds
-    const actualTextHeight = maxAscent + maxDescent;
-    const verticalOffset = -actualTextHeight / 2 + maxAscent;
+  /**
+   * Resolve all inline icons of rich text concurrently
+   */
+  private async resolveInlineIcons(segments: RichTextSegment[]): Promise<Map<string, InlineIcon>> {
+    const svgs = new Set<string>();
+    for (const segment of segments) {
+      if (segment.type === "icon") svgs.add(segment.iconDef.svg);
+    }
 
-    // Start drawing from left (centered horizontally)
-    let currentX = -totalWidth / 2;
-
-    // Draw each segment
-    for (let i = 0; i < segments.length; i++) {
-      const segment = segments[i];
-      const segmentWidth = segmentWidths[i];
-
-      if (segment.type === "text") {
-        // Draw text at baseline
-        this.ctx.textAlign = "left";
-        this.ctx.fillText(segment.content, currentX, verticalOffset);
-      } else if (segment.type === "icon") {
-        // Draw icon aligned with text
-        const iconSize = segment.size || fontSize;
+    const icons = new Map<string, InlineIcon>();
+    await Promise.all(
+      [...svgs].map(async (svg) => {
+        let image: HTMLImageElement | null = null;
         try {
-          // Align icon baseline with text baseline
-          await this.drawInlineIcon(
-            segment.iconDef.svg,
-            currentX,
-            verticalOffset - iconSize * 0.8,
-            iconSize
-          );
+          image = await this.loadIcon(svg);
         } catch (error) {
-          console.error("Failed to draw icon:", error);
-          // Draw placeholder if icon fails
-          this.ctx.fillRect(
-            currentX,
-            verticalOffset - iconSize * 0.8,
-            iconSize,
-            iconSize
-          );
+          console.error("Failed to load icon:", error);
         }
-      }
+        icons.set(svg, { image, scaleFactor: getIconScaleFactor(svg) });
+      })
+    );
+    return icons;
+  }
+
+  /**
+   * Lay out rich text, reusing line boxes for identical input
+   */
+  private layoutRichTextCached(
+    segments: RichTextSegment[],
+    icons: Map<string, InlineIcon>,
+    font: FontAt,
+    fontSize: number,
+    options: RichTextLayoutOptions
+  ): RichTextLayout | null {
+    const key = [
+      font(fontSize),
+      options.maxWidth,
+      options.maxLines,
+      options.lineHeight,
+      options.iconScale,
+      ...segments.map((segment) =>
+        segment.type === "text"
+          ? `t${segment.content}`
+          : `i${segment.size ?? ""}:${icons.get(segment.iconDef.svg)?.image ? "" : "!"}${segment.iconDef.svg}`
+      ),
+    ].join("\u0000");
 
-      currentX += segmentWidth;
+    if (this.richTextLayouts.has(key)) {
+      return this.richTextLayouts.get(key)!;
     }
 
-    this.ctx.restore();
+    const layout = layoutRichText(this.measurer, segments, icons, font, fontSize, options);
+    if (this.richTextLayouts.size >= MAX_CACHED_LAYOUTS) {
+      this.richTextLayouts.delete(this.richTextLayouts.keys().next().value!);
+    }
+    this.richTextLayouts.set(key, layout);
+    return layout;
   }
 
   /**
-   * Draw an SVG icon inline at a specific position
+   * Draw rich text with inline icons
+   *
+   * Icons are resolved concurrently first, then the text is laid out
+   * (optionally wrapped at maxWidth) and painted in one synchronous pass.
    */
-  private async drawInlineIcon(
-    svgContent: string,
-    x: number,
-    y: number,
-    size: number
+  async drawRichText(
+    segments: RichTextSegment[],
+    fontSize: number,
+    fontFamily: string = "Arial",
+    options: RichTextOptions = {}
   ): Promise<void> {
-    return new Promise((resolve, reject) => {
-      const img = new Image();
+    // Decode icons before repainting so the previous preview stays up meanwhile
+    const icons = await this.resolveInlineIcons(segments);
 
-      img.onload = () => {
-        // Apply library-specific scale factor
-        const scaleFactor = this.getIconScaleFactor(svgContent);
-        const scaledSize = size * scaleFactor;
-
-        // Calculate aspect ratio and preserve it
-        const aspectRatio = img.width / img.height;
-        let drawWidth = scaledSize;
-        let drawHeight = scaledSize;
-
-        if (aspectRatio > 1) {
-          // Wide icon - constrain width, reduce height
-          drawHeight = scaledSize / aspectRatio;
-        } else if (aspectRatio < 1) {
-          // Tall icon - constrain height, reduce width
-          drawWidth = scaledSize * aspectRatio;
-        }
+    if (segments.length === 0) {
+      this.clear();
+      return;
+    }
 
-        this.ctx.drawImage(img, x, y - drawHeight / 2, drawWidth, drawHeight);
-        URL.revokeObjectURL(img.src);
-        resolve();
-      };
+    const fontAt: FontAt = (size) => `${size}px ${fontFamily}`;
+    const lineHeight = options.fit?.lineHeight ?? options.lineHeight;
+    let layout: RichTextLayout | null = null;
+
+    if (options.fit) {
+      // Largest size whose layout fits the box; icons keep their size relative to the font
+      const fit = options.fit;
+      const maxWidth = fit.maxWidth ?? this.widthPx;
+      const maxHeight = fit.maxHeight ?? this.heightPx;
+      layout = searchFontSize(
+        fit.minFontSize ?? DEFAULT_MIN_FONT_SIZE,
+        fit.maxFontSize ?? DEFAULT_MAX_FONT_SIZE,
+        (size) => {
+          const candidate = this.layoutRichTextCached(segments, icons, fontAt, size, {
+            maxWidth,
+            maxLines: fit.maxLines ?? 1,
+            lineHeight,
+            iconScale: size / fontSize,
+          });
+          return candidate && candidate.width <= maxWidth && candidate.height <= maxHeight
+            ? candidate
+            : null;
+        }
+      );
+    }
 
-      img.onerror = () => {
-        reject(new Error("Failed to load icon"));
-      };
+    // Without fitting (or if nothing fits) use the given size
+    const finalLayout = layout ?? this.layoutRichTextCached(segments, icons, fontAt, fontSize, {
+      maxWidth: options.maxWidth,
+      lineHeight,
+    })!;
 
-      const svgBlob = new Blob([svgContent], { type: "image/svg+xml" });
-      img.src = URL.createObjectURL(svgBlob);
-    });
+    const width = this.widthPx;
+    const height = this.heightPx;
+    this.commit((ctx) => paintRichText(ctx, finalLayout, fontAt, width, height));
   }
 
   /**
    * Draw test pattern with ruler marks
    */
   drawTestPattern(): void {
-    this.clear();
+    const width = this.widthPx;
+    const height = this.heightPx;
+    const dimensions = this.dimensions;
+
+    this.commit((ctx) => {
+      ctx.translate(width / 2, height / 2);
+
+      // Draw border
+      ctx.strokeStyle = "black";
+      ctx.lineWidth = 2;
+      ctx.strokeRect(-width / 2 + 5, -height / 2 + 5, width - 10, height - 10);
+
+      // Draw ruler marks every 10mm
+      ctx.font = "10px Arial";
+      ctx.fillStyle = "black";
+      ctx.textAlign = "center";
+      ctx.textBaseline = "middle";
+
+      const widthMm = dimensions.widthMm;
+      for (let i = 0; i <= widthMm; i += 10) {
+        const x = -width / 2 + (i / widthMm) * width;
+        ctx.beginPath();
+        ctx.moveTo(x, -height / 2 + 5);
+        ctx.lineTo(x, -height / 2 + 15);
+        ctx.stroke();
+        ctx.fillText(`${i}mm`, x, -height / 2 + 25);
+      }
 
-    this.ctx.save();
-    this.ctx.translate(this.canvas.width / 2, this.canvas.height / 2);
-
-    // Draw border
-    this.ctx.strokeStyle = "black";
-    this.ctx.lineWidth = 2;
-    this.ctx.strokeRect(
-      -this.canvas.width / 2 + 5,
-      -this.canvas.height / 2 + 5,
-      this.canvas.width - 10,
-      this.canvas.height - 10
-    );
+      // Draw labels
+      ctx.font = "bold 14px Arial";
+      ctx.fillText("TEST PATTERN", 0, -10);
+      ctx.font = "12px Arial";
+      ctx.fillText(`${width}×${height}px`, 0, 10);
+      ctx.fillText(
+        `${dimensions.widthMm}×${dimensions.heightMm}mm @ ${dimensions.pixelsPerMm}px/mm`,
+        0,
+        25
+      );
+    });
+  }
+
+  /**
+   * Render a label band by band for streaming prints
+   *
+   * Yields packed 1-bit printer rows (already rotated) for each band, so a
+   * label longer than the browser's canvas size limit can be printed with
+   * PhomemoD30Printer.printStream while holding only one band in memory.
+   * Rows are ceil(height / 8) bytes wide, using the current label height.
+   *
+   * @param lengthPx - Total label length along the feed direction (preview x axis)
+   * @param paint - Draws the label; called once per band
+   * @param bandWidthPx - Band size in pixels (255 matches one GS v 0 block)
+   */
+  async *renderBands(
+    lengthPx: number,
+    paint: BandPainter,
+    bandWidthPx: number = 255
+  ): AsyncGenerator<Uint8Array> {
+    const bandCanvas = document.createElement("canvas");
+    bandCanvas.height = this.heightPx;
+    const rotatedCanvas = document.createElement("canvas");
+
+    for (let x = 0; x < lengthPx; x += bandWidthPx) {
+      const width = Math.min(bandWidthPx, lengthPx - x);
+      if (bandCanvas.width !== width) {
+        bandCanvas.width = width;
+      }
+
+      const ctx = bandCanvas.getContext("2d")!;
+      ctx.fillStyle = "white";
+      ctx.fillRect(0, 0, width, bandCanvas.height);
 
-    // Draw ruler marks every 10mm
-    this.ctx.font = "10px Arial";
-    this.ctx.fillStyle = "black";
-    this.ctx.textAlign = "center";
-    this.ctx.textBaseline = "middle";
-
-    const widthMm = this.dimensions.widthMm;
-    for (let i = 0; i <= widthMm; i += 10) {
-      const x = -this.canvas.width / 2 + (i / widthMm) * this.canvas.width;
-      this.ctx.beginPath();
-      this.ctx.moveTo(x, -this.canvas.height / 2 + 5);
-      this.ctx.lineTo(x, -this.canvas.height / 2 + 15);
-      this.ctx.stroke();
-      this.ctx.fillText(`${i}mm`, x, -this.canvas.height / 2 + 25);
+      ctx.save();
+      ctx.translate(-x, 0);
+      await paint(ctx, { x, width });
+      ctx.restore();
+
+      yield canvasToBytes(rotateCanvas(bandCanvas, rotatedCanvas));
     }
+  }
 
-    // Draw labels
-    this.ctx.font = "bold 14px Arial";
-    this.ctx.fillText("TEST PATTERN", 0, -10);
-    this.ctx.font = "12px Arial";
-    this.ctx.fillText(`${this.canvas.width}×${this.canvas.height}px`, 0, 10);
-    this.ctx.fillText(
-      `${this.dimensions.widthMm}×${this.dimensions.heightMm}mm @ ${this.dimensions.pixelsPerMm}px/mm`,
-      0,
-      25
-    );
+  /**
+   * Build a band painter for a single-line text banner
+   *
+   * Returns the banner length so it can be passed to renderBands.
+   */
+  textBanner(
+    options: TextOptions,
+    paddingPx: number = 0
+  ): { lengthPx: number; paint: BandPainter } {
+    const font = textFontAt(options)(options.fontSize);
 
+    this.ctx.save();
+    this.ctx.font = font;
+    const metrics = this.ctx.measureText(options.text);
     this.ctx.restore();
+
+    const ascent =
+      metrics.actualBoundingBoxAscent ||
+      metrics.fontBoundingBoxAscent ||
+      options.fontSize * 0.8;
+    const descent =
+      metrics.actualBoundingBoxDescent ||
+      metrics.fontBoundingBoxDescent ||
+      options.fontSize * 0.2;
+    const baselineY = this.heightPx / 2 - (ascent + descent) / 2 + ascent;
+
+    return {
+      lengthPx: Math.ceil(metrics.width + paddingPx * 2),
+      paint: (ctx) => {
+        ctx.fillStyle = "black";
+        ctx.font = font;
+        ctx.textAlign = "left";
+        ctx.textBaseline = "alphabetic";
+        ctx.fillText(options.text, paddingPx, baselineY);
+      },
+    };
   }
 
   /**
-   * Get canvas element
+   * Get the on-screen preview canvas
    */
   getCanvas(): HTMLCanvasElement {
     return this.canvas;
   }
 
   /**
-   * Get canvas dimensions info
+   * Get label dimensions info (print resolution)
    */
   getDimensionsInfo(): string {
-    return `${this.canvas.width}×${this.canvas.height}px`;
+    return `${this.widthPx}×${this.heightPx}px`;
   }
 }
@@ -10,6 +10,39 @@
  * - Proper ESC/POS command sequences
  */
 
+import { PrintMetrics, PrintJobMetrics, PrintJobRecorder, PrintProgress } from './printMetrics';
+import { rotateCanvas, canvasToBytes } from './raster';
+import { PrintJournal, resumeStartBlock } from './printJournal';
+import {
+  PrinterState,
+  PrinterStatusMonitor,
+  STATUS_CHARACTERISTIC_UUID,
+  STATUS_QUERY,
+  getBlockedReason
+} from './printerStatus';
+import {
+  EncodeOptions,
+  EncodedBlock,
+  EncodedJob,
+  FooterMode,
+  JobCoverage,
+  LabelRaster,
+  MediaType,
+  PrintProfile,
+  countLabels,
+  countLabelsFrom,
+  encodeLabels,
+  frameRows,
+  getFooter,
+  getHeaderData,
+  jobByteLength,
+  jobRasterBytes,
+  toHex
+} from './escpos';
+
+export type { FooterMode, MediaType } from './escpos';
+export type { PrinterState } from './printerStatus';
+
 export interface PrinterDebugInfo {
   canvasWidth: number;
   canvasHeight: number;
@@ -20,9 +53,16 @@ export interface PrinterDebugInfo {
   pixelsPerMm: number;
   headerBytes: string;
   footerBytes: string;
+  profile?: PrintProfile; // Speed/density the job was sent with (not for streamed jobs)
+  coverage?: JobCoverage;
+  labels?: number; // Labels printed by the job (copies and packed labels)
+  metrics?: PrintJobMetrics; // Only present when a metrics session is attached
 }
 
-export type PrinterStatus = 'disconnected' | 'connecting' | 'connected' | 'printing';
+export type PrinterStatus = 'disconnected' | 'connecting' | 'connected' | 'printing' | 'paused';
+
+// How long a job waits for paper/cover/overheat/buffer to clear before it is aborted
+const READY_TIMEOUT_MS = 60000;
 
 export class PhomemoD30Printer {
   private characteristic: BluetoothRemoteGATTCharacteristic | null = null;
@@ -31,9 +71,15 @@ export class PhomemoD30Printer {
   private readonly PACKET_SIZE = 128;
   private readonly SERVICE_UUID = '0000ff00-0000-1000-8000-00805f9b34fb';
   private readonly CHARACTERISTIC_UUID = '0000ff02-0000-1000-8000-00805f9b34fb';
+  private monitor: PrinterStatusMonitor | null = null; // null when the printer has no status notifications
 
   public status: PrinterStatus = 'disconnected';
-  public onStatusChange?: (status: PrinterStatus) => void;
+  public printerState: PrinterState | null = null;
+  public onStatusChange?: (status: PrinterStatus, printerState: PrinterState | null) => void;
+  public onProgress?: (progress: PrintProgress) => void;
+  public metrics: PrintMetrics | null = null; // Attach a session to enable instrumentation
+  public journal: PrintJournal | null = null; // Attach to make journaled jobs resumable
+  private encodeRecorders = new WeakMap<EncodedJob, PrintJobRecorder>(); // Rotate/pack timings awaiting printJob
 
   /**
    * Connect to the Phomemo D30 printer via Web Bluetooth
@@ -55,6 +101,8 @@ export class PhomemoD30Printer {
       const service = await server.getPrimaryService(this.SERVICE_UUID);
       this.characteristic = await service.getCharacteristic(this.CHARACTERISTIC_UUID);
 
+      await this.startStatusMonitor(service);
+
       this.setStatus('connected');
     } catch (error) {
       this.setStatus('disconnected');
@@ -67,6 +115,9 @@ export class PhomemoD30Printer {
    * Disconnect from the printer
    */
   disconnect(): void {
+    this.monitor?.stop();
+    this.monitor = null;
+    this.printerState = null;
     if (this.device?.gatt?.connected) {
       this.device.gatt.disconnect();
     }
@@ -76,350 +127,486 @@ export class PhomemoD30Printer {
   }
 
   /**
-   * Get header command sequence
+   * Subscribe to status notifications and ask for the current state
    *
-   * Based on M110/M120/M220 protocol from phomemo-tools
-   * These printers (and likely D30) support media type settings
+   * Without notifications the transmit loop falls back to fixed delays.
    */
-  private getHeaderData(mediaType: 'gaps' | 'continuous' | 'marks' = 'gaps'): Uint8Array {
-    let mediaCode: number;
-    switch (mediaType) {
-      case 'gaps':
-        mediaCode = 0x0a; // Label with gaps (default)
-        break;
-      case 'continuous':
-        mediaCode = 0x0b; // Continuous
-        break;
-      case 'marks':
-        mediaCode = 0x26; // Label with marks
-        break;
-    }
+  private async startStatusMonitor(service: BluetoothRemoteGATTService): Promise<void> {
+    try {
+      const statusCharacteristic = await service.getCharacteristic(STATUS_CHARACTERISTIC_UUID);
+      const monitor = new PrinterStatusMonitor(statusCharacteristic);
+      monitor.onChange = (state) => {
+        this.printerState = state;
+        this.onStatusChange?.(this.status, state);
+      };
+      await monitor.start();
 
-    return new Uint8Array([
-      0x1b, 0x4e, 0x0d, 0x05,  // Print Speed (5 = Fast)
-      0x1b, 0x4e, 0x04, 0x0f,  // Print Density (0x0f = max)
-      0x1f, 0x11, mediaCode    // Media Type
-    ]);
+      this.monitor = monitor;
+      this.printerState = monitor.state;
+      await this.characteristic!.writeValueWithResponse(STATUS_QUERY as BufferSource);
+    } catch (error) {
+      this.monitor = null;
+      console.warn('Printer status notifications unavailable, using fixed delays:', error);
+    }
   }
 
   /**
-   * Get block marker for raster image data
-   *
-   * GS v 0 command (0x1d 0x76 0x30):
-   * - Print raster bit image
-   * - Mode: 0 (normal), 1 (double width), 2 (double height), 3 (quadruple)
-   * - Width in bytes (16-bit little-endian)
-   * - Height in pixels (16-bit little-endian)
+   * Encode a canvas into a print job without sending it
    *
-   * Note: Maximum height per block is 255 lines
+   * The canvas is rotated 90° for the print head and packed to 1-bit rows.
+   * With options.copies the raster is packed once and repeated in the job.
    */
-  private getBlockMarker(bytesPerRow: number, lines: number): Uint8Array {
-    // Clamp lines to maximum of 255 per block
-    const blockLines = Math.min(lines, 255);
-
-    return new Uint8Array([
-      0x1d, 0x76, 0x30,              // GS v 0 - Print raster bit image
-      0x00,                          // Mode: 0 (normal)
-      bytesPerRow & 0xFF,            // Width low byte
-      (bytesPerRow >> 8) & 0xFF,     // Width high byte
-      blockLines & 0xFF,             // Height low byte
-      (blockLines >> 8) & 0xFF       // Height high byte
-    ]);
+  encode(canvas: HTMLCanvasElement, options: EncodeOptions = {}): EncodedJob {
+    return this.encodeBatch([{ canvas, copies: options.copies }], options);
   }
 
   /**
-   * Get footer command sequence
+   * Encode several labels into one continuous job (see escpos encodeLabels)
    *
-   * Based on M110/M120/M220 protocol from phomemo-tools
-   * This is what those printers use to end a print job
-   *
-   * @param extraFeedMm - Additional mm to feed after printing (for easy tear-off)
+   * Each canvas is rotated and packed once, however many copies it has.
    */
-  private getFooterData(extraFeedMm: number = 0): Uint8Array {
-    const footer = [
-      0x1f, 0xf0, 0x05, 0x00,  // Phomemo end sequence 1
-      0x1f, 0xf0, 0x03, 0x00   // Phomemo end sequence 2
-    ];
-
-    // Add extra feed if requested (convert mm to lines, ~0.125mm per line for 203dpi)
-    if (extraFeedMm > 0) {
-      const feedLines = Math.round(extraFeedMm * 8); // 8 pixels per mm
-      footer.push(0x1b, 0x64, feedLines);  // ESC d n - Feed n lines
+  encodeBatch(labels: { canvas: HTMLCanvasElement; copies?: number }[], options: EncodeOptions = {}): EncodedJob {
+    const job = this.metrics?.beginJob();
+    const encoded = encodeLabels(
+      labels.map(label => ({ ...this.rasterize(label.canvas, job), copies: label.copies })),
+      options
+    );
+    if (job) {
+      this.encodeRecorders.set(encoded, job);
     }
-
-    return new Uint8Array(footer);
+    return encoded;
   }
 
-  /**
-   * Alternative footer with NO extra feed
-   * Use this if the standard footer still causes issues
-   */
-  private getFooterDataNoFeed(): Uint8Array {
-    return new Uint8Array([
-      // Try form feed or cut command to stop the printer
-      0x1b, 0x64, 0x00,  // ESC d 0 - Feed 0 lines (might trigger cut/stop)
-
-      // Phomemo-specific end sequence (from phomemo-tools)
-      0x1f, 0x11, 0x08,
-      0x1f, 0x11, 0x0e,
-      0x1f, 0x11, 0x07,
-      0x1f, 0x11, 0x09
-    ]);
-  }
+  private rasterize(canvas: HTMLCanvasElement, job?: PrintJobRecorder): LabelRaster {
+    // Rotate canvas 90° for vertical printing
+    const endRotate = job?.begin('rotate');
+    const rotatedCanvas = rotateCanvas(canvas);
+    endRotate?.();
 
-  /**
-   * Alternative footer 2 - Try form feed
-   */
-  private getFooterDataFormFeed(): Uint8Array {
-    return new Uint8Array([
-      0x0c,  // FF - Form feed (page eject)
-
-      // Phomemo-specific end sequence
-      0x1f, 0x11, 0x08,
-      0x1f, 0x11, 0x0e,
-      0x1f, 0x11, 0x07,
-      0x1f, 0x11, 0x09
-    ]);
-  }
+    // Convert rotated canvas to monochrome byte array
+    const endPack = job?.begin('pack');
+    const imageData = canvasToBytes(rotatedCanvas);
+    endPack?.();
 
-  /**
-   * Alternative footer 3 - Try GS V (cut)
-   */
-  private getFooterDataCut(): Uint8Array {
-    return new Uint8Array([
-      0x1d, 0x56, 0x00,  // GS V - Cut paper (full cut)
-
-      // Phomemo-specific end sequence
-      0x1f, 0x11, 0x08,
-      0x1f, 0x11, 0x0e,
-      0x1f, 0x11, 0x07,
-      0x1f, 0x11, 0x09
-    ]);
+    return { raster: imageData, bytesPerRow: Math.ceil(rotatedCanvas.width / 8) };
   }
 
   /**
-   * Alternative footer 4 - EXACT match to original HTML code
-   * This is what was in the working example (phomemo-tool-example.py line 565)
+   * Print canvas to the Phomemo D30 printer
+   *
+   * @param canvas - HTML canvas element containing the label design
+   * @param widthMm - Label width in millimeters (actual physical dimension)
+   * @param heightMm - Label height in millimeters (actual physical dimension)
+   * @param footerMode - Which footer command sequence to use
    */
-  private getFooterDataSimple(): Uint8Array {
-    return new Uint8Array([
-      0x1b, 0x64, 0x00  // ESC d 0 - Feed 0 lines ONLY, no Phomemo sequence
-    ]);
-  }
+  async print(
+    canvas: HTMLCanvasElement,
+    widthMm: number,
+    heightMm: number,
+    footerMode: FooterMode = 'standard',
+    mediaType: MediaType = 'gaps',
+    extraFeedMm: number = 0
+  ): Promise<PrinterDebugInfo> {
+    if (!this.characteristic) {
+      throw new Error('Not connected to printer');
+    }
 
-  /**
-   * Alternative footer 5 - Try ESC @ again to reset
-   */
-  private getFooterDataReset(): Uint8Array {
-    return new Uint8Array([
-      0x1b, 0x40  // ESC @ - Initialize printer (might stop current job)
-    ]);
+    const job = this.metrics?.beginJob();
+    const encoded = encodeLabels([this.rasterize(canvas, job)], { footerMode, mediaType, extraFeedMm });
+    return this.transmit(encoded, widthMm, heightMm, job);
   }
 
   /**
-   * Alternative footer 6 - Try multiple end commands
+   * Print an already encoded job (see encode), e.g. a compiled job replayed from history
+   *
+   * @param journalId - Journal entry of this job (see PrintJournal.enqueue); progress is checkpointed
    */
-  private getFooterDataMulti(): Uint8Array {
-    return new Uint8Array([
-      0x1b, 0x64, 0x00,  // ESC d 0
-      0x1b, 0x40,        // ESC @ - Reset
-      0x0c               // Form feed
-    ]);
+  async printJob(
+    encoded: EncodedJob,
+    widthMm?: number,
+    heightMm?: number,
+    journalId?: string
+  ): Promise<PrinterDebugInfo> {
+    // Continue the metrics of encode() when this job was encoded here
+    const job = this.encodeRecorders.get(encoded) ?? this.metrics?.beginJob();
+    this.encodeRecorders.delete(encoded);
+
+    return this.transmit(
+      encoded,
+      widthMm ?? (encoded.bytesPerRow * 8) / this.pixelsPerMm,
+      heightMm ?? encoded.lines / this.pixelsPerMm,
+      job,
+      journalId
+    );
   }
 
   /**
-   * Alternative footer 7 - NO footer at all
+   * Continue a journaled job where it was interrupted
+   *
+   * Labels finished before the interruption are skipped. The label that was
+   * in flight is sent again from its first block (its separator first feeds
+   * past the partly printed one), since resuming mid-label would print its
+   * remaining rows as a fragment. A job that already got as far as its
+   * footer is only marked done.
    */
-  private getFooterDataNone(): Uint8Array {
-    return new Uint8Array([]);
+  async resumeJob(journalId: string): Promise<PrinterDebugInfo | null> {
+    if (!this.characteristic) {
+      throw new Error('Not connected to printer');
+    }
+    if (!this.journal) {
+      throw new Error('No print journal attached');
+    }
+
+    const entry = await this.journal.get(journalId);
+    if (entry.state === 'done') {
+      return null;
+    }
+    if (entry.checkpoint > entry.blockCount) {
+      await this.journal.complete(journalId);
+      return null;
+    }
+
+    const encoded = await this.journal.loadJob(journalId);
+    const startUnit = resumeStartBlock(encoded, entry.checkpoint);
+    return this.transmit(encoded, entry.widthMm, entry.heightMm, this.metrics?.beginJob(), journalId, startUnit);
   }
 
   /**
-   * Convert canvas to 1-bit monochrome byte array
-   * Each byte represents 8 horizontal pixels (MSB first)
-   */
-  /**
-   * Rotate canvas 90° clockwise for printing
-   * The preview shows horizontal layout, but printer expects vertical (rotated) layout
+   * Send header, raster blocks and footer of an encoded job
+   *
+   * @param journalId - Journal entry to checkpoint before each block and the footer
+   * @param startUnit - First unit to send when resuming (blocks, then footer at blocks.length)
    */
-  private rotateCanvas(sourceCanvas: HTMLCanvasElement): HTMLCanvasElement {
-    // Create a new canvas with swapped dimensions
-    const rotatedCanvas = document.createElement('canvas');
-    rotatedCanvas.width = sourceCanvas.height;
-    rotatedCanvas.height = sourceCanvas.width;
+  private async transmit(
+    encoded: EncodedJob,
+    widthMm: number,
+    heightMm: number,
+    job?: PrintJobRecorder,
+    journalId?: string,
+    startUnit: number = 0
+  ): Promise<PrinterDebugInfo> {
+    const journal = journalId ? this.journal : null;
+    // A job that fails before its first byte must not be offered for resume
+    const abandon = () => journal?.abandon(journalId!).catch(journalError => {
+      console.error('Failed to update print journal:', journalError);
+    });
 
-    const ctx = rotatedCanvas.getContext('2d')!;
+    try {
+      this.checkReady();
+    } catch (error) {
+      if (job) {
+        this.metrics?.endJob(job);
+      }
+      await abandon();
+      throw error;
+    }
 
-    // Translate and rotate 90° clockwise
-    ctx.translate(rotatedCanvas.width / 2, rotatedCanvas.height / 2);
-    ctx.rotate(Math.PI / 2);
-    ctx.drawImage(sourceCanvas, -sourceCanvas.width / 2, -sourceCanvas.height / 2);
+    this.setStatus('printing');
+    try {
+      const totalBytes = jobRasterBytes(encoded);
 
-    return rotatedCanvas;
-  }
+      const debugInfo: PrinterDebugInfo = {
+        canvasWidth: encoded.bytesPerRow * 8,
+        canvasHeight: encoded.lines,
+        bytesPerRow: encoded.bytesPerRow,
+        totalBytes,
+        widthMm: widthMm, // Already swapped by caller
+        heightMm: heightMm, // Already swapped by caller
+        pixelsPerMm: this.pixelsPerMm,
+        headerBytes: toHex(encoded.header),
+        footerBytes: toHex(encoded.footer),
+        profile: encoded.profile,
+        coverage: encoded.coverage,
+        labels: countLabels(encoded)
+      };
+
+      console.log('Print debug info:', debugInfo, `${jobByteLength(encoded)} bytes total`);
 
-  private canvasToBytes(canvas: HTMLCanvasElement): Uint8Array {
-    const ctx = canvas.getContext('2d')!;
-    const imageData = ctx.getImageData(0, 0, canvas.width, canvas.height).data;
-    const bytesPerRow = Math.ceil(canvas.width / 8);
-    const data = new Uint8Array(bytesPerRow * canvas.height);
+      await journal?.begin(journalId!);
+      const printedSince = this.monitor?.printedCount;
 
-    let offset = 0;
-    for (let y = 0; y < canvas.height; y++) {
-      for (let x = 0; x < canvas.width; x += 8) {
-        let byte = 0;
+      // 1. Send header (again when resuming, the printer has lost its settings)
+      await this.sendHeader(encoded.header, job);
 
-        // Pack 8 pixels into one byte
-        for (let bit = 0; bit < 8 && (x + bit) < canvas.width; bit++) {
-          const idx = ((y * canvas.width) + x + bit) * 4;
+      // 2. Send image data in blocks (max 255 lines per block)
+      const blockCount = encoded.blocks.length;
+      let blockStart = 0;
 
-          // Convert to grayscale and threshold
-          const gray = (imageData[idx] + imageData[idx + 1] + imageData[idx + 2]) / 3;
+      for (let blockIndex = 0; blockIndex < blockCount; blockIndex++) {
+        const block = encoded.blocks[blockIndex];
+        const sentBefore = blockStart;
 
-          // If pixel is dark (< 128), set bit to 1
-          if (gray < 128) {
-            byte |= (1 << (7 - bit));
-          }
+        if (blockIndex < startUnit) {
+          blockStart += block.data.length;
+          continue;
         }
+        await journal?.checkpoint(journalId!, blockIndex + 1);
+
+        await this.sendBlock(block, blockIndex, job, (sent) => ({
+          bytesSent: sentBefore + sent,
+          totalBytes,
+          blockIndex,
+          blockCount,
+          percent: Math.round(((sentBefore + sent) / totalBytes) * 100)
+        }));
 
-        data[offset++] = byte;
+        blockStart += block.data.length;
       }
-    }
 
-    return data;
+      // 3. Send footer
+      await journal?.checkpoint(journalId!, blockCount + 1);
+      await this.sendFooter(encoded.footer, encoded.lines, job, countLabelsFrom(encoded, startUnit), printedSince);
+      await journal?.complete(journalId!);
+
+      if (job) {
+        debugInfo.metrics = this.metrics!.endJob(job);
+      }
+
+      console.log('Print complete!');
+      this.setStatus('connected');
+
+      return debugInfo;
+    } catch (error) {
+      if (job) {
+        this.metrics?.endJob(job);
+      }
+      await abandon();
+      this.setStatus('connected');
+      console.error('Print failed:', error);
+      throw new Error(`Print failed: ${error instanceof Error ? error.message : 'Unknown error'}`);
+    }
   }
 
   /**
-   * Print canvas to the Phomemo D30 printer
+   * Print a label streamed as packed raster rows
    *
-   * @param canvas - HTML canvas element containing the label design
-   * @param widthMm - Label width in millimeters (actual physical dimension)
-   * @param heightMm - Label height in millimeters (actual physical dimension)
-   * @param footerMode - Which footer command sequence to use
+   * Rows arrive from an async source (e.g. CanvasRenderer.renderBands) as
+   * 1-bit packed chunks of one or more whole rows. They are framed into
+   * 255-line GS v 0 blocks as they arrive, so only one block is held in
+   * memory regardless of label length. Intended for long continuous media.
+   * The header goes out before any coverage is known, so streamed labels
+   * always use the default print profile.
+   *
+   * Call it through PrintCoordinator.printStream, which queues the stream
+   * behind other jobs.
+   *
+   * @param rows - Async source of packed rows (length must be a multiple of bytesPerRow)
+   * @param bytesPerRow - Bytes per raster row (print head width / 8)
    */
-  async print(
-    canvas: HTMLCanvasElement,
-    widthMm: number,
-    heightMm: number,
-    footerMode: 'standard' | 'nofeed' | 'formfeed' | 'cut' | 'simple' | 'reset' | 'multi' | 'none' = 'standard',
-    mediaType: 'gaps' | 'continuous' | 'marks' = 'gaps',
+  async printStream(
+    rows: AsyncIterable<Uint8Array>,
+    bytesPerRow: number,
+    footerMode: FooterMode = 'standard',
+    mediaType: MediaType = 'continuous',
     extraFeedMm: number = 0
   ): Promise<PrinterDebugInfo> {
-    if (!this.characteristic) {
-      throw new Error('Not connected to printer');
-    }
-
+    this.checkReady();
     this.setStatus('printing');
+    const job = this.metrics?.beginJob();
 
     try {
-      // Rotate canvas 90° for vertical printing
-      const rotatedCanvas = this.rotateCanvas(canvas);
-
-      // Convert rotated canvas to monochrome byte array
-      const imageData = this.canvasToBytes(rotatedCanvas);
-      const bytesPerRow = Math.ceil(rotatedCanvas.width / 8);
-
-      // Generate debug info
-      const header = this.getHeaderData(mediaType);
-      let footer: Uint8Array;
-      switch (footerMode) {
-        case 'simple':
-          footer = this.getFooterDataSimple();
-          break;
-        case 'reset':
-          footer = this.getFooterDataReset();
-          break;
-        case 'multi':
-          footer = this.getFooterDataMulti();
-          break;
-        case 'none':
-          footer = this.getFooterDataNone();
-          break;
-        case 'nofeed':
-          footer = this.getFooterDataNoFeed();
-          break;
-        case 'formfeed':
-          footer = this.getFooterDataFormFeed();
-          break;
-        case 'cut':
-          footer = this.getFooterDataCut();
-          break;
-        case 'standard':
-        default:
-          footer = this.getFooterData(extraFeedMm);
-          break;
+      const header = getHeaderData(mediaType);
+      const footer = getFooter(footerMode, extraFeedMm);
+
+      await this.sendHeader(header, job);
+
+      let blockIndex = 0;
+      let totalLines = 0;
+      let bytesSent = 0;
+
+      for await (const block of frameRows(rows, bytesPerRow)) {
+        const sentBefore = bytesSent;
+        const index = blockIndex;
+        await this.sendBlock(block, index, job, (sent) => ({
+          bytesSent: sentBefore + sent,
+          totalBytes: null,
+          blockIndex: index,
+          blockCount: null,
+          percent: null
+        }));
+        bytesSent += block.data.length;
+        totalLines += block.data.length / bytesPerRow;
+        blockIndex++;
       }
 
+      await this.sendFooter(footer, totalLines, job);
+
       const debugInfo: PrinterDebugInfo = {
-        canvasWidth: rotatedCanvas.width,
-        canvasHeight: rotatedCanvas.height,
+        canvasWidth: bytesPerRow * 8,
+        canvasHeight: totalLines,
         bytesPerRow: bytesPerRow,
-        totalBytes: imageData.length,
-        widthMm: widthMm, // Already swapped by caller
-        heightMm: heightMm, // Already swapped by caller
+        totalBytes: bytesSent,
+        widthMm: (bytesPerRow * 8) / this.pixelsPerMm,
+        heightMm: totalLines / this.pixelsPerMm,
         pixelsPerMm: this.pixelsPerMm,
-        headerBytes: Array.from(header).map(b => `0x${b.toString(16).padStart(2, '0')}`).join(' '),
-        footerBytes: Array.from(footer).map(b => `0x${b.toString(16).padStart(2, '0')}`).join(' ')
+        headerBytes: toHex(header),
+        footerBytes: toHex(footer)
       };
 
-      console.log('Print debug info:', debugInfo);
-
-      // 1. Send header
-      await this.characteristic.writeValueWithResponse(header as BufferSource);
-      await this.delay(50);
-
-      // 2. Send image data in blocks (max 255 lines per block)
-      const MAX_LINES_PER_BLOCK = 255;
-      let remainingLines = rotatedCanvas.height;
-      let currentLine = 0;
-
-      while (remainingLines > 0) {
-        const linesToSend = Math.min(remainingLines, MAX_LINES_PER_BLOCK);
-
-        // Send block marker
-        const blockMarker = this.getBlockMarker(bytesPerRow, linesToSend);
-        await this.characteristic.writeValueWithResponse(blockMarker as BufferSource);
-        await this.delay(30);
-
-        // Send image data for this block in chunks
-        const blockSize = bytesPerRow * linesToSend;
-        const blockStart = currentLine * bytesPerRow;
-        const blockData = imageData.slice(blockStart, blockStart + blockSize);
-
-        for (let i = 0; i < blockData.length; i += this.PACKET_SIZE) {
-          const chunk = blockData.slice(i, Math.min(i + this.PACKET_SIZE, blockData.length));
-          await this.characteristic.writeValueWithResponse(chunk);
-
-          // Progress callback
-          const totalProgress = Math.round(((currentLine + (i / bytesPerRow)) / rotatedCanvas.height) * 100);
-          console.log(`Printing... ${totalProgress}%`);
-        }
-
-        currentLine += linesToSend;
-        remainingLines -= linesToSend;
+      if (job) {
+        debugInfo.metrics = this.metrics!.endJob(job);
       }
 
-      // 3. Send footer
-      await this.delay(50);
-      await this.characteristic.writeValueWithResponse(footer as BufferSource);
-
-      console.log('Print complete!');
+      console.log('Print complete!', debugInfo);
       this.setStatus('connected');
 
       return debugInfo;
     } catch (error) {
+      if (job) {
+        this.metrics?.endJob(job);
+      }
       this.setStatus('connected');
       console.error('Print failed:', error);
       throw new Error(`Print failed: ${error instanceof Error ? error.message : 'Unknown error'}`);
     }
   }
 
+  /**
+   * Send the job header and give the printer time to apply settings
+   */
+  private async sendHeader(header: Uint8Array, job?: PrintJobRecorder): Promise<void> {
+    const endHeader = job?.begin('header');
+    await this.write(header, job);
+    await this.pace(50);
+    endHeader?.();
+  }
+
+  /**
+   * Send one GS v 0 raster block (label separator, marker, then row data in packets)
+   *
+   * @param progress - Builds the progress event from bytes sent within this block
+   */
+  private async sendBlock(
+    block: EncodedBlock,
+    blockIndex: number,
+    job: PrintJobRecorder | undefined,
+    progress: (sentInBlock: number) => PrintProgress
+  ): Promise<void> {
+    const endBlock = job?.begin('block', blockIndex);
+
+    // Advance to the next label
+    if (block.separator?.length) {
+      await this.waitUntilReady();
+      await this.write(block.separator, job);
+    }
+
+    // Send block marker
+    await this.waitUntilReady();
+    await this.write(block.marker, job);
+    await this.pace(30);
+
+    // Send image data for this block in chunks
+    for (let i = 0; i < block.data.length; i += this.PACKET_SIZE) {
+      await this.waitUntilReady();
+      const chunk = block.data.subarray(i, Math.min(i + this.PACKET_SIZE, block.data.length));
+      await this.write(chunk, job);
+
+      if (this.onProgress) {
+        this.onProgress(progress(i + chunk.length));
+      }
+    }
+
+    endBlock?.();
+  }
+
+  /**
+   * Send the job footer and, with status notifications, wait until the labels are out
+   *
+   * Printers that have not confirmed a label by the first timeout of the
+   * connection get the fixed settle delay instead.
+   *
+   * @param lines - Raster lines in the job, used to size the completion timeout
+   * @param labels - Label confirmations to wait for
+   * @param printedSince - Monitor printedCount when the job started
+   */
+  private async sendFooter(
+    footer: Uint8Array,
+    lines: number,
+    job?: PrintJobRecorder,
+    labels: number = 1,
+    printedSince?: number
+  ): Promise<void> {
+    const endFooter = job?.begin('footer');
+    const monitor = this.monitor?.confirmsPrinted === false ? null : this.monitor;
+    await (monitor ? this.pace(50) : this.delay(50));
+    await this.waitUntilReady();
+
+    // Listen before writing so a fast confirmation is not missed
+    const timeoutMs = 5000 + (lines / this.pixelsPerMm) * 200;
+    const printed = labels > 0 ? monitor?.waitForPrinted(timeoutMs, labels, printedSince) : undefined;
+
+    await this.write(footer, job);
+    if (printed && !(await printed)) {
+      console.warn('Printer did not confirm the label within', Math.round(timeoutMs), 'ms');
+    }
+    endFooter?.();
+  }
+
+  /**
+   * Refuse to start a job the printer cannot print (saves a label after a jam)
+   *
+   * Callers that journal jobs check this first, so a job that is refused
+   * right away never shows up as interrupted.
+   */
+  checkReady(): void {
+    if (!this.characteristic) {
+      throw new Error('Not connected to printer');
+    }
+    const reason = this.printerState && getBlockedReason(this.printerState);
+    if (reason) {
+      throw new Error(`Printer not ready: ${reason}`);
+    }
+  }
+
+  /**
+   * Hold the raster stream while the printer reports it cannot take data
+   */
+  private async waitUntilReady(): Promise<void> {
+    if (!this.monitor || !getBlockedReason(this.monitor.state)) return;
+
+    this.setStatus('paused');
+    try {
+      const reason = await this.monitor.waitUntilReady(READY_TIMEOUT_MS);
+      console.log(`Printer ready again after: ${reason}`);
+    } finally {
+      if (this.status === 'paused') {
+        this.setStatus('printing');
+      }
+    }
+  }
+
+  /**
+   * Fixed settle delay, kept until the printer has reported status on this connection
+   *
+   * The status characteristic can exist on firmware that never notifies, so
+   * its presence alone does not prove readiness reporting works.
+   */
+  private async pace(ms: number): Promise<void> {
+    if (!this.monitor?.hasReported) {
+      await this.delay(ms);
+    }
+  }
+
+  /**
+   * Write one packet to the printer, timing it when instrumentation is enabled
+   */
+  private async write(data: Uint8Array, job?: PrintJobRecorder): Promise<void> {
+    if (!job) {
+      await this.characteristic!.writeValueWithResponse(data as BufferSource);
+      return;
+    }
+
+    const t0 = performance.now();
+    await this.characteristic!.writeValueWithResponse(data as BufferSource);
+    job.recordWrite(data.length, performance.now() - t0);
+  }
+
   /**
    * Set printer status and trigger callback
    */
   private setStatus(status: PrinterStatus): void {
     this.status = status;
-    this.onStatusChange?.(status);
+    this.onStatusChange?.(status, this.printerState);
   }
 
   /**
@@ -0,0 +1,143 @@
+/**
+ * Compiled print jobs: the exact ESC/POS byte stream of a printed label
+ *
+ * Stored in IndexedDB next to print history items (same id), so a label
+ * can be reprinted without re-rendering, and exported as a .prn file that
+ * the CLI or any raw transport can send as-is.
+ */
+
+import { EncodeOptions, EncodedJob, FooterMode, MediaType, encodeJob, parseJob, serializeJob } from './escpos';
+import { COMPILED_JOBS_STORE, openDatabase, requestToPromise, transactionDone } from './db';
+import { canvasToBytes, rotateCanvas } from './raster';
+
+export interface CompiledJobMeta {
+  widthMm: number;
+  heightMm: number;
+  pixelsPerMm: number;
+  footerMode: FooterMode;
+  mediaType: MediaType;
+  extraFeedMm: number;
+}
+
+export interface CompiledJob extends CompiledJobMeta {
+  id: string; // Matches the PrintHistoryItem id
+  createdAt: number;
+  bytesPerRow: number;
+  lines: number;
+  byteLength: number;
+  data: Blob; // header + blocks + footer, exactly as sent to the printer
+}
+
+/**
+ * Compile a preview canvas without a printer connection (e.g. for saved labels)
+ */
+export function compileCanvas(canvas: HTMLCanvasElement, options: EncodeOptions = {}): EncodedJob {
+  const rotatedCanvas = rotateCanvas(canvas);
+  return encodeJob(canvasToBytes(rotatedCanvas), Math.ceil(rotatedCanvas.width / 8), options);
+}
+
+/**
+ * Store the compiled job for a history item
+ */
+export async function saveCompiledJob(id: string, job: EncodedJob, meta: CompiledJobMeta): Promise<void> {
+  try {
+    const bytes = serializeJob(job);
+    const record: CompiledJob = {
+      ...meta,
+      id,
+      createdAt: Date.now(),
+      bytesPerRow: job.bytesPerRow,
+      lines: job.lines,
+      byteLength: bytes.length,
+      data: new Blob([bytes as BlobPart], { type: 'application/octet-stream' })
+    };
+
+    const db = await openDatabase();
+    const tx = db.transaction(COMPILED_JOBS_STORE, 'readwrite');
+    tx.objectStore(COMPILED_JOBS_STORE).put(record);
+    await transactionDone(tx);
+  } catch (error) {
+    console.error('Failed to save compiled job:', error);
+  }
+}
+
+/**
+ * Get the compiled job record for a history item
+ */
+export async function getCompiledJob(id: string): Promise<CompiledJob | undefined> {
+  try {
+    const db = await openDatabase();
+    const store = db.transaction(COMPILED_JOBS_STORE, 'readonly').objectStore(COMPILED_JOBS_STORE);
+    return await requestToPromise<CompiledJob | undefined>(store.get(id));
+  } catch (error) {
+    console.error('Failed to load compiled job:', error);
+    return undefined;
+  }
+}
+
+/**
+ * Load a compiled job ready for PhomemoD30Printer.printJob
+ */
+export async function loadCompiledJob(id: string): Promise<EncodedJob | null> {
+  const record = await getCompiledJob(id);
+  if (!record) return null;
+  return parseJob(new Uint8Array(await record.data.arrayBuffer()));
+}
+
+/**
+ * Get ids of all stored compiled jobs
+ */
+export async function getCompiledJobIds(): Promise<Set<string>> {
+  try {
+    const db = await openDatabase();
+    const store = db.transaction(COMPILED_JOBS_STORE, 'readonly').objectStore(COMPILED_JOBS_STORE);
+    const keys = await requestToPromise(store.getAllKeys());
+    return new Set(keys as string[]);
+  } catch (error) {
+    console.error('Failed to list compiled jobs:', error);
+    return new Set();
+  }
+}
+
+/**
+ * Delete compiled jobs; with no ids, delete all of them
+ */
+export async function deleteCompiledJobs(ids?: string[]): Promise<void> {
+  try {
+    const db = await openDatabase();
+    const tx = db.transaction(COMPILED_JOBS_STORE, 'readwrite');
+    const store = tx.objectStore(COMPILED_JOBS_STORE);
+    if (ids) {
+      ids.forEach(id => store.delete(id));
+    } else {
+      store.clear();
+    }
+    await transactionDone(tx);
+  } catch (error) {
+    console.error('Failed to delete compiled jobs:', error);
+  }
+}
+
+/**
+ * Remove compiled jobs whose history item no longer exists
+ */
+export async function pruneCompiledJobs(historyIds: string[]): Promise<void> {
+  const keep = new Set(historyIds);
+  const stale = [...await getCompiledJobIds()].filter(id => !keep.has(id));
+  if (stale.length > 0) {
+    await deleteCompiledJobs(stale);
+  }
+}
+
+/**
+ * Download a compiled job as a raw .prn file
+ */
+export function exportCompiledJob(job: CompiledJob, name: string = 'label'): void {
+  const url = URL.createObjectURL(job.data);
+  const link = document.createElement('a');
+  link.href = url;
+  link.download = `${name.replace(/[^\w.-]+/g, '_') || 'label'}.prn`;
+  link.click();
+  // Revoking in the same task can cancel the download before it starts
+  setTimeout(() => URL.revokeObjectURL(url), 1000);
+}
@@ -0,0 +1,76 @@
+/**
+ * IndexedDB access shared by the stores that outgrow localStorage
+ */
+
+const DB_NAME = 'phomemo-d30';
+const DB_VERSION = 3;
+
+export const COMPILED_JOBS_STORE = 'compiledJobs';
+export const PRINT_JOURNAL_STORE = 'printJournal'; // Small entries, rewritten at every checkpoint
+export const PRINT_JOURNAL_DATA_STORE = 'printJournalData'; // Job bytes, written once
+export const ICON_SVGS_STORE = 'iconSvgs'; // Iconify SVGs keyed by icon id, e.g. 'lucide:home'
+
+let dbPromise: Promise<IDBDatabase> | null = null;
+
+/**
+ * Open (and create or upgrade) the app database
+ */
+export function openDatabase(): Promise<IDBDatabase> {
+  dbPromise ??= new Promise<IDBDatabase>((resolve, reject) => {
+    const request = indexedDB.open(DB_NAME, DB_VERSION);
+
+    request.onupgradeneeded = () => {
+      const db = request.result;
+      if (!db.objectStoreNames.contains(COMPILED_JOBS_STORE)) {
+        db.createObjectStore(COMPILED_JOBS_STORE, { keyPath: 'id' });
+      }
+      if (!db.objectStoreNames.contains(PRINT_JOURNAL_STORE)) {
+        const journal = db.createObjectStore(PRINT_JOURNAL_STORE, { keyPath: 'id' });
+        journal.createIndex('state', 'state');
+      }
+      if (!db.objectStoreNames.contains(PRINT_JOURNAL_DATA_STORE)) {
+        db.createObjectStore(PRINT_JOURNAL_DATA_STORE);
+      }
+      if (!db.objectStoreNames.contains(ICON_SVGS_STORE)) {
+        db.createObjectStore(ICON_SVGS_STORE);
+      }
+    };
+
+    request.onsuccess = () => {
+      const db = request.result;
+      // Let another tab upgrade the schema; reopen on next use
+      db.onversionchange = () => {
+        db.close();
+        dbPromise = null;
+      };
+      resolve(db);
+    };
+    request.onerror = () => {
+      dbPromise = null;
+      reject(request.error);
+    };
+  });
+
+  return dbPromise;
+}
+
+/**
+ * Wrap an IDBRequest in a promise
+ */
+export function requestToPromise<T>(request: IDBRequest<T>): Promise<T> {
+  return new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+/**
+ * Resolve once a transaction has committed
+ */
+export function transactionDone(tx: IDBTransaction): Promise<void> {
+  return new Promise((resolve, reject) => {
+    tx.oncomplete = () => resolve();
+    tx.onerror = () => reject(tx.error);
+    tx.onabort = () => reject(tx.error ?? new Error('Transaction aborted'));
+  });
+}
@@ -0,0 +1,613 @@
+/**
+ * Phomemo D30 ESC/POS encoder
+ *
+ * Transport-agnostic framing of print jobs: header, GS v 0 raster blocks
+ * and footer variants, plus 1-bit pixel packing. Has no DOM or Bluetooth
+ * dependencies so the same byte stream can be produced in the browser
+ * (PhomemoD30Printer) or in Node (the CLI in cli/).
+ *
+ * Based on reverse-engineered ESC/POS protocol from phomemo-tools
+ * https://github.com/vivier/phomemo-tools
+ */
+
+export const FOOTER_MODES = ['standard', 'nofeed', 'formfeed', 'cut', 'simple', 'reset', 'multi', 'none'] as const;
+export const MEDIA_TYPES = ['gaps', 'continuous', 'marks'] as const;
+
+export type FooterMode = typeof FOOTER_MODES[number];
+export type MediaType = typeof MEDIA_TYPES[number];
+
+// GS v 0 height field is limited to 255 lines per block
+export const MAX_LINES_PER_BLOCK = 255;
+
+/**
+ * Print head speed and density settings sent in the job header
+ */
+export interface PrintProfile {
+  name: string;
+  speed: number; // 1 (slowest) - 5 (fastest)
+  density: number; // 1 (lightest) - 0x0f (darkest)
+}
+
+// What every job used before profiles existed
+export const DEFAULT_PROFILE: PrintProfile = { name: 'default', speed: 0x05, density: 0x0f };
+
+/**
+ * Share of printed (black) pixels in a job, 0-1
+ */
+export interface JobCoverage {
+  blocks: number[]; // Per GS v 0 block
+  mean: number;
+  peak: number; // Densest block, the one most likely to stall or fade
+}
+
+export interface EncodeOptions {
+  footerMode?: FooterMode;
+  mediaType?: MediaType;
+  extraFeedMm?: number;
+  profile?: PrintProfile | ((coverage: JobCoverage) => PrintProfile); // Fixed, or chosen from the raster
+  copies?: number; // Labels printed from the raster within one job
+  labelGapMm?: number; // Blank feed between labels on continuous media
+}
+
+/**
+ * Packed raster of one label in a multi-label job
+ */
+export interface LabelRaster {
+  raster: Uint8Array; // Packed 1-bit rows, already rotated for the print head
+  bytesPerRow: number;
+  copies?: number;
+}
+
+/**
+ * One GS v 0 raster block: marker plus packed row data
+ */
+export interface EncodedBlock {
+  separator?: Uint8Array; // Label separator sent before the marker (first block of each further label)
+  marker: Uint8Array;
+  data: Uint8Array;
+}
+
+// Longest separator getLabelSeparator produces, bounds the search in parseJob
+const MAX_SEPARATOR_BYTES = 3;
+
+/**
+ * A complete print job, kept in parts so transports can pace each section
+ */
+export interface EncodedJob {
+  header: Uint8Array;
+  blocks: EncodedBlock[];
+  footer: Uint8Array;
+  bytesPerRow: number;
+  lines: number;
+  coverage: JobCoverage;
+  profile: PrintProfile; // Speed and density in the header
+}
+
+/**
+ * Get header command sequence
+ *
+ * Based on M110/M120/M220 protocol from phomemo-tools
+ * These printers (and likely D30) support media type settings
+ */
+export function getHeaderData(mediaType: MediaType = 'gaps', profile: PrintProfile = DEFAULT_PROFILE): Uint8Array {
+  let mediaCode: number;
+  switch (mediaType) {
+    case 'gaps':
+      mediaCode = 0x0a; // Label with gaps (default)
+      break;
+    case 'continuous':
+      mediaCode = 0x0b; // Continuous
+      break;
+    case 'marks':
+      mediaCode = 0x26; // Label with marks
+      break;
+  }
+
+  return new Uint8Array([
+    0x1b, 0x4e, 0x0d, profile.speed,    // Print Speed (5 = Fast)
+    0x1b, 0x4e, 0x04, profile.density,  // Print Density (0x0f = max)
+    0x1f, 0x11, mediaCode    // Media Type
+  ]);
+}
+
+/**
+ * Get block marker for raster image data
+ *
+ * GS v 0 command (0x1d 0x76 0x30):
+ * - Print raster bit image
+ * - Mode: 0 (normal), 1 (double width), 2 (double height), 3 (quadruple)
+ * - Width in bytes (16-bit little-endian)
+ * - Height in pixels (16-bit little-endian)
+ *
+ * Note: Maximum height per block is 255 lines
+ */
+export function getBlockMarker(bytesPerRow: number, lines: number): Uint8Array {
+  // Clamp lines to maximum of 255 per block
+  const blockLines = Math.min(lines, 255);
+
+  return new Uint8Array([
+    0x1d, 0x76, 0x30,              // GS v 0 - Print raster bit image
+    0x00,                          // Mode: 0 (normal)
+    bytesPerRow & 0xFF,            // Width low byte
+    (bytesPerRow >> 8) & 0xFF,     // Width high byte
+    blockLines & 0xFF,             // Height low byte
+    (blockLines >> 8) & 0xFF       // Height high byte
+  ]);
+}
+
+/**
+ * Get the commands that advance from one label to the next within a job
+ *
+ * On gaps/marks media a form feed moves to the start of the next label
+ * using the printer's gap or mark sensor, so labels line up with the die
+ * cut without knowing its length. Continuous media just feeds a blank
+ * strip of labelGapMm. With no gap it is a zero-line feed, so labels print
+ * back to back but the boundary is still in the byte stream (parseJob and
+ * countLabels rely on it).
+ */
+export function getLabelSeparator(mediaType: MediaType = 'gaps', labelGapMm: number = 0): Uint8Array {
+  if (mediaType !== 'continuous') {
+    return new Uint8Array([0x0c]); // FF - Feed to next label
+  }
+  const feedLines = Math.min(255, Math.max(0, Math.round(labelGapMm * 8))); // 8 pixels per mm
+  return new Uint8Array([0x1b, 0x64, feedLines]); // ESC d n - Feed n lines
+}
+
+/**
+ * Get footer command sequence
+ *
+ * Based on M110/M120/M220 protocol from phomemo-tools
+ * This is what those printers use to end a print job
+ *
+ * @param extraFeedMm - Additional mm to feed after printing (for easy tear-off)
+ */
+function getFooterData(extraFeedMm: number = 0): Uint8Array {
+  const footer = [
+    0x1f, 0xf0, 0x05, 0x00,  // Phomemo end sequence 1
+    0x1f, 0xf0, 0x03, 0x00   // Phomemo end sequence 2
+  ];
+
+  // Add extra feed if requested (convert mm to lines, ~0.125mm per line for 203dpi)
+  if (extraFeedMm > 0) {
+    const feedLines = Math.round(extraFeedMm * 8); // 8 pixels per mm
+    footer.push(0x1b, 0x64, feedLines);  // ESC d n - Feed n lines
+  }
+
+  return new Uint8Array(footer);
+}
+
+/**
+ * Alternative footer with NO extra feed
+ * Use this if the standard footer still causes issues
+ */
+function getFooterDataNoFeed(): Uint8Array {
+  return new Uint8Array([
+    // Try form feed or cut command to stop the printer
+    0x1b, 0x64, 0x00,  // ESC d 0 - Feed 0 lines (might trigger cut/stop)
+
+    // Phomemo-specific end sequence (from phomemo-tools)
+    0x1f, 0x11, 0x08,
+    0x1f, 0x11, 0x0e,
+    0x1f, 0x11, 0x07,
+    0x1f, 0x11, 0x09
+  ]);
+}
+
+/**
+ * Alternative footer 2 - Try form feed
+ */
+function getFooterDataFormFeed(): Uint8Array {
+  return new Uint8Array([
+    0x0c,  // FF - Form feed (page eject)
+
+    // Phomemo-specific end sequence
+    0x1f, 0x11, 0x08,
+    0x1f, 0x11, 0x0e,
+    0x1f, 0x11, 0x07,
+    0x1f, 0x11, 0x09
+  ]);
+}
+
+/**
+ * Alternative footer 3 - Try GS V (cut)
+ */
+function getFooterDataCut(): Uint8Array {
+  return new Uint8Array([
+    0x1d, 0x56, 0x00,  // GS V - Cut paper (full cut)
+
+    // Phomemo-specific end sequence
+    0x1f, 0x11, 0x08,
+    0x1f, 0x11, 0x0e,
+    0x1f, 0x11, 0x07,
+    0x1f, 0x11, 0x09
+  ]);
+}
+
+/**
+ * Alternative footer 4 - EXACT match to original HTML code
+ * This is what was in the working example (phomemo-tool-example.py line 565)
+ */
+function getFooterDataSimple(): Uint8Array {
+  return new Uint8Array([
+    0x1b, 0x64, 0x00  // ESC d 0 - Feed 0 lines ONLY, no Phomemo sequence
+  ]);
+}
+
+/**
+ * Alternative footer 5 - Try ESC @ again to reset
+ */
+function getFooterDataReset(): Uint8Array {
+  return new Uint8Array([
+    0x1b, 0x40  // ESC @ - Initialize printer (might stop current job)
+  ]);
+}
+
+/**
+ * Alternative footer 6 - Try multiple end commands
+ */
+function getFooterDataMulti(): Uint8Array {
+  return new Uint8Array([
+    0x1b, 0x64, 0x00,  // ESC d 0
+    0x1b, 0x40,        // ESC @ - Reset
+    0x0c               // Form feed
+  ]);
+}
+
+/**
+ * Alternative footer 7 - NO footer at all
+ */
+function getFooterDataNone(): Uint8Array {
+  return new Uint8Array([]);
+}
+
+/**
+ * Get footer bytes for the selected footer mode
+ */
+export function getFooter(footerMode: FooterMode, extraFeedMm: number = 0): Uint8Array {
+  switch (footerMode) {
+    case 'simple':
+      return getFooterDataSimple();
+    case 'reset':
+      return getFooterDataReset();
+    case 'multi':
+      return getFooterDataMulti();
+    case 'none':
+      return getFooterDataNone();
+    case 'nofeed':
+      return getFooterDataNoFeed();
+    case 'formfeed':
+      return getFooterDataFormFeed();
+    case 'cut':
+      return getFooterDataCut();
+    case 'standard':
+    default:
+      return getFooterData(extraFeedMm);
+  }
+}
+
+/**
+ * Pack RGBA pixels into 1-bit rows (MSB first)
+ * Dark pixels (average of RGB < 128) become 1 (printed)
+ */
+export function packPixels(rgba: ArrayLike<number>, width: number, height: number): Uint8Array {
+  const bytesPerRow = Math.ceil(width / 8);
+  const data = new Uint8Array(bytesPerRow * height);
+
+  let offset = 0;
+  for (let y = 0; y < height; y++) {
+    for (let x = 0; x < width; x += 8) {
+      let byte = 0;
+
+      // Pack 8 pixels into one byte
+      for (let bit = 0; bit < 8 && (x + bit) < width; bit++) {
+        const idx = ((y * width) + x + bit) * 4;
+
+        // Convert to grayscale and threshold
+        const gray = (rgba[idx] + rgba[idx + 1] + rgba[idx + 2]) / 3;
+
+        // If pixel is dark (< 128), set bit to 1
+        if (gray < 128) {
+          byte |= (1 << (7 - bit));
+        }
+      }
+
+      data[offset++] = byte;
+    }
+  }
+
+  return data;
+}
+
+// Set bits per byte value
+const POPCOUNT = new Uint8Array(256).map((_, byte) => {
+  let count = 0;
+  for (let b = byte; b; b >>= 1) count += b & 1;
+  return count;
+});
+
+/**
+ * Share of set bits in packed 1-bit data
+ */
+export function blockCoverage(data: Uint8Array): number {
+  if (data.length === 0) return 0;
+  let bits = 0;
+  for (let i = 0; i < data.length; i++) {
+    bits += POPCOUNT[data[i]];
+  }
+  return bits / (data.length * 8);
+}
+
+/**
+ * Coverage of each block and of the whole job
+ */
+export function jobCoverage(blocks: EncodedBlock[]): JobCoverage {
+  const coverage = blocks.map(block => blockCoverage(block.data));
+  const totalBytes = blocks.reduce((total, block) => total + block.data.length, 0);
+  const weighted = blocks.reduce((total, block, i) => total + coverage[i] * block.data.length, 0);
+  return {
+    blocks: coverage,
+    mean: totalBytes ? weighted / totalBytes : 0,
+    peak: Math.max(0, ...coverage)
+  };
+}
+
+/**
+ * Split packed rows into GS v 0 blocks of at most 255 lines
+ */
+export function encodeBlocks(raster: Uint8Array, bytesPerRow: number): EncodedBlock[] {
+  const blocks: EncodedBlock[] = [];
+  const totalLines = raster.length / bytesPerRow;
+
+  for (let line = 0; line < totalLines; line += MAX_LINES_PER_BLOCK) {
+    const lines = Math.min(totalLines - line, MAX_LINES_PER_BLOCK);
+    const start = line * bytesPerRow;
+    blocks.push({
+      marker: getBlockMarker(bytesPerRow, lines),
+      data: raster.subarray(start, start + lines * bytesPerRow)
+    });
+  }
+
+  return blocks;
+}
+
+/**
+ * Frame streamed packed rows into GS v 0 blocks as they arrive
+ *
+ * Chunks may hold any number of whole rows and need not line up with block
+ * boundaries; a block is yielded as soon as it has 255 lines, and the rest
+ * at the end. Only one block is buffered at a time.
+ *
+ * @param rows - Async source of packed rows (length must be a multiple of bytesPerRow)
+ * @param bytesPerRow - Bytes per raster row
+ */
+export async function* frameRows(rows: AsyncIterable<Uint8Array>, bytesPerRow: number): AsyncGenerator<EncodedBlock> {
+  let block = new Uint8Array(bytesPerRow * MAX_LINES_PER_BLOCK);
+  let blockFill = 0;
+
+  for await (const chunk of rows) {
+    if (chunk.length % bytesPerRow !== 0) {
+      throw new Error(`Row data length ${chunk.length} is not a multiple of ${bytesPerRow} bytes per row`);
+    }
+
+    let offset = 0;
+    while (offset < chunk.length) {
+      const count = Math.min(chunk.length - offset, block.length - blockFill);
+      block.set(chunk.subarray(offset, offset + count), blockFill);
+      blockFill += count;
+      offset += count;
+
+      if (blockFill === block.length) {
+        yield { marker: getBlockMarker(bytesPerRow, MAX_LINES_PER_BLOCK), data: block };
+        block = new Uint8Array(bytesPerRow * MAX_LINES_PER_BLOCK);
+        blockFill = 0;
+      }
+    }
+  }
+
+  if (blockFill > 0) {
+    yield { marker: getBlockMarker(bytesPerRow, blockFill / bytesPerRow), data: block.subarray(0, blockFill) };
+  }
+}
+
+/**
+ * Encode packed raster rows into a complete print job
+ *
+ * With options.copies the label is printed several times in one job (see
+ * encodeLabels).
+ *
+ * @param raster - Packed 1-bit rows, already rotated for the print head
+ * @param bytesPerRow - Bytes per raster row
+ */
+export function encodeJob(raster: Uint8Array, bytesPerRow: number, options: EncodeOptions = {}): EncodedJob {
+  return encodeLabels([{ raster, bytesPerRow, copies: options.copies }], options);
+}
+
+/**
+ * Encode several labels, each possibly several times, into one print job
+ *
+ * Every label is split into blocks once; copies reuse the same block data
+ * and labels are joined by getLabelSeparator, so each further label costs
+ * its raster bytes plus a few command bytes instead of a whole job with
+ * its own header, footer and end-of-job wait. Labels may differ in width
+ * (each block marker carries its own), but one speed/density profile
+ * applies to the job, chosen from its densest block.
+ */
+export function encodeLabels(labels: LabelRaster[], options: EncodeOptions = {}): EncodedJob {
+  if (labels.length === 0) {
+    throw new Error('No labels to encode');
+  }
+
+  const separator = getLabelSeparator(options.mediaType, options.labelGapMm ?? 0);
+  const blocks: EncodedBlock[] = [];
+  let lines = 0;
+
+  for (const label of labels) {
+    if (label.raster.length % label.bytesPerRow !== 0) {
+      throw new Error(`Raster length ${label.raster.length} is not a multiple of ${label.bytesPerRow} bytes per row`);
+    }
+    const copies = Math.floor(label.copies ?? 1);
+    if (!Number.isFinite(copies) || copies < 1) {
+      throw new Error(`Invalid copies ${label.copies}, expected a number of at least 1`);
+    }
+    const labelBlocks = encodeBlocks(label.raster, label.bytesPerRow);
+
+    for (let copy = 0; copy < copies; copy++) {
+      labelBlocks.forEach((block, i) => {
+        blocks.push(i === 0 && blocks.length > 0 ? { ...block, separator } : block);
+      });
+      lines += label.raster.length / label.bytesPerRow;
+    }
+  }
+
+  const coverage = jobCoverage(blocks);
+  const profile = typeof options.profile === 'function'
+    ? options.profile(coverage)
+    : options.profile ?? DEFAULT_PROFILE;
+
+  return {
+    header: getHeaderData(options.mediaType, profile),
+    blocks,
+    footer: getFooter(options.footerMode ?? 'standard', options.extraFeedMm ?? 0),
+    bytesPerRow: labels[0].bytesPerRow,
+    lines,
+    coverage,
+    profile
+  };
+}
+
+/**
+ * Number of labels in a job (blocks that start a further label carry a separator)
+ */
+export function countLabels(job: EncodedJob): number {
+  return 1 + job.blocks.filter(block => block.separator?.length).length;
+}
+
+/**
+ * Labels printed when a job is sent from block startBlock on: the label in
+ * progress there plus one per later separator
+ */
+export function countLabelsFrom(job: EncodedJob, startBlock: number): number {
+  if (startBlock >= job.blocks.length) return 0;
+  return 1 + job.blocks.slice(startBlock + 1).filter(block => block.separator?.length).length;
+}
+
+/**
+ * Raster bytes in a job, excluding commands
+ */
+export function jobRasterBytes(job: EncodedJob): number {
+  return job.blocks.reduce((total, block) => total + block.data.length, 0);
+}
+
+/**
+ * Get the total size of an encoded job in bytes
+ */
+export function jobByteLength(job: EncodedJob): number {
+  return job.blocks.reduce(
+    (total, block) => total + (block.separator?.length ?? 0) + block.marker.length + block.data.length,
+    job.header.length + job.footer.length
+  );
+}
+
+/**
+ * Flatten an encoded job into the exact byte stream sent to the printer
+ */
+export function serializeJob(job: EncodedJob): Uint8Array {
+  const out = new Uint8Array(jobByteLength(job));
+  let offset = 0;
+  const append = (bytes: Uint8Array) => {
+    out.set(bytes, offset);
+    offset += bytes.length;
+  };
+
+  append(job.header);
+  for (const block of job.blocks) {
+    if (block.separator) append(block.separator);
+    append(block.marker);
+    append(block.data);
+  }
+  append(job.footer);
+
+  return out;
+}
+
+/**
+ * Format command bytes for debug output
+ */
+export function toHex(bytes: Uint8Array): string {
+  return Array.from(bytes).map(b => `0x${b.toString(16).padStart(2, '0')}`).join(' ');
+}
+
+/**
+ * Split a serialized job back into header, blocks and footer
+ *
+ * The inverse of serializeJob. The header is everything before the first
+ * GS v 0 marker, and the footer is whatever follows the last block. A few
+ * command bytes between two blocks are the label separator of the second.
+ */
+export function parseJob(bytes: Uint8Array): EncodedJob {
+  const isMarker = (at: number) =>
+    at + 8 <= bytes.length && bytes[at] === 0x1d && bytes[at + 1] === 0x76 && bytes[at + 2] === 0x30;
+
+  let offset = 0;
+  while (offset < bytes.length && !isMarker(offset)) {
+    offset++;
+  }
+  if (offset === bytes.length) {
+    throw new Error('No raster blocks found in job data');
+  }
+
+  const header = bytes.subarray(0, offset);
+  const blocks: EncodedBlock[] = [];
+  let bytesPerRow = 0;
+  let lines = 0;
+
+  let separator: Uint8Array | undefined;
+  while (isMarker(offset)) {
+    const width = bytes[offset + 4] | (bytes[offset + 5] << 8);
+    const height = bytes[offset + 6] | (bytes[offset + 7] << 8);
+    const dataStart = offset + 8;
+    const dataEnd = dataStart + width * height;
+    if (dataEnd > bytes.length) {
+      throw new Error(`Truncated raster block at byte ${offset}`);
+    }
+
+    const block: EncodedBlock = { marker: bytes.subarray(offset, dataStart), data: bytes.subarray(dataStart, dataEnd) };
+    if (separator) block.separator = separator;
+    blocks.push(block);
+    if (!bytesPerRow) bytesPerRow = width;
+    lines += height;
+    offset = dataEnd;
+
+    // Look past a label separator for the next block
+    separator = undefined;
+    for (let length = 1; length <= MAX_SEPARATOR_BYTES && !isMarker(offset); length++) {
+      if (isMarker(dataEnd + length)) {
+        separator = bytes.subarray(dataEnd, dataEnd + length);
+        offset = dataEnd + length;
+      }
+    }
+  }
+
+  return {
+    header,
+    blocks,
+    footer: bytes.subarray(offset),
+    bytesPerRow,
+    lines,
+    coverage: jobCoverage(blocks),
+    profile: parseProfile(header)
+  };
+}
+
+/**
+ * Read speed and density back from a header (defaults where a setting is missing)
+ */
+function parseProfile(header: Uint8Array): PrintProfile {
+  const profile: PrintProfile = { ...DEFAULT_PROFILE, name: 'recorded' };
+  for (let i = 0; i + 3 < header.length; i++) {
+    if (header[i] !== 0x1b || header[i + 1] !== 0x4e) continue;
+    if (header[i + 2] === 0x0d) profile.speed = header[i + 3];
+    if (header[i + 2] === 0x04) profile.density = header[i + 3];
+  }
+  return profile;
+}
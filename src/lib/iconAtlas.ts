@@ -0,0 +1,384 @@
+/**
+ * Sprite atlas of icon thumbnails
+ *
+ * Icon grids draw thumbnails from a few large canvases instead of mounting
+ * an inline SVG subtree per result. Thumbnails are rasterized in batches,
+ * in the icon worker where the browser can decode SVG there and otherwise
+ * with img.decode() (which decodes off the main thread). Atlas pages are
+ * recycled oldest-first, so memory stays bounded while browsing tens of
+ * thousands of icons; Iconify SVGs are also cached in IndexedDB.
+ */
+
+import { ICON_SVGS_STORE, openDatabase, requestToPromise, transactionDone } from './db';
+import { splitIconId } from './iconifyApi';
+import type { IconWorkerRequest, IconWorkerResponse } from './iconAtlas.worker';
+
+export interface AtlasSlot {
+  page: HTMLCanvasElement;
+  x: number;
+  y: number;
+  size: number;
+}
+
+export interface AtlasRequest {
+  id: string;
+  svg?: string; // Known SVG; otherwise the atlas loader fetches it
+}
+
+type SvgLoader = (ids: string[]) => Promise<Map<string, string>>;
+type WorkerRequestBody = IconWorkerRequest extends infer R ? (R extends unknown ? Omit<R, 'id'> : never) : never;
+
+const PAGE_CELLS = 16; // Page is 16×16 thumbnails
+const MAX_PAGES = 8; // 2048 thumbnails before the oldest page is recycled
+const BATCH_SIZE = 64;
+const MAX_QUEUED = 512; // Older requests (scrolled past) are dropped beyond this
+const THUMBNAIL_COLOR = '#999';
+const MAX_CACHED_SVGS = 20000;
+const RETRY_AFTER_MS = 30000; // Thumbnails that failed on a request error are retried after this
+
+/**
+ * Promise wrapper around the icon worker
+ */
+class IconWorkerClient {
+  private worker: Worker | null = null;
+  private nextId = 1;
+  private pending = new Map<number, { resolve: (response: IconWorkerResponse) => void; reject: (error: Error) => void }>();
+
+  private getWorker(): Worker {
+    if (!this.worker) {
+      this.worker = new Worker(new URL('./iconAtlas.worker.ts', import.meta.url), { type: 'module' });
+      this.worker.onmessage = (event: MessageEvent<IconWorkerResponse>) => {
+        const waiter = this.pending.get(event.data.id);
+        this.pending.delete(event.data.id);
+        waiter?.resolve(event.data);
+      };
+      this.worker.onerror = (event) => {
+        console.error('Icon worker failed:', event.message);
+        this.pending.forEach(waiter => waiter.reject(new Error(`Icon worker failed: ${event.message}`)));
+        this.pending.clear();
+        this.worker = null;
+      };
+    }
+    return this.worker;
+  }
+
+  async send(body: WorkerRequestBody): Promise<IconWorkerResponse & { ok: true }> {
+    const id = this.nextId++;
+    const response = await new Promise<IconWorkerResponse>((resolve, reject) => {
+      this.pending.set(id, { resolve, reject });
+      this.getWorker().postMessage({ ...body, id });
+    });
+    if (!response.ok) {
+      throw new Error(response.error);
+    }
+    return response;
+  }
+}
+
+const workerClient = new IconWorkerClient();
+const svgCache = new Map<string, string>();
+
+/**
+ * All icon ids of an Iconify collection
+ */
+export async function listIconifyCollection(prefix: string): Promise<string[]> {
+  const response = await workerClient.send({ type: 'list', prefix });
+  return 'ids' in response ? response.ids : [];
+}
+
+/**
+ * Search Iconify icon ids across collections
+ */
+export async function searchIconify(query: string, prefixes: string[]): Promise<string[]> {
+  const response = await workerClient.send({ type: 'search', query, prefixes });
+  return 'ids' in response ? response.ids : [];
+}
+
+/**
+ * SVGs of Iconify icons: memory, then IndexedDB, then the API (batched per collection)
+ *
+ * Ids the API does not know are left out of the result. If a collection
+ * request fails, everything that did load is still cached and the call
+ * throws, so callers do not mistake a network error for a missing icon.
+ */
+export async function loadIconifySvgs(ids: string[]): Promise<Map<string, string>> {
+  const svgs = new Map<string, string>();
+  let missing = ids.filter(id => {
+    const svg = svgCache.get(id);
+    if (svg) svgs.set(id, svg);
+    return !svg;
+  });
+  if (missing.length === 0) return svgs;
+
+  try {
+    const db = await openDatabase();
+    const store = db.transaction(ICON_SVGS_STORE, 'readonly').objectStore(ICON_SVGS_STORE);
+    const stored = await Promise.all(missing.map(id => requestToPromise<string | undefined>(store.get(id))));
+    missing = missing.filter((id, i) => {
+      if (stored[i]) svgs.set(id, stored[i]!);
+      return !stored[i];
+    });
+  } catch (error) {
+    console.error('Failed to read icon cache:', error);
+  }
+
+  // One worker request per collection; the worker batches API requests
+  const byPrefix = new Map<string, string[]>();
+  for (const id of missing) {
+    const [prefix, name] = splitIconId(id);
+    byPrefix.set(prefix, [...(byPrefix.get(prefix) ?? []), name]);
+  }
+
+  const fetched: Record<string, string> = {};
+  const failedPrefixes: string[] = [];
+  await Promise.all([...byPrefix].map(async ([prefix, names]) => {
+    try {
+      const response = await workerClient.send({ type: 'icons', prefix, names });
+      if ('svgs' in response) Object.assign(fetched, response.svgs);
+    } catch (error) {
+      console.error(`Failed to fetch icons from ${prefix}:`, error);
+      failedPrefixes.push(prefix);
+    }
+  }));
+
+  if (Object.keys(fetched).length > 0) {
+    try {
+      const db = await openDatabase();
+      const tx = db.transaction(ICON_SVGS_STORE, 'readwrite');
+      Object.entries(fetched).forEach(([id, svg]) => tx.objectStore(ICON_SVGS_STORE).put(svg, id));
+      await transactionDone(tx);
+    } catch (error) {
+      console.error('Failed to write icon cache:', error);
+    }
+  }
+
+  for (const [id, svg] of [...svgs, ...Object.entries(fetched)]) {
+    svgs.set(id, svg);
+    if (svgCache.size >= MAX_CACHED_SVGS) {
+      svgCache.delete(svgCache.keys().next().value!);
+    }
+    svgCache.set(id, svg);
+  }
+
+  if (failedPrefixes.length > 0) {
+    throw new Error(`Failed to fetch icons from ${failedPrefixes.join(', ')}`);
+  }
+  return svgs;
+}
+
+/**
+ * Give the root element an explicit size so thumbnails are rendered sharp
+ * (Iconify SVGs are 1em, built-in ones have no intrinsic size at all)
+ */
+function sizeSvg(svg: string, size: number): string {
+  return svg.replace(/<svg\b[^>]*>/, tag =>
+    tag.replace(/\s(width|height)="[^"]*"/g, '').replace('<svg', `<svg width="${size}" height="${size}"`)
+  );
+}
+
+/**
+ * Decode an SVG with an image element (fallback when the worker cannot rasterize)
+ */
+async function decodeSvg(svg: string): Promise<HTMLImageElement | null> {
+  const img = new Image();
+  const url = URL.createObjectURL(new Blob([svg], { type: 'image/svg+xml' }));
+  try {
+    img.src = url;
+    await img.decode();
+    return img;
+  } catch {
+    return null;
+  } finally {
+    URL.revokeObjectURL(url);
+  }
+}
+
+export class IconAtlas {
+  readonly cellSize: number; // Device pixels per thumbnail
+  private loadSvgs: SvgLoader | null;
+  private pages: HTMLCanvasElement[] = [];
+  private slots = new Map<string, AtlasSlot>();
+  private slotIds: string[][] = []; // Ids stored on each page, for recycling
+  private nextCell = 0; // Cells handed out so far (wraps around MAX_PAGES)
+  private queue = new Map<string, AtlasRequest>(); // Most recent requests first
+  private inFlight = new Set<string>();
+  private failed = new Map<string, number>(); // Id -> time it may be retried (Infinity if it never will)
+  private processing = false;
+  private workerRasterizes = true;
+  private listeners = new Set<() => void>();
+
+  /**
+   * @param loadSvgs - Resolves SVGs for requests without one (e.g. loadIconifySvgs)
+   */
+  constructor(cellSize: number, loadSvgs: SvgLoader | null = null) {
+    this.cellSize = cellSize;
+    this.loadSvgs = loadSvgs;
+  }
+
+  getSlot(id: string): AtlasSlot | undefined {
+    return this.slots.get(id);
+  }
+
+  /**
+   * Call the listener whenever thumbnails were added or recycled
+   */
+  subscribe(listener: () => void): () => void {
+    this.listeners.add(listener);
+    return () => {
+      this.listeners.delete(listener);
+    };
+  }
+
+  /**
+   * Queue thumbnails for rasterization, ahead of earlier requests
+   *
+   * Pass what is visible now; already rasterized ids are ignored.
+   */
+  request(requests: AtlasRequest[]): void {
+    const fresh = requests.filter(r => !this.slots.has(r.id) && !this.inFlight.has(r.id) && !this.hasFailed(r.id));
+    if (fresh.length === 0) return;
+
+    const queue = new Map(fresh.map(r => [r.id, r]));
+    for (const [id, r] of this.queue) {
+      if (queue.size >= MAX_QUEUED) break;
+      if (!queue.has(id)) queue.set(id, r);
+    }
+    this.queue = queue;
+
+    if (!this.processing) {
+      this.processing = true;
+      this.process().finally(() => {
+        this.processing = false;
+      });
+    }
+  }
+
+  /**
+   * Whether an id failed and is not due for a retry yet
+   */
+  private hasFailed(id: string): boolean {
+    const retryAt = this.failed.get(id);
+    if (retryAt === undefined) return false;
+    if (Date.now() < retryAt) return true;
+    this.failed.delete(id);
+    return false;
+  }
+
+  private async process(): Promise<void> {
+    while (this.queue.size > 0) {
+      const batch = [...this.queue.values()].slice(0, BATCH_SIZE);
+      batch.forEach(r => {
+        this.queue.delete(r.id);
+        this.inFlight.add(r.id);
+      });
+
+      try {
+        await this.rasterizeBatch(batch);
+      } catch (error) {
+        console.error('Failed to rasterize icon thumbnails:', error);
+        const retryAt = Date.now() + RETRY_AFTER_MS;
+        batch.forEach(r => this.failed.set(r.id, retryAt));
+      } finally {
+        batch.forEach(r => this.inFlight.delete(r.id));
+      }
+      this.listeners.forEach(listener => listener());
+    }
+  }
+
+  private async rasterizeBatch(batch: AtlasRequest[]): Promise<void> {
+    const unknown = batch.filter(r => !r.svg).map(r => r.id);
+    const loaded = unknown.length > 0 && this.loadSvgs ? await this.loadSvgs(unknown) : new Map<string, string>();
+
+    const icons = batch.flatMap(r => {
+      const svg = r.svg ?? loaded.get(r.id);
+      if (!svg) {
+        this.failed.set(r.id, Infinity); // Unknown to the API
+        return [];
+      }
+      return [{ id: r.id, svg: sizeSvg(svg.replace(/currentColor/g, THUMBNAIL_COLOR), this.cellSize) }];
+    });
+    if (icons.length === 0) return;
+
+    if (this.workerRasterizes) {
+      try {
+        const response = await workerClient.send({ type: 'rasterize', svgs: icons.map(i => i.svg), cellSize: this.cellSize });
+        const bitmap = 'bitmap' in response ? response.bitmap : null;
+        if (bitmap) {
+          icons.forEach((icon, i) => this.store(icon.id, bitmap, i * this.cellSize, 0, this.cellSize, this.cellSize));
+          bitmap.close();
+          return;
+        }
+      } catch (error) {
+        console.warn('Icon worker unavailable, rasterizing on the main thread:', error);
+      }
+      this.workerRasterizes = false;
+    }
+
+    const images = await Promise.all(icons.map(icon => decodeSvg(icon.svg)));
+    icons.forEach((icon, i) => {
+      const img = images[i];
+      if (!img) {
+        this.failed.set(icon.id, Infinity); // Not a valid SVG
+        return;
+      }
+      // Fit and center like the worker does
+      const scale = Math.min(this.cellSize / img.width, this.cellSize / img.height);
+      const width = img.width * scale;
+      const height = img.height * scale;
+      this.store(icon.id, img, 0, 0, img.width, img.height, (this.cellSize - width) / 2, (this.cellSize - height) / 2, width, height);
+    });
+  }
+
+  /**
+   * Copy a thumbnail into the next free cell, recycling the oldest page when full
+   */
+  private store(
+    id: string,
+    source: CanvasImageSource,
+    sx: number, sy: number, sw: number, sh: number,
+    dx: number = 0, dy: number = 0, dw: number = this.cellSize, dh: number = this.cellSize
+  ): void {
+    const cellsPerPage = PAGE_CELLS * PAGE_CELLS;
+    const pageIndex = Math.floor(this.nextCell / cellsPerPage) % MAX_PAGES;
+    const cell = this.nextCell % cellsPerPage;
+    this.nextCell++;
+
+    let page = this.pages[pageIndex];
+    if (!page) {
+      page = document.createElement('canvas');
+      page.width = page.height = PAGE_CELLS * this.cellSize;
+      this.pages[pageIndex] = page;
+      this.slotIds[pageIndex] = [];
+    } else if (cell === 0) {
+      // Wrapped around: forget everything on this page
+      this.slotIds[pageIndex].forEach(old => this.slots.delete(old));
+      this.slotIds[pageIndex] = [];
+      page.getContext('2d')!.clearRect(0, 0, page.width, page.height);
+    }
+
+    const x = (cell % PAGE_CELLS) * this.cellSize;
+    const y = Math.floor(cell / PAGE_CELLS) * this.cellSize;
+    page.getContext('2d')!.drawImage(source, sx, sy, sw, sh, x + dx, y + dy, dw, dh);
+
+    this.slots.set(id, { page, x, y, size: this.cellSize });
+    this.slotIds[pageIndex].push(id);
+  }
+}
+
+const atlases = new Map<string, IconAtlas>();
+
+/**
+ * Shared atlas for thumbnails of a given CSS size at the current devicePixelRatio
+ *
+ * @param source - 'iconify' loads SVGs by icon id; 'local' expects them in the request
+ */
+export function getIconAtlas(source: 'iconify' | 'local', cssSize: number): IconAtlas {
+  const cellSize = Math.round(cssSize * (window.devicePixelRatio || 1));
+  const key = `${source}@${cellSize}`;
+  let atlas = atlases.get(key);
+  if (!atlas) {
+    atlas = new IconAtlas(cellSize, source === 'iconify' ? loadIconifySvgs : null);
+    atlases.set(key, atlas);
+  }
+  return atlas;
+}
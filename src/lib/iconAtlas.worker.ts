@@ -0,0 +1,85 @@
+/**
+ * Icon worker: Iconify requests and SVG rasterization off the main thread
+ *
+ * Listing a whole collection and parsing icon JSON happen here so browsing
+ * large collections never blocks input. Rasterizing needs SVG support in
+ * createImageBitmap, which not every browser has in workers; the worker
+ * answers null bitmaps then and the atlas decodes on the main thread.
+ */
+
+import { fetchCollectionIds, fetchIconSvgs, searchIconIds } from './iconifyApi';
+
+export type IconWorkerRequest =
+  | { id: number; type: 'list'; prefix: string }
+  | { id: number; type: 'search'; query: string; prefixes: string[] }
+  | { id: number; type: 'icons'; prefix: string; names: string[] }
+  | { id: number; type: 'rasterize'; svgs: string[]; cellSize: number };
+
+export type IconWorkerResponse =
+  | { id: number; ok: true; ids: string[] } // list, search
+  | { id: number; ok: true; svgs: Record<string, string> } // icons
+  | { id: number; ok: true; bitmap: ImageBitmap | null } // rasterize: one row of cells, null if unsupported
+  | { id: number; ok: false; error: string };
+
+const PROBE_SVG = '<svg xmlns="http://www.w3.org/2000/svg" width="1" height="1"/>';
+
+const svgBitmapsSupported: Promise<boolean> =
+  typeof OffscreenCanvas === 'undefined'
+    ? Promise.resolve(false)
+    : createImageBitmap(new Blob([PROBE_SVG], { type: 'image/svg+xml' })).then(
+        (bitmap) => {
+          bitmap.close();
+          return true;
+        },
+        () => false
+      );
+
+/**
+ * Draw SVGs side by side into one row of square cells, each fitted and centered
+ */
+async function rasterize(svgs: string[], cellSize: number): Promise<ImageBitmap | null> {
+  if (!(await svgBitmapsSupported)) return null;
+
+  const canvas = new OffscreenCanvas(cellSize * svgs.length, cellSize);
+  const ctx = canvas.getContext('2d')!;
+
+  await Promise.all(svgs.map(async (svg, i) => {
+    try {
+      const bitmap = await createImageBitmap(new Blob([svg], { type: 'image/svg+xml' }));
+      const scale = Math.min(cellSize / bitmap.width, cellSize / bitmap.height);
+      const width = bitmap.width * scale;
+      const height = bitmap.height * scale;
+      ctx.drawImage(bitmap, i * cellSize + (cellSize - width) / 2, (cellSize - height) / 2, width, height);
+      bitmap.close();
+    } catch {
+      // Leave the cell empty; the grid shows a blank thumbnail
+    }
+  }));
+
+  return canvas.transferToImageBitmap();
+}
+
+async function handle(request: IconWorkerRequest): Promise<IconWorkerResponse> {
+  switch (request.type) {
+    case 'list':
+      return { id: request.id, ok: true, ids: await fetchCollectionIds(request.prefix) };
+    case 'search':
+      return { id: request.id, ok: true, ids: await searchIconIds(request.query, request.prefixes) };
+    case 'icons':
+      return { id: request.id, ok: true, svgs: await fetchIconSvgs(request.prefix, request.names) };
+    case 'rasterize':
+      return { id: request.id, ok: true, bitmap: await rasterize(request.svgs, request.cellSize) };
+  }
+}
+
+self.addEventListener('message', async (event: MessageEvent<IconWorkerRequest>) => {
+  let response: IconWorkerResponse;
+  try {
+    response = await handle(event.data);
+  } catch (error) {
+    response = { id: event.data.id, ok: false, error: error instanceof Error ? error.message : String(error) };
+  }
+
+  const transfer = 'bitmap' in response && response.bitmap ? [response.bitmap] : [];
+  self.postMessage(response, { transfer });
+});
@@ -0,0 +1,147 @@
+/**
+ * Iconify API access without DOM dependencies
+ *
+ * Shared by the icon worker (src/lib/iconAtlas.worker.ts) and the main
+ * thread. Whole collections are listed with one request and icon bodies
+ * are fetched in batches through the JSON API instead of one .svg request
+ * per icon.
+ */
+
+export type IconLibraryType =
+  | 'fa' | 'fa7' | 'lucide' | 'ph' | 'game-icons' | 'cbi' | 'material-symbols' | 'solar' | 'tabler' | 'iconamoon';
+
+const API_BASE = 'https://api.iconify.design';
+
+// Iconify search returns at most 999 results per request
+const MAX_SEARCH_RESULTS = 999;
+
+// Keep JSON API URLs well below common URL length limits
+const MAX_ICONS_PER_REQUEST = 100;
+
+interface IconifyIcon {
+  body: string;
+  width?: number;
+  height?: number;
+  left?: number;
+  top?: number;
+}
+
+interface IconifyIconSet {
+  prefix: string;
+  icons: Record<string, IconifyIcon>;
+  aliases?: Record<string, { parent: string; width?: number; height?: number }>;
+  width?: number;
+  height?: number;
+  left?: number;
+  top?: number;
+}
+
+interface IconifyCollection {
+  prefix: string;
+  uncategorized?: string[];
+  categories?: Record<string, string[]>;
+}
+
+/**
+ * Library a collection belongs to (fa-solid and fa-regular are both 'fa')
+ */
+export function getLibraryType(collection: string): IconLibraryType {
+  if (collection.startsWith('fa7-')) return 'fa7';
+  if (collection.startsWith('fa-')) return 'fa';
+  switch (collection) {
+    case 'lucide':
+    case 'ph':
+    case 'game-icons':
+    case 'cbi':
+    case 'material-symbols':
+    case 'solar':
+    case 'tabler':
+    case 'iconamoon':
+      return collection;
+    default:
+      return 'fa';
+  }
+}
+
+/**
+ * Embed the library as an HTML comment so CanvasRenderer can pick its scale factor
+ */
+export function tagIconSvg(collection: string, svg: string): string {
+  const libraryType = getLibraryType(collection);
+  const libraryTag = libraryType === 'fa' ? 'font-awesome' :
+                     libraryType === 'fa7' ? 'font-awesome-7' :
+                     libraryType === 'ph' ? 'phosphor' : libraryType;
+  return svg.replace('<svg', `<!-- ${libraryTag} --><svg`);
+}
+
+/**
+ * Split a full icon id ('lucide:home') into collection and name
+ */
+export function splitIconId(id: string): [string, string] {
+  const separator = id.indexOf(':');
+  return [id.slice(0, separator), id.slice(separator + 1)];
+}
+
+async function getJson<T>(url: string): Promise<T> {
+  const response = await fetch(url);
+  if (!response.ok) {
+    throw new Error(`Iconify request failed: ${response.status} ${url}`);
+  }
+  return response.json();
+}
+
+/**
+ * All icon ids of a collection, e.g. 'lucide:home'
+ */
+export async function fetchCollectionIds(prefix: string): Promise<string[]> {
+  const data = await getJson<IconifyCollection>(`${API_BASE}/collection?prefix=${encodeURIComponent(prefix)}`);
+  const names = new Set(data.uncategorized ?? []);
+  for (const category of Object.values(data.categories ?? {})) {
+    category.forEach(name => names.add(name));
+  }
+  return [...names].map(name => `${prefix}:${name}`);
+}
+
+/**
+ * Search icon ids across collections
+ */
+export async function searchIconIds(query: string, prefixes: string[]): Promise<string[]> {
+  const data = await getJson<{ icons: string[] }>(
+    `${API_BASE}/search?query=${encodeURIComponent(query)}` +
+    `&prefixes=${prefixes.map(encodeURIComponent).join(',')}&limit=${MAX_SEARCH_RESULTS}`
+  );
+  return data.icons ?? [];
+}
+
+/**
+ * Fetch SVGs of icons in one collection, at most MAX_ICONS_PER_REQUEST per request
+ *
+ * SVGs match the .svg endpoint with color=currentColor. Icons that do not
+ * exist are missing from the result.
+ */
+export async function fetchIconSvgs(prefix: string, names: string[]): Promise<Record<string, string>> {
+  const svgs: Record<string, string> = {};
+
+  for (let i = 0; i < names.length; i += MAX_ICONS_PER_REQUEST) {
+    const batch = names.slice(i, i + MAX_ICONS_PER_REQUEST);
+    const data = await getJson<IconifyIconSet>(
+      `${API_BASE}/${encodeURIComponent(prefix)}.json?icons=${batch.map(encodeURIComponent).join(',')}`
+    );
+
+    for (const name of batch) {
+      const alias = data.aliases?.[name];
+      const icon = data.icons[name] ?? (alias && data.icons[alias.parent]);
+      if (!icon) continue;
+
+      const left = icon.left ?? data.left ?? 0;
+      const top = icon.top ?? data.top ?? 0;
+      const width = alias?.width ?? icon.width ?? data.width ?? 16;
+      const height = alias?.height ?? icon.height ?? data.height ?? 16;
+      svgs[`${prefix}:${name}`] =
+        `<svg xmlns="http://www.w3.org/2000/svg" width="1em" height="1em" viewBox="${left} ${top} ${width} ${height}">` +
+        `${icon.body}</svg>`;
+    }
+  }
+
+  return svgs;
+}
@@ -0,0 +1,109 @@
+/**
+ * Label layout shared by the editor and the headless renderer
+ *
+ * CanvasRenderer and cli/headlessRenderer.ts both place text and icons
+ * with these helpers. They only need a MeasureContext, so the browser
+ * canvas and @napi-rs/canvas give the same font sizes, line breaks and
+ * positions for a template.
+ */
+
+import { FitConstraints, FitOptions, MeasureContext } from './textFit';
+
+export const LABEL_MARGIN_MM = 2; // Horizontal margin on each side of the label
+export const TEXT_ICON_GAP = 0.05; // Gap between text and icon, as a share of the icon width
+
+/**
+ * Fit box for the text solver: the printable height, and the space between
+ * the margins unless the label grows with its content (then one line)
+ */
+export function getFitBox(widthMm: number, heightMm: number, pixelsPerMm: number, autoWidth: boolean): FitConstraints {
+  return {
+    maxWidth: autoWidth ? Infinity : (widthMm - LABEL_MARGIN_MM * 2) * pixelsPerMm,
+    maxHeight: heightMm * pixelsPerMm,
+    maxLines: autoWidth ? 1 : 3
+  };
+}
+
+/**
+ * Detect icon library and return scale factor
+ * Lucide: 92/120 = 0.7667
+ * Phosphor: 100/120 = 0.8333 (increased from 97/120)
+ * Font Awesome: 85/120 = 0.7083
+ */
+export function getIconScaleFactor(svgContent: string): number {
+  // Check most specific patterns first
+  if (svgContent.includes('font-awesome') || svgContent.includes('fa-')) {
+    return 0.7083;
+  }
+  if (svgContent.includes('phosphor') || svgContent.includes('Phosphor') || svgContent.includes('ph:')) {
+    return 0.8333;
+  }
+  // Lucide icons typically have a stroke-width attribute; also the default
+  return 0.7667;
+}
+
+/**
+ * Fit options for single-line text followed by an icon
+ *
+ * @param iconRatio - Drawn icon size (after getIconScaleFactor) per px of font size
+ */
+export function textIconFitOptions<T extends FitOptions>(fit: T, iconRatio: number): T {
+  return {
+    ...fit,
+    maxLines: 1,
+    inlineWidth: iconRatio * (1 + TEXT_ICON_GAP),
+    inlineHeight: iconRatio
+  };
+}
+
+/**
+ * Baseline of the first line, relative to the label center, that centers
+ * the lines on their actual ink bounds
+ *
+ * ctx.font must already be set to the font at fontSize.
+ */
+export function firstBaseline(ctx: MeasureContext, lines: string[], fontSize: number, lineHeight: number): number {
+  let maxAscent = 0;
+  let maxDescent = 0;
+
+  for (const line of lines) {
+    const metrics = ctx.measureText(line);
+    maxAscent = Math.max(maxAscent, metrics.actualBoundingBoxAscent || metrics.fontBoundingBoxAscent || fontSize * 0.8);
+    maxDescent = Math.max(maxDescent, metrics.actualBoundingBoxDescent || metrics.fontBoundingBoxDescent || fontSize * 0.2);
+  }
+
+  const verticalOffset = -(maxAscent + maxDescent) / 2 + maxAscent;
+  return verticalOffset - ((lines.length - 1) * fontSize * lineHeight) / 2;
+}
+
+export interface TextIconPlacement {
+  textX: number; // Left edge of the text, relative to the label center
+  icon: { x: number; y: number; width: number; height: number }; // Relative to the label center
+}
+
+/**
+ * Center text followed by an icon, keeping the icon's aspect ratio
+ *
+ * @param iconSize - Requested icon size; scaled by getIconScaleFactor
+ */
+export function placeTextIcon(
+  textWidth: number,
+  imageWidth: number,
+  imageHeight: number,
+  iconSize: number,
+  scaleFactor: number
+): TextIconPlacement {
+  const scaledSize = iconSize * scaleFactor;
+  const aspectRatio = imageWidth / imageHeight;
+
+  // Wide icons keep the width, tall ones the height
+  const width = aspectRatio < 1 ? scaledSize * aspectRatio : scaledSize;
+  const height = aspectRatio > 1 ? scaledSize / aspectRatio : scaledSize;
+
+  const gap = width * TEXT_ICON_GAP;
+  const textX = -(textWidth + gap + width) / 2;
+  return {
+    textX,
+    icon: { x: textX + textWidth + gap, y: -height / 2, width, height }
+  };
+}
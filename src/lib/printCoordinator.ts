@@ -0,0 +1,347 @@
+/**
+ * Cross-tab printer coordination
+ *
+ * A BLE printer accepts one GATT connection, so only one browser tab can
+ * talk to it. The tab that connects takes an exclusive Web Lock and becomes
+ * the owner; other tabs see its status over a BroadcastChannel and submit
+ * encoded jobs to the owner's queue instead of connecting themselves.
+ * Progress and results are broadcast back to the submitting tab.
+ *
+ *   hello     new tab asks the owner for its state
+ *   state     owner status, printer state and queue length
+ *   submit    serialized job from another tab
+ *   progress  raster progress of a submitted job
+ *   result    debug info or error of a submitted job
+ *
+ * Jobs from every tab (and the spooler) run one at a time through the
+ * owner's queue and are journaled there. Streamed labels share the queue
+ * but are not journaled: their rows are never held in full, so there is
+ * nothing to resume from. When the owner closes, its lock is
+ * released and the other tabs drop back to disconnected, so any of them can
+ * connect. Without Web Locks or BroadcastChannel every tab works alone.
+ */
+
+import { PhomemoD30Printer, PrinterDebugInfo, PrinterState, PrinterStatus } from './PhomemoD30Printer';
+import { JournalJobInfo } from './printJournal';
+import { PrintProgress } from './printMetrics';
+import { EncodedJob, FooterMode, MediaType, parseJob, serializeJob } from './escpos';
+
+export type PrinterRole = 'owner' | 'remote' | 'none';
+
+type CoordinatorMessage =
+  | { type: 'hello' }
+  | { type: 'state'; status: PrinterStatus; printerState: PrinterState | null; queued: number }
+  | { type: 'submit'; jobId: string; bytes: Uint8Array; info: JournalJobInfo }
+  | { type: 'progress'; jobId: string; progress: PrintProgress }
+  | { type: 'result'; jobId: string; ok: true; debug: PrinterDebugInfo }
+  | { type: 'result'; jobId: string; ok: false; error: string };
+
+const CHANNEL_NAME = 'phomemo-d30-printer';
+const LOCK_NAME = 'phomemo-d30-printer-owner';
+
+export class PrintCoordinator {
+  readonly printer: PhomemoD30Printer;
+  public role: PrinterRole = 'none';
+  public queued = 0; // Jobs waiting in the owner's queue, including the one printing
+  public onStatusChange?: (status: PrinterStatus, printerState: PrinterState | null, role: PrinterRole) => void;
+  public onProgress?: (progress: PrintProgress) => void;
+
+  private channel: BroadcastChannel | null = null;
+  private releaseLock: (() => void) | null = null;
+  private watchingOwner = false;
+  private remoteStatus: PrinterStatus = 'disconnected';
+  private remotePrinterState: PrinterState | null = null;
+  private queue: Promise<unknown> = Promise.resolve();
+  private remoteJobId: string | null = null; // Submitted job the owner is printing
+  private submitted = new Map<string, { resolve: (debug: PrinterDebugInfo) => void; reject: (error: Error) => void }>();
+
+  constructor(printer: PhomemoD30Printer) {
+    this.printer = printer;
+
+    printer.onStatusChange = (status) => {
+      if (this.role === 'owner') {
+        this.broadcastState();
+        if (status === 'disconnected') {
+          this.release();
+        }
+      }
+      this.emitStatus();
+    };
+    printer.onProgress = (progress) => {
+      if (this.remoteJobId) {
+        this.post({ type: 'progress', jobId: this.remoteJobId, progress });
+      } else {
+        this.onProgress?.(progress);
+      }
+    };
+
+    if (PrintCoordinator.isSupported()) {
+      this.channel = new BroadcastChannel(CHANNEL_NAME);
+      this.channel.onmessage = (event: MessageEvent<CoordinatorMessage>) => this.handleMessage(event.data);
+      this.post({ type: 'hello' });
+    }
+  }
+
+  /**
+   * Status of the printer as seen from this tab (the owner's when remote)
+   */
+  get status(): PrinterStatus {
+    return this.role === 'remote' ? this.remoteStatus : this.printer.status;
+  }
+
+  get printerState(): PrinterState | null {
+    return this.role === 'remote' ? this.remotePrinterState : this.printer.printerState;
+  }
+
+  /**
+   * Connect to the printer and become the owning tab
+   *
+   * Must be called from a user gesture (Web Bluetooth device chooser).
+   */
+  async connect(): Promise<void> {
+    if (this.role === 'remote') {
+      throw new Error('The printer is already connected in another tab');
+    }
+
+    if (this.channel && !this.releaseLock) {
+      const acquired = await new Promise<boolean>((resolve) => {
+        navigator.locks.request(LOCK_NAME, { ifAvailable: true }, async (lock) => {
+          if (!lock) {
+            resolve(false);
+            return;
+          }
+          resolve(true);
+          // Hold the lock until released (or the tab closes)
+          await new Promise<void>(release => {
+            this.releaseLock = release;
+          });
+        });
+      });
+      if (!acquired) {
+        throw new Error('The printer is already connected in another tab');
+      }
+    }
+
+    try {
+      this.role = 'owner';
+      await this.printer.connect();
+      this.broadcastState();
+    } catch (error) {
+      this.release();
+      this.emitStatus();
+      throw error;
+    }
+  }
+
+  /**
+   * Disconnect (owner only) and let other tabs connect
+   */
+  disconnect(): void {
+    if (this.role === 'owner') {
+      this.printer.disconnect();
+    }
+  }
+
+  /**
+   * Print an encoded job: in this tab when it owns the printer, otherwise in the owner's queue
+   *
+   * Jobs are journaled by the tab that prints them.
+   */
+  async print(job: EncodedJob, info?: JournalJobInfo): Promise<PrinterDebugInfo> {
+    const jobInfo = info ?? {
+      label: 'Label',
+      widthMm: (job.bytesPerRow * 8) / this.printer.pixelsPerMm,
+      heightMm: job.lines / this.printer.pixelsPerMm
+    };
+
+    if (this.role !== 'remote') {
+      return this.enqueueJob(job, jobInfo);
+    }
+
+    const jobId = `${Date.now()}-${Math.random().toString(36).slice(2, 8)}`;
+    return new Promise<PrinterDebugInfo>((resolve, reject) => {
+      this.submitted.set(jobId, { resolve, reject });
+      this.post({ type: 'submit', jobId, bytes: serializeJob(job), info: jobInfo });
+    });
+  }
+
+  /**
+   * Print a label streamed as packed rows, after everything already queued
+   *
+   * Streams cannot be handed to another tab, so only the owner (or a tab
+   * while no other owns the printer) may print them.
+   */
+  printStream(
+    rows: AsyncIterable<Uint8Array>,
+    bytesPerRow: number,
+    footerMode?: FooterMode,
+    mediaType?: MediaType,
+    extraFeedMm?: number
+  ): Promise<PrinterDebugInfo> {
+    if (this.role === 'remote') {
+      return Promise.reject(new Error('Print streamed labels from the tab that is connected to the printer'));
+    }
+    return this.enqueue(() => this.printer.printStream(rows, bytesPerRow, footerMode, mediaType, extraFeedMm));
+  }
+
+  /**
+   * Resume an interrupted journal entry through this tab's queue
+   *
+   * Only the owner (or a tab while no other owns the printer) may resume, so
+   * the entry cannot be sent twice.
+   */
+  resume(journalId: string): Promise<PrinterDebugInfo | null> {
+    if (this.role === 'remote') {
+      return Promise.reject(new Error('Resume from the tab that is connected to the printer'));
+    }
+    return this.enqueue(() => this.printer.resumeJob(journalId));
+  }
+
+  /**
+   * Check whether another tab holds the owner lock
+   *
+   * Unlike role this is known before the owner has answered hello.
+   */
+  async isOwnedElsewhere(): Promise<boolean> {
+    if (!this.channel || this.role === 'owner') return false;
+    const { held } = await navigator.locks.query();
+    return held?.some(lock => lock.name === LOCK_NAME && lock.mode === 'exclusive') ?? false;
+  }
+
+  /**
+   * Journal and print a job after everything already queued in this tab
+   */
+  private enqueueJob(job: EncodedJob, info: JournalJobInfo, remoteJobId: string | null = null): Promise<PrinterDebugInfo> {
+    return this.enqueue(async () => {
+      this.printer.checkReady();
+      const journal = this.printer.journal;
+      const [journalId] = journal ? await journal.enqueue([{ job, info }]) : [undefined];
+      return this.printer.printJob(job, info.widthMm, info.heightMm, journalId);
+    }, remoteJobId);
+  }
+
+  /**
+   * Run a task after everything already queued in this tab
+   */
+  private enqueue<T>(task: () => Promise<T>, remoteJobId: string | null = null): Promise<T> {
+    this.queued++;
+    this.broadcastState();
+
+    const run = async () => {
+      this.remoteJobId = remoteJobId;
+      try {
+        return await task();
+      } finally {
+        this.remoteJobId = null;
+        this.queued--;
+        this.broadcastState();
+      }
+    };
+
+    const result = this.queue.then(run, run);
+    this.queue = result.catch(() => undefined);
+    return result;
+  }
+
+  private handleMessage(message: CoordinatorMessage): void {
+    switch (message.type) {
+      case 'hello':
+        if (this.role === 'owner') this.broadcastState();
+        break;
+
+      case 'state':
+        if (this.role === 'owner') break;
+        this.remoteStatus = message.status;
+        this.remotePrinterState = message.printerState;
+        this.queued = message.queued;
+        this.role = message.status === 'disconnected' ? 'none' : 'remote';
+        if (this.role === 'remote') this.watchOwner();
+        this.emitStatus();
+        break;
+
+      case 'submit':
+        if (this.role === 'owner') this.printSubmitted(message.jobId, message.bytes, message.info);
+        break;
+
+      case 'progress':
+        if (this.submitted.has(message.jobId)) this.onProgress?.(message.progress);
+        break;
+
+      case 'result': {
+        const waiter = this.submitted.get(message.jobId);
+        if (!waiter) break;
+        this.submitted.delete(message.jobId);
+        if (message.ok) {
+          waiter.resolve(message.debug);
+        } else {
+          waiter.reject(new Error(message.error));
+        }
+        break;
+      }
+    }
+  }
+
+  /**
+   * Print a job submitted by another tab and report the result back
+   */
+  private async printSubmitted(jobId: string, bytes: Uint8Array, info: JournalJobInfo): Promise<void> {
+    try {
+      const debug = await this.enqueueJob(parseJob(bytes), info, jobId);
+      this.post({ type: 'result', jobId, ok: true, debug });
+    } catch (error) {
+      this.post({ type: 'result', jobId, ok: false, error: error instanceof Error ? error.message : String(error) });
+    }
+  }
+
+  /**
+   * Notice when the owning tab goes away: its exclusive lock is then released
+   */
+  private watchOwner(): void {
+    if (this.watchingOwner) return;
+    this.watchingOwner = true;
+
+    navigator.locks.request(LOCK_NAME, { mode: 'shared' }, () => {
+      this.watchingOwner = false;
+      if (this.role !== 'remote') return;
+
+      this.role = 'none';
+      this.remoteStatus = 'disconnected';
+      this.remotePrinterState = null;
+      this.queued = 0;
+      this.submitted.forEach(waiter => waiter.reject(new Error('The tab connected to the printer was closed')));
+      this.submitted.clear();
+      this.emitStatus();
+    });
+  }
+
+  private release(): void {
+    this.role = 'none';
+    this.releaseLock?.();
+    this.releaseLock = null;
+  }
+
+  private broadcastState(): void {
+    if (this.role !== 'owner') return;
+    this.post({
+      type: 'state',
+      status: this.printer.status,
+      printerState: this.printer.printerState,
+      queued: this.queued
+    });
+  }
+
+  private emitStatus(): void {
+    this.onStatusChange?.(this.status, this.printerState, this.role);
+  }
+
+  private post(message: CoordinatorMessage): void {
+    this.channel?.postMessage(message);
+  }
+
+  /**
+   * Check if tabs can share one printer connection
+   */
+  static isSupported(): boolean {
+    return typeof BroadcastChannel !== 'undefined' && typeof navigator !== 'undefined' && 'locks' in navigator;
+  }
+}
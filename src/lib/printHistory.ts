@@ -35,6 +35,8 @@ export interface PrintHistoryItem {
   textIconItalic?: boolean;
   textIconFontWeight?: number;
 
+  fitText?: boolean; // Font size solved to fit the label (text and texticon tabs)
+
   selectedIcon?: { name: string; svg: string };
   iconLabel?: string;
 
@@ -48,6 +50,16 @@ export interface PrintHistoryItem {
   footerMode?: 'standard' | 'nofeed' | 'formfeed' | 'cut' | 'simple' | 'reset' | 'multi' | 'none';
   mediaType?: 'gaps' | 'continuous' | 'marks';
   extraFeedMm?: number;
+
+  // Print profile the job was encoded with, and how long it took to print
+  printProfile?: {
+    name: string;
+    speed: number;
+    density: number;
+    peakCoverage: number; // 0-1
+  };
+  printDurationMs?: number;
+  copies?: number; // Printed in one job; the compiled job holds all of them
 }
 
 const STORAGE_KEY = 'phomemo-print-history';
@@ -69,8 +81,10 @@ export function getPrintHistory(): PrintHistoryItem[] {
 
 /**
  * Save a print job to history
+ *
+ * @returns The stored item, or null if saving failed
  */
-export function savePrintJob(item: Omit<PrintHistoryItem, 'id' | 'timestamp'>): void {
+export function savePrintJob(item: Omit<PrintHistoryItem, 'id' | 'timestamp'>): PrintHistoryItem | null {
   try {
     const history = getPrintHistory();
 
@@ -84,8 +98,10 @@ export function savePrintJob(item: Omit<PrintHistoryItem, 'id' | 'timestamp'>):
     const updatedHistory = [newItem, ...history].slice(0, MAX_HISTORY_ITEMS);
 
     localStorage.setItem(STORAGE_KEY, JSON.stringify(updatedHistory));
+    return newItem;
   } catch (error) {
     console.error('Failed to save print job:', error);
+    return null;
   }
 }
 
@@ -116,7 +132,9 @@ export function clearPrintHistory(): void {
 /**
  * Get a preview label for a print history item
  */
-export function getPreviewLabel(item: PrintHistoryItem): string {
+export function getPreviewLabel(
+  item: Pick<PrintHistoryItem, 'tab' | 'text' | 'textIconText' | 'iconLabel' | 'selectedIcon' | 'barcodeData' | 'qrData'>
+): string {
   switch (item.tab) {
     case 'text':
       return item.text?.slice(0, 30) || 'Text label';
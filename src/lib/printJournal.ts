@@ -0,0 +1,271 @@
+/**
+ * Durable print journal
+ *
+ * Every job sent to the printer is recorded in IndexedDB before the first
+ * byte goes out, so a reload or a dropped BLE link never loses track of
+ * what was printed:
+ *
+ *   pending  - journaled, nothing sent yet
+ *   sending  - transmission started; `checkpoint` counts the units (raster
+ *              blocks, then the footer) that have been started
+ *   done     - footer sent
+ *
+ * Checkpoints are write-ahead: a unit is only sent once a checkpoint
+ * covering it has committed, so `checkpoint` always includes the block that
+ * was in flight during a crash. Resuming sends that block's label again from
+ * its first block; labels finished before it are not printed twice.
+ *
+ * Writes are coalesced: updates mark entries dirty and every flush commits
+ * all dirty entries in one transaction. Job start, checkpoints and
+ * completion all wait for their flush, so a job is only reported printed
+ * once its done state is stored. A job that fails before anything was sent
+ * is dropped again (abandon), so only jobs that may have printed are ever
+ * offered for resume.
+ */
+
+import { EncodedJob, parseJob, serializeJob } from './escpos';
+import {
+  PRINT_JOURNAL_DATA_STORE,
+  PRINT_JOURNAL_STORE,
+  openDatabase,
+  requestToPromise,
+  transactionDone
+} from './db';
+
+export type JournalState = 'pending' | 'sending' | 'done';
+
+export interface JournalEntry {
+  id: string;
+  label: string; // Human-readable description for the resume prompt
+  state: JournalState;
+  createdAt: number;
+  updatedAt: number;
+  widthMm: number;
+  heightMm: number;
+  byteLength: number;
+  blockCount: number;
+  checkpoint: number; // Units started: blocks 0..blockCount-1, then the footer
+}
+
+export interface JournalJobInfo {
+  label: string;
+  widthMm: number;
+  heightMm: number;
+}
+
+const MAX_DONE_ENTRIES = 500;
+
+export class PrintJournal {
+  private entries = new Map<string, JournalEntry>(); // Entries touched this session
+  private dirty = new Map<string, JournalEntry>();
+  private flushChain: Promise<void> = Promise.resolve();
+
+  /**
+   * Record jobs as pending, in one transaction
+   *
+   * @returns Journal ids, in the same order as the jobs
+   */
+  async enqueue(jobs: { job: EncodedJob; info: JournalJobInfo }[]): Promise<string[]> {
+    const now = Date.now();
+    const records = jobs.map(({ job, info }, i) => {
+      const bytes = serializeJob(job);
+      const entry: JournalEntry = {
+        ...info,
+        id: `${now}-${i}-${Math.random().toString(36).slice(2, 8)}`,
+        state: 'pending',
+        createdAt: now,
+        updatedAt: now,
+        byteLength: bytes.length,
+        blockCount: job.blocks.length,
+        checkpoint: 0
+      };
+      return { entry, data: new Blob([bytes as BlobPart], { type: 'application/octet-stream' }) };
+    });
+
+    const db = await openDatabase();
+    const tx = db.transaction([PRINT_JOURNAL_STORE, PRINT_JOURNAL_DATA_STORE], 'readwrite');
+    for (const { entry, data } of records) {
+      tx.objectStore(PRINT_JOURNAL_STORE).put(entry);
+      tx.objectStore(PRINT_JOURNAL_DATA_STORE).put(data, entry.id);
+      this.entries.set(entry.id, entry);
+    }
+    await transactionDone(tx);
+
+    return records.map(({ entry }) => entry.id);
+  }
+
+  /**
+   * Mark a job as sending; resolves once that is durable
+   */
+  async begin(id: string): Promise<JournalEntry> {
+    const entry = await this.get(id);
+    if (entry.state === 'done') {
+      throw new Error(`Journal entry ${id} was already printed`);
+    }
+    this.update(entry, { state: 'sending' });
+    await this.flush();
+    return entry;
+  }
+
+  /**
+   * Record that units up to (not including) `units` may be sent; resolves once durable
+   */
+  async checkpoint(id: string, units: number): Promise<void> {
+    const entry = await this.get(id);
+    if (units <= entry.checkpoint) return;
+    this.update(entry, { checkpoint: units });
+    await this.flush();
+  }
+
+  /**
+   * Mark a job as printed; resolves once that is durable
+   */
+  async complete(id: string): Promise<void> {
+    const entry = this.entries.get(id);
+    if (!entry) return;
+    this.update(entry, { state: 'done', checkpoint: entry.blockCount + 1 });
+    await this.flush();
+  }
+
+  /**
+   * Forget a job that failed before anything was sent
+   *
+   * Entries that got as far as sending are kept, since part of them may
+   * have printed.
+   */
+  async abandon(id: string): Promise<void> {
+    const entry = await this.get(id);
+    if (entry.state === 'pending') {
+      await this.discard([id]);
+    }
+  }
+
+  /**
+   * Get a journal entry by id
+   */
+  async get(id: string): Promise<JournalEntry> {
+    let entry = this.entries.get(id);
+    if (!entry) {
+      const db = await openDatabase();
+      const store = db.transaction(PRINT_JOURNAL_STORE, 'readonly').objectStore(PRINT_JOURNAL_STORE);
+      entry = await requestToPromise<JournalEntry | undefined>(store.get(id));
+      if (!entry) {
+        throw new Error(`Unknown journal entry ${id}`);
+      }
+      this.entries.set(id, entry);
+    }
+    return entry;
+  }
+
+  /**
+   * Jobs that are pending or were interrupted while sending, oldest first
+   */
+  async getUnfinished(): Promise<JournalEntry[]> {
+    await this.flush();
+    const db = await openDatabase();
+    const index = db.transaction(PRINT_JOURNAL_STORE, 'readonly').objectStore(PRINT_JOURNAL_STORE).index('state');
+    const [pending, sending] = await Promise.all([
+      requestToPromise<JournalEntry[]>(index.getAll('pending')),
+      requestToPromise<JournalEntry[]>(index.getAll('sending'))
+    ]);
+    return [...pending, ...sending].sort((a, b) => a.createdAt - b.createdAt);
+  }
+
+  /**
+   * Load the bytes of a journaled job
+   */
+  async loadJob(id: string): Promise<EncodedJob> {
+    const db = await openDatabase();
+    const store = db.transaction(PRINT_JOURNAL_DATA_STORE, 'readonly').objectStore(PRINT_JOURNAL_DATA_STORE);
+    const data = await requestToPromise<Blob | undefined>(store.get(id));
+    if (!data) {
+      throw new Error(`No data for journal entry ${id}`);
+    }
+    return parseJob(new Uint8Array(await data.arrayBuffer()));
+  }
+
+  /**
+   * Forget jobs without printing them
+   */
+  async discard(ids: string[]): Promise<void> {
+    await this.flush();
+    const db = await openDatabase();
+    const tx = db.transaction([PRINT_JOURNAL_STORE, PRINT_JOURNAL_DATA_STORE], 'readwrite');
+    for (const id of ids) {
+      tx.objectStore(PRINT_JOURNAL_STORE).delete(id);
+      tx.objectStore(PRINT_JOURNAL_DATA_STORE).delete(id);
+      this.entries.delete(id);
+    }
+    await transactionDone(tx);
+  }
+
+  /**
+   * Drop the job bytes of printed jobs and all but the newest done entries
+   */
+  async prune(): Promise<void> {
+    await this.flush();
+    const db = await openDatabase();
+    const tx = db.transaction([PRINT_JOURNAL_STORE, PRINT_JOURNAL_DATA_STORE], 'readwrite');
+    const index = tx.objectStore(PRINT_JOURNAL_STORE).index('state');
+    const done = await requestToPromise<JournalEntry[]>(index.getAll('done'));
+
+    done.sort((a, b) => b.updatedAt - a.updatedAt);
+    done.forEach((entry, i) => {
+      tx.objectStore(PRINT_JOURNAL_DATA_STORE).delete(entry.id);
+      if (i >= MAX_DONE_ENTRIES) {
+        tx.objectStore(PRINT_JOURNAL_STORE).delete(entry.id);
+      }
+      this.entries.delete(entry.id);
+    });
+    await transactionDone(tx);
+  }
+
+  /**
+   * Commit all dirty entries in one transaction
+   */
+  flush(): Promise<void> {
+    // Chain flushes so transactions commit in order; a failed batch is retried next time
+    const run = this.flushChain.then(async () => {
+      if (this.dirty.size === 0) return;
+      const batch = [...this.dirty.values()];
+      this.dirty.clear();
+
+      try {
+        const db = await openDatabase();
+        const tx = db.transaction(PRINT_JOURNAL_STORE, 'readwrite');
+        const store = tx.objectStore(PRINT_JOURNAL_STORE);
+        batch.forEach(entry => store.put({ ...entry }));
+        await transactionDone(tx);
+      } catch (error) {
+        batch.forEach(entry => {
+          if (!this.dirty.has(entry.id)) this.dirty.set(entry.id, entry);
+        });
+        console.error('Failed to write print journal:', error);
+        throw error;
+      }
+    });
+
+    this.flushChain = run.catch(() => {});
+    return run;
+  }
+
+  private update(entry: JournalEntry, changes: Partial<JournalEntry>): void {
+    Object.assign(entry, changes, { updatedAt: Date.now() });
+    this.dirty.set(entry.id, entry);
+  }
+}
+
+/**
+ * First block to send when resuming a job from its checkpoint
+ *
+ * The checkpoint includes the block that was in flight. Resuming rewinds to
+ * the first block of that block's label, since its remaining rows alone
+ * would print as a fragment; labels before it are not printed again.
+ */
+export function resumeStartBlock(job: EncodedJob, checkpoint: number): number {
+  let block = Math.max(0, Math.min(checkpoint, job.blocks.length) - 1);
+  while (block > 0 && !job.blocks[block].separator?.length) {
+    block--;
+  }
+  return block;
+}
@@ -0,0 +1,248 @@
+/**
+ * Print pipeline instrumentation
+ *
+ * Records per-stage timings (render, rotate, pack, header, blocks, footer),
+ * BLE write latency histograms and throughput for each print job. Spans are
+ * also published through the User Timing API (performance.mark/measure) so
+ * they show up in the browser's Performance panel.
+ *
+ * The printer only touches this module when a PrintMetrics session is
+ * attached, so disabled instrumentation costs nothing in the transmit loop.
+ */
+
+export type PrintStage = 'render' | 'rotate' | 'pack' | 'header' | 'block' | 'footer';
+
+export interface PrintProgress {
+  bytesSent: number;
+  totalBytes: number | null; // null when streaming a label of unknown length
+  blockIndex: number;
+  blockCount: number | null;
+  percent: number | null;
+}
+
+export interface LatencyHistogram {
+  bucketBoundsMs: number[]; // Upper bound of each bucket (last is Infinity)
+  counts: number[];
+  count: number;
+  minMs: number;
+  maxMs: number;
+  meanMs: number;
+  p50Ms: number;
+  p95Ms: number;
+}
+
+export interface PrintJobMetrics {
+  jobId: string;
+  startedAt: number;
+  durationMs: number;
+  stagesMs: Partial<Record<PrintStage, number>>;
+  blockDurationsMs: number[];
+  bytesSent: number;
+  bytesPerSecond: number;
+  writeLatency: LatencyHistogram;
+}
+
+export interface PrintMetricsReport {
+  sessionId: string;
+  startedAt: number;
+  generatedAt: number;
+  userAgent: string;
+  jobs: PrintJobMetrics[];
+}
+
+// Write latencies over BLE are typically a few ms to a few hundred ms
+const BUCKET_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, Infinity];
+const MARK_PREFIX = 'phomemo';
+
+/**
+ * Build a latency histogram from raw samples
+ */
+function buildHistogram(samples: number[]): LatencyHistogram {
+  const counts = BUCKET_BOUNDS_MS.map(() => 0);
+  for (const sample of samples) {
+    const bucket = BUCKET_BOUNDS_MS.findIndex(bound => sample <= bound);
+    counts[bucket]++;
+  }
+
+  const sorted = [...samples].sort((a, b) => a - b);
+  const percentile = (p: number) =>
+    sorted.length === 0 ? 0 : sorted[Math.min(sorted.length - 1, Math.floor(p * sorted.length))];
+  const total = samples.reduce((sum, s) => sum + s, 0);
+
+  return {
+    bucketBoundsMs: BUCKET_BOUNDS_MS,
+    counts,
+    count: samples.length,
+    minMs: sorted[0] ?? 0,
+    maxMs: sorted[sorted.length - 1] ?? 0,
+    meanMs: samples.length ? total / samples.length : 0,
+    p50Ms: percentile(0.5),
+    p95Ms: percentile(0.95)
+  };
+}
+
+/**
+ * Metrics for a single print job
+ */
+export class PrintJobRecorder {
+  readonly jobId: string;
+  private readonly startedAt = Date.now();
+  private readonly start = performance.now();
+  private stagesMs: Partial<Record<PrintStage, number>> = {};
+  private blockDurationsMs: number[] = [];
+  private writeSamples: number[] = [];
+  private bytesSent = 0;
+  private finished: PrintJobMetrics | null = null;
+
+  constructor(jobId: string, renderMs?: number) {
+    this.jobId = jobId;
+    if (renderMs !== undefined) {
+      this.stagesMs.render = renderMs;
+    }
+  }
+
+  /**
+   * Start a span; returns a function that ends it and records the duration
+   */
+  begin(stage: PrintStage, index?: number): () => number {
+    const name = `${MARK_PREFIX}:${this.jobId}:${stage}${index !== undefined ? `:${index}` : ''}`;
+    const t0 = performance.now();
+    performance.mark(`${name}:start`);
+
+    return () => {
+      const elapsed = performance.now() - t0;
+      performance.mark(`${name}:end`);
+      performance.measure(name, `${name}:start`, `${name}:end`);
+
+      if (stage === 'block') {
+        this.blockDurationsMs.push(elapsed);
+      }
+      this.stagesMs[stage] = (this.stagesMs[stage] ?? 0) + elapsed;
+      return elapsed;
+    };
+  }
+
+  /**
+   * Record one characteristic write
+   */
+  recordWrite(bytes: number, latencyMs: number): void {
+    this.bytesSent += bytes;
+    this.writeSamples.push(latencyMs);
+  }
+
+  /**
+   * Close the job and compute summary statistics
+   */
+  finish(): PrintJobMetrics {
+    if (this.finished) return this.finished;
+
+    const durationMs = performance.now() - this.start;
+    this.finished = {
+      jobId: this.jobId,
+      startedAt: this.startedAt,
+      durationMs,
+      stagesMs: this.stagesMs,
+      blockDurationsMs: this.blockDurationsMs,
+      bytesSent: this.bytesSent,
+      bytesPerSecond: durationMs > 0 ? (this.bytesSent / durationMs) * 1000 : 0,
+      writeLatency: buildHistogram(this.writeSamples)
+    };
+
+    // Drop the raw User Timing entries, the summary keeps what we need
+    const prefix = `${MARK_PREFIX}:${this.jobId}:`;
+    for (const entry of performance.getEntriesByType('mark')) {
+      if (entry.name.startsWith(prefix)) performance.clearMarks(entry.name);
+    }
+    for (const entry of performance.getEntriesByType('measure')) {
+      if (entry.name.startsWith(prefix)) performance.clearMeasures(entry.name);
+    }
+
+    return this.finished;
+  }
+}
+
+/**
+ * A metrics session collecting every job printed while it is attached
+ */
+export class PrintMetrics {
+  readonly sessionId = crypto.randomUUID();
+  private readonly startedAt = Date.now();
+  private jobs: PrintJobMetrics[] = [];
+  private pendingRenderMs: number | undefined;
+  private jobCounter = 0;
+
+  public onJobComplete?: (job: PrintJobMetrics) => void;
+
+  /**
+   * Time a render of the label; attributed to the next job that starts
+   */
+  async timeRender<T>(render: () => T | Promise<T>): Promise<T> {
+    // Only the latest render stays in the timeline
+    performance.clearMarks(`${MARK_PREFIX}:render:start`);
+    performance.clearMarks(`${MARK_PREFIX}:render:end`);
+    performance.clearMeasures(`${MARK_PREFIX}:render`);
+
+    const t0 = performance.now();
+    performance.mark(`${MARK_PREFIX}:render:start`);
+    try {
+      return await render();
+    } finally {
+      this.pendingRenderMs = performance.now() - t0;
+      performance.mark(`${MARK_PREFIX}:render:end`);
+      performance.measure(`${MARK_PREFIX}:render`, `${MARK_PREFIX}:render:start`, `${MARK_PREFIX}:render:end`);
+    }
+  }
+
+  /**
+   * Start recording a new job
+   */
+  beginJob(): PrintJobRecorder {
+    const job = new PrintJobRecorder(`job${++this.jobCounter}`, this.pendingRenderMs);
+    this.pendingRenderMs = undefined;
+    return job;
+  }
+
+  /**
+   * Store a finished job in the session
+   */
+  endJob(job: PrintJobRecorder): PrintJobMetrics {
+    const metrics = job.finish();
+    this.jobs.push(metrics);
+    this.onJobComplete?.(metrics);
+    return metrics;
+  }
+
+  /**
+   * Get all recorded jobs
+   */
+  getJobs(): PrintJobMetrics[] {
+    return this.jobs;
+  }
+
+  /**
+   * Build the per-session report
+   */
+  getReport(): PrintMetricsReport {
+    return {
+      sessionId: this.sessionId,
+      startedAt: this.startedAt,
+      generatedAt: Date.now(),
+      userAgent: typeof navigator !== 'undefined' ? navigator.userAgent : 'unknown',
+      jobs: this.jobs
+    };
+  }
+
+  /**
+   * Download the session report as a JSON file
+   */
+  downloadReport(): void {
+    const blob = new Blob([JSON.stringify(this.getReport(), null, 2)], { type: 'application/json' });
+    const url = URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = `phomemo-metrics-${new Date(this.startedAt).toISOString().replace(/[:.]/g, '-')}.json`;
+    link.click();
+    // Revoking in the same task can cancel the download before it starts
+    setTimeout(() => URL.revokeObjectURL(url), 1000);
+  }
+}
@@ -0,0 +1,79 @@
+/**
+ * Adaptive print profiles
+ *
+ * Picks print head speed and density per job from its raster coverage:
+ * light text labels print fast at reduced heat, mostly-black labels slow
+ * down so the head and the battery keep up. The table is user-editable so
+ * it can be tuned for a given media roll.
+ */
+
+import { JobCoverage, PrintProfile } from './escpos';
+
+export interface ProfileRule extends PrintProfile {
+  maxCoverage: number; // Used for jobs whose densest block is at most this share of black, 0-1
+}
+
+export const DEFAULT_PROFILE_TABLE: ProfileRule[] = [
+  { name: 'light', maxCoverage: 0.15, speed: 0x05, density: 0x0b },
+  { name: 'normal', maxCoverage: 0.4, speed: 0x04, density: 0x0d },
+  { name: 'heavy', maxCoverage: 1, speed: 0x03, density: 0x0f }
+];
+
+const STORAGE_KEY = 'phomemo-print-profiles';
+
+/**
+ * Pick the first rule (by ascending maxCoverage) that covers the job's densest block
+ */
+export function selectProfile(table: ProfileRule[], coverage: JobCoverage): PrintProfile {
+  const rules = [...table].sort((a, b) => a.maxCoverage - b.maxCoverage);
+  const rule = rules.find(r => coverage.peak <= r.maxCoverage) ?? rules[rules.length - 1];
+  if (!rule) {
+    throw new Error('Print profile table is empty');
+  }
+  return { name: rule.name, speed: rule.speed, density: rule.density };
+}
+
+/**
+ * Profile option for encodeJob that chooses from a table
+ */
+export function createProfileSelector(table: ProfileRule[]): (coverage: JobCoverage) => PrintProfile {
+  return (coverage) => selectProfile(table, coverage);
+}
+
+/**
+ * Check that a parsed table is usable (values in the printer's ranges)
+ */
+export function isValidProfileTable(table: unknown): table is ProfileRule[] {
+  return Array.isArray(table) && table.length > 0 && table.every(rule =>
+    typeof rule?.name === 'string' &&
+    typeof rule.maxCoverage === 'number' && rule.maxCoverage >= 0 && rule.maxCoverage <= 1 &&
+    Number.isInteger(rule.speed) && rule.speed >= 1 && rule.speed <= 5 &&
+    Number.isInteger(rule.density) && rule.density >= 1 && rule.density <= 0x0f
+  );
+}
+
+/**
+ * Get the profile table from localStorage, or the default table
+ */
+export function getProfileTable(): ProfileRule[] {
+  try {
+    const stored = localStorage.getItem(STORAGE_KEY);
+    if (!stored) return DEFAULT_PROFILE_TABLE;
+    const table = JSON.parse(stored);
+    return isValidProfileTable(table) ? table : DEFAULT_PROFILE_TABLE;
+  } catch (error) {
+    console.error('Failed to load print profiles:', error);
+    return DEFAULT_PROFILE_TABLE;
+  }
+}
+
+/**
+ * Save the profile table to localStorage
+ */
+export function saveProfileTable(table: ProfileRule[]): void {
+  try {
+    localStorage.setItem(STORAGE_KEY, JSON.stringify(table));
+  } catch (error) {
+    console.error('Failed to save print profiles:', error);
+  }
+}
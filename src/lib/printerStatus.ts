@@ -0,0 +1,262 @@
+/**
+ * Phomemo D30 status notifications
+ *
+ * The printer reports its state on the 0000ff03 notify characteristic as
+ * 3-byte frames `1a <kind> <value>` (reverse-engineered, see phomemo-tools):
+ *
+ *   1a 04 <n>      battery level (percent)
+ *   1a 05 98/99    cover open / closed
+ *   1a 06 88/89    paper out / loaded
+ *   1a 03 a9/a8    print head overheated / cooled down
+ *   1a 0f 0c       label finished printing
+ *
+ * Single-byte XOFF (0x13) / XON (0x11) are treated as buffer full / ready,
+ * as on serial ESC/POS printers. Unknown frames are ignored.
+ *
+ * The monitor keeps the decoded state and lets the transmit loop wait for
+ * the printer to be ready instead of pacing the raster stream with fixed
+ * delays. Not every firmware sends every frame, so the monitor also tracks
+ * what the printer has actually reported during this connection.
+ */
+
+export interface PrinterState {
+  paperLoaded: boolean | null; // null until the printer has reported it
+  coverOpen: boolean | null;
+  batteryPercent: number | null;
+  overheated: boolean;
+  bufferFull: boolean;
+}
+
+export type StatusEvent =
+  | { type: 'battery'; percent: number }
+  | { type: 'cover'; open: boolean }
+  | { type: 'paper'; loaded: boolean }
+  | { type: 'overheat'; overheated: boolean }
+  | { type: 'buffer'; full: boolean }
+  | { type: 'printed' };
+
+export const STATUS_CHARACTERISTIC_UUID = '0000ff03-0000-1000-8000-00805f9b34fb';
+
+// 1f 11 <query>: ask the printer to report battery, paper and cover state
+export const STATUS_QUERY = new Uint8Array([
+  0x1f, 0x11, 0x08,
+  0x1f, 0x11, 0x11,
+  0x1f, 0x11, 0x12
+]);
+
+const FRAME_START = 0x1a;
+const XON = 0x11;
+const XOFF = 0x13;
+
+/**
+ * Decode a notification payload into status events
+ */
+export function decodeStatusFrames(bytes: Uint8Array): StatusEvent[] {
+  const events: StatusEvent[] = [];
+  let i = 0;
+
+  while (i < bytes.length) {
+    const byte = bytes[i];
+
+    if (byte === XOFF || byte === XON) {
+      events.push({ type: 'buffer', full: byte === XOFF });
+      i += 1;
+      continue;
+    }
+
+    if (byte !== FRAME_START || i + 2 >= bytes.length) {
+      i += 1;
+      continue;
+    }
+
+    const kind = bytes[i + 1];
+    const value = bytes[i + 2];
+    i += 3;
+
+    switch (kind) {
+      case 0x03:
+        if (value === 0xa9 || value === 0xa8) events.push({ type: 'overheat', overheated: value === 0xa9 });
+        break;
+      case 0x04:
+        events.push({ type: 'battery', percent: Math.min(value, 100) });
+        break;
+      case 0x05:
+        if (value === 0x98 || value === 0x99) events.push({ type: 'cover', open: value === 0x98 });
+        break;
+      case 0x06:
+        if (value === 0x88 || value === 0x89) events.push({ type: 'paper', loaded: value === 0x89 });
+        break;
+      case 0x0f:
+        if (value === 0x0c) events.push({ type: 'printed' });
+        break;
+    }
+  }
+
+  return events;
+}
+
+/**
+ * Why the printer cannot take data right now, or null when it is ready
+ */
+export function getBlockedReason(state: PrinterState): string | null {
+  if (state.coverOpen) return 'Cover open';
+  if (state.paperLoaded === false) return 'Out of paper';
+  if (state.overheated) return 'Print head overheated';
+  if (state.bufferFull) return 'Printer buffer full';
+  return null;
+}
+
+interface PrintedWaiter {
+  target: number; // printedCount to wait for
+  resolve: () => void;
+}
+
+export class PrinterStatusMonitor {
+  private characteristic: BluetoothRemoteGATTCharacteristic;
+  private printedWaiters: PrintedWaiter[] = [];
+  private readyWaiters: (() => void)[] = [];
+
+  public hasReported = false; // A status or flow-control frame arrived
+  public confirmsPrinted: boolean | null = null; // Whether the printer sends 1a 0f 0c, null until known
+  public printedCount = 0; // Labels confirmed since connecting
+
+  public state: PrinterState = {
+    paperLoaded: null,
+    coverOpen: null,
+    batteryPercent: null,
+    overheated: false,
+    bufferFull: false
+  };
+  public onChange?: (state: PrinterState) => void;
+
+  constructor(characteristic: BluetoothRemoteGATTCharacteristic) {
+    this.characteristic = characteristic;
+  }
+
+  /**
+   * Subscribe to status notifications
+   */
+  async start(): Promise<void> {
+    this.characteristic.addEventListener('characteristicvaluechanged', this.handleNotification);
+    await this.characteristic.startNotifications();
+  }
+
+  /**
+   * Unsubscribe and release anyone waiting on the printer
+   */
+  stop(): void {
+    this.characteristic.removeEventListener('characteristicvaluechanged', this.handleNotification);
+    this.characteristic.stopNotifications().catch(() => {
+      // Already disconnected
+    });
+    this.resolveAll(this.readyWaiters);
+    this.printedWaiters.splice(0).forEach(waiter => waiter.resolve());
+  }
+
+  /**
+   * Wait until the printer can take more data
+   *
+   * @param timeoutMs - Give up if the printer stays blocked this long
+   * @returns The reason the printer was blocked, or null if it was ready
+   */
+  async waitUntilReady(timeoutMs: number): Promise<string | null> {
+    const reason = getBlockedReason(this.state);
+    if (!reason) return null;
+
+    const timedOut = await this.withTimeout(this.readyWaiters, resolve => resolve, timeoutMs);
+    const stillBlocked = getBlockedReason(this.state);
+    if (timedOut && stillBlocked) {
+      throw new Error(`${stillBlocked}, gave up after ${Math.round(timeoutMs / 1000)}s`);
+    }
+    return reason;
+  }
+
+  /**
+   * Wait for the printer to report that labels have been printed
+   *
+   * A timeout before the first confirmation of the connection marks the
+   * printer as one that does not send them (confirmsPrinted = false).
+   *
+   * @param count - Labels to wait for
+   * @param since - printedCount when the job started, so early confirmations count
+   * @returns false if the confirmations did not arrive within the timeout
+   */
+  async waitForPrinted(timeoutMs: number, count: number = 1, since: number = this.printedCount): Promise<boolean> {
+    const target = since + count;
+    if (this.printedCount >= target) return true;
+
+    const timedOut = await this.withTimeout(this.printedWaiters, resolve => ({ target, resolve }), timeoutMs);
+    if (timedOut && this.printedCount === 0) {
+      this.confirmsPrinted = false;
+    }
+    return !timedOut;
+  }
+
+  private handleNotification = (event: Event): void => {
+    const value = (event.target as BluetoothRemoteGATTCharacteristic).value;
+    if (!value) return;
+
+    const events = decodeStatusFrames(new Uint8Array(value.buffer, value.byteOffset, value.byteLength));
+    if (events.length === 0) return;
+    this.hasReported = true;
+
+    const state = { ...this.state };
+    for (const statusEvent of events) {
+      switch (statusEvent.type) {
+        case 'battery':
+          state.batteryPercent = statusEvent.percent;
+          break;
+        case 'cover':
+          state.coverOpen = statusEvent.open;
+          break;
+        case 'paper':
+          state.paperLoaded = statusEvent.loaded;
+          break;
+        case 'overheat':
+          state.overheated = statusEvent.overheated;
+          break;
+        case 'buffer':
+          state.bufferFull = statusEvent.full;
+          break;
+        case 'printed':
+          this.printedCount++;
+          this.confirmsPrinted = true;
+          for (const waiter of this.printedWaiters.filter(w => w.target <= this.printedCount)) {
+            this.printedWaiters.splice(this.printedWaiters.indexOf(waiter), 1);
+            waiter.resolve();
+          }
+          break;
+      }
+    }
+
+    this.state = state;
+    if (!getBlockedReason(state)) {
+      this.resolveAll(this.readyWaiters);
+    }
+    this.onChange?.(state);
+  };
+
+  private resolveAll(waiters: (() => void)[]): void {
+    waiters.splice(0).forEach(resolve => resolve());
+  }
+
+  /**
+   * Add a waiter and resolve to true if the timeout fired before it was called
+   *
+   * A timed-out waiter is removed from the list so it cannot pile up.
+   */
+  private withTimeout<T>(waiters: T[], makeWaiter: (resolve: () => void) => T, timeoutMs: number): Promise<boolean> {
+    return new Promise<boolean>(settle => {
+      const timer = setTimeout(() => {
+        const index = waiters.indexOf(waiter);
+        if (index >= 0) waiters.splice(index, 1);
+        settle(true);
+      }, timeoutMs);
+      const waiter = makeWaiter(() => {
+        clearTimeout(timer);
+        settle(false);
+      });
+      waiters.push(waiter);
+    });
+  }
+}
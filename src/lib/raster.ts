@@ -0,0 +1,40 @@
+/**
+ * Raster helpers shared by the printer driver and the renderer
+ *
+ * The preview is laid out horizontally, the printer expects the label
+ * rotated 90° clockwise and packed as 1-bit rows (MSB first).
+ */
+
+import { packPixels } from './escpos';
+
+/**
+ * Rotate canvas 90° clockwise for printing
+ * The preview shows horizontal layout, but printer expects vertical (rotated) layout
+ *
+ * @param target - Optional canvas to reuse for the output (resized as needed)
+ */
+export function rotateCanvas(sourceCanvas: HTMLCanvasElement, target?: HTMLCanvasElement): HTMLCanvasElement {
+  // Create a new canvas with swapped dimensions
+  const rotatedCanvas = target ?? document.createElement('canvas');
+  rotatedCanvas.width = sourceCanvas.height;
+  rotatedCanvas.height = sourceCanvas.width;
+
+  const ctx = rotatedCanvas.getContext('2d')!;
+
+  // Translate and rotate 90° clockwise
+  ctx.translate(rotatedCanvas.width / 2, rotatedCanvas.height / 2);
+  ctx.rotate(Math.PI / 2);
+  ctx.drawImage(sourceCanvas, -sourceCanvas.width / 2, -sourceCanvas.height / 2);
+
+  return rotatedCanvas;
+}
+
+/**
+ * Convert canvas to 1-bit monochrome byte array
+ * Each byte represents 8 horizontal pixels (MSB first)
+ */
+export function canvasToBytes(canvas: HTMLCanvasElement): Uint8Array {
+  const ctx = canvas.getContext('2d')!;
+  const imageData = ctx.getImageData(0, 0, canvas.width, canvas.height).data;
+  return packPixels(imageData, canvas.width, canvas.height);
+}
@@ -0,0 +1,186 @@
+/**
+ * Rich text layout: text and inline icons broken into line boxes
+ *
+ * Layout is a pure function of the segments, the font and the decoded
+ * icons, so CanvasRenderer can resolve every icon up front, lay out once
+ * (cached per input) and then paint synchronously.
+ */
+
+import { RichTextSegment } from './types';
+import { DEFAULT_LINE_HEIGHT, FontAt, TextMeasurer } from './textFit';
+
+export interface InlineIcon {
+  image: HTMLImageElement | null; // null if the icon failed to load (painted as a box)
+  scaleFactor: number; // Library-specific visual scale
+}
+
+export type RichTextRun =
+  | { type: 'text'; text: string; x: number; width: number }
+  | { type: 'icon'; icon: InlineIcon; x: number; size: number; drawWidth: number; drawHeight: number };
+
+export interface RichTextLine {
+  runs: RichTextRun[]; // x is relative to the start of the line
+  width: number;
+  ascent: number;
+  descent: number;
+}
+
+export interface RichTextLayout {
+  fontSize: number;
+  lines: RichTextLine[];
+  lineAdvance: number; // Pixels between baselines
+  width: number;
+  height: number; // First line ascent to last line descent
+}
+
+export interface RichTextLayoutOptions {
+  maxWidth?: number; // Wrap at spaces beyond this width (default: no wrapping)
+  maxLines?: number; // Return null when more lines are needed
+  lineHeight?: number; // Line advance as a multiple of font size
+  iconScale?: number; // Multiplier for icon sizes, e.g. when the font size was fitted
+}
+
+type Token =
+  | { kind: 'word'; text: string }
+  | { kind: 'space'; text: string }
+  | { kind: 'break' }
+  | { kind: 'icon'; segment: Extract<RichTextSegment, { type: 'icon' }> };
+
+/**
+ * Split segments into words, spaces, hard line breaks and icons
+ */
+function tokenize(segments: RichTextSegment[]): Token[] {
+  const tokens: Token[] = [];
+
+  for (const segment of segments) {
+    if (segment.type === 'icon') {
+      tokens.push({ kind: 'icon', segment });
+      continue;
+    }
+
+    segment.content.split('\n').forEach((paragraph, i) => {
+      if (i > 0) tokens.push({ kind: 'break' });
+      for (const part of paragraph.split(/( +)/)) {
+        if (part) tokens.push(part.startsWith(' ') ? { kind: 'space', text: part } : { kind: 'word', text: part });
+      }
+    });
+  }
+
+  return tokens;
+}
+
+/**
+ * Lay out rich text into lines
+ *
+ * Words and icons not separated by a space stay on the same line.
+ * Returns null only if maxLines is exceeded; a chunk wider than maxWidth
+ * overflows its line (check layout.width when that matters).
+ */
+export function layoutRichText(
+  measurer: TextMeasurer,
+  segments: RichTextSegment[],
+  icons: Map<string, InlineIcon>,
+  font: FontAt,
+  fontSize: number,
+  options: RichTextLayoutOptions = {}
+): RichTextLayout | null {
+  const maxWidth = options.maxWidth ?? Infinity;
+  const maxLines = options.maxLines ?? Infinity;
+  const iconScale = options.iconScale ?? 1;
+  const emptyLine = measurer.measure(font, ' ', fontSize);
+
+  const lines: RichTextLine[] = [];
+  let line: RichTextLine = { runs: [], width: 0, ascent: 0, descent: 0 };
+  let pendingSpace = 0;
+
+  const endLine = (): boolean => {
+    if (line.runs.length === 0) {
+      line.ascent = emptyLine.ascent;
+      line.descent = emptyLine.descent;
+    }
+    lines.push(line);
+    line = { runs: [], width: 0, ascent: 0, descent: 0 };
+    pendingSpace = 0;
+    return lines.length <= maxLines;
+  };
+
+  const tokens = tokenize(segments);
+  let i = 0;
+
+  while (i < tokens.length) {
+    const token = tokens[i];
+
+    if (token.kind === 'break') {
+      if (!endLine()) return null;
+      i++;
+      continue;
+    }
+
+    if (token.kind === 'space') {
+      pendingSpace += measurer.measure(font, token.text, fontSize).width;
+      i++;
+      continue;
+    }
+
+    // Collect the unbreakable chunk of words and icons starting here
+    const chunk: RichTextRun[] = [];
+    let chunkWidth = 0;
+    let ascent = 0;
+    let descent = 0;
+
+    for (; i < tokens.length; i++) {
+      const part = tokens[i];
+
+      if (part.kind === 'word') {
+        const metrics = measurer.measure(font, part.text, fontSize);
+        chunk.push({ type: 'text', text: part.text, x: chunkWidth, width: metrics.width });
+        chunkWidth += metrics.width;
+        ascent = Math.max(ascent, metrics.ascent);
+        descent = Math.max(descent, metrics.descent);
+      } else if (part.kind === 'icon') {
+        const icon = icons.get(part.segment.iconDef.svg) ?? { image: null, scaleFactor: 1 };
+        const size = (part.segment.size || fontSize) * iconScale;
+
+        // Preserve aspect ratio within the library-scaled box
+        const scaledSize = size * icon.scaleFactor;
+        const aspectRatio = icon.image ? icon.image.width / icon.image.height : 1;
+        const drawWidth = aspectRatio < 1 ? scaledSize * aspectRatio : scaledSize;
+        const drawHeight = aspectRatio > 1 ? scaledSize / aspectRatio : scaledSize;
+
+        chunk.push({ type: 'icon', icon, x: chunkWidth, size, drawWidth, drawHeight });
+        chunkWidth += size;
+
+        // Icons take full height
+        ascent = Math.max(ascent, size * 0.8);
+        descent = Math.max(descent, size * 0.2);
+      } else {
+        break;
+      }
+    }
+
+    // Wrap before the chunk if it does not fit on a line that has content
+    if (line.runs.length > 0 && line.width + pendingSpace + chunkWidth > maxWidth) {
+      if (!endLine()) return null;
+    }
+
+    const offset = line.runs.length > 0 ? line.width + pendingSpace : 0;
+    for (const run of chunk) {
+      line.runs.push({ ...run, x: run.x + offset });
+    }
+    line.width = offset + chunkWidth;
+    line.ascent = Math.max(line.ascent, ascent);
+    line.descent = Math.max(line.descent, descent);
+    pendingSpace = 0;
+  }
+
+  if (!endLine()) return null;
+
+  const lineAdvance = (options.lineHeight ?? DEFAULT_LINE_HEIGHT) * fontSize;
+  return {
+    fontSize,
+    lines,
+    lineAdvance,
+    width: Math.max(...lines.map(l => l.width)),
+    height: lines[0].ascent + (lines.length - 1) * lineAdvance + lines[lines.length - 1].descent
+  };
+}
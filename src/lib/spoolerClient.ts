@@ -0,0 +1,117 @@
+/**
+ * Client for the local print spooler (cli/spooler.ts)
+ *
+ * Subscribes to the spooler's server-sent events and, while the printer
+ * is connected, claims rendered jobs one at a time and sends them to the
+ * printer as-is. Results are reported back so the spooler can record
+ * per-job latency. Jobs go through the PrintCoordinator, so they queue
+ * behind labels printed from any tab and are journaled like them, under
+ * the label and length the spooler sends with each claim.
+ */
+
+import { PrintCoordinator } from './printCoordinator';
+import { JournalJobInfo } from './printJournal';
+import { EncodedJob, parseJob } from './escpos';
+
+export interface SpoolerJobEvent {
+  id: string;
+  state: 'queued' | 'rendering' | 'ready' | 'sending' | 'done' | 'failed' | 'cancelled';
+  error?: string;
+}
+
+export class SpoolerClient {
+  private baseUrl: string;
+  private coordinator: PrintCoordinator;
+  private events: EventSource | null = null;
+  private draining = false;
+
+  public onJob?: (job: SpoolerJobEvent) => void;
+  public onError?: (error: Error) => void;
+
+  constructor(baseUrl: string, coordinator: PrintCoordinator) {
+    this.baseUrl = baseUrl.replace(/\/$/, '');
+    this.coordinator = coordinator;
+  }
+
+  /**
+   * Start listening for jobs
+   */
+  start(): void {
+    this.stop();
+
+    this.events = new EventSource(`${this.baseUrl}/events`);
+    this.events.addEventListener('hello', () => this.drain());
+    this.events.addEventListener('job', (event) => {
+      const job = JSON.parse((event as MessageEvent).data) as SpoolerJobEvent;
+      this.onJob?.(job);
+      if (job.state === 'ready') {
+        this.drain();
+      }
+    });
+    this.events.onerror = () => {
+      this.onError?.(new Error('Lost connection to spooler, retrying...'));
+    };
+  }
+
+  /**
+   * Stop listening; a job already being printed is finished first
+   */
+  stop(): void {
+    this.events?.close();
+    this.events = null;
+  }
+
+  /**
+   * Pull jobs from the spooler until none are ready
+   */
+  async drain(): Promise<void> {
+    if (this.draining) return;
+    this.draining = true;
+
+    try {
+      while (this.events && this.coordinator.status === 'connected') {
+        const response = await fetch(`${this.baseUrl}/claim`, { method: 'POST' });
+        if (response.status === 204) break;
+        if (!response.ok) {
+          throw new Error(`Failed to claim job: ${response.status}`);
+        }
+
+        const id = response.headers.get('X-Job-Id')!;
+        const bytes = new Uint8Array(await response.arrayBuffer());
+
+        let result: { ok: boolean; error?: string };
+        try {
+          const job = parseJob(bytes);
+          await this.coordinator.print(job, this.jobInfo(job, response.headers));
+          result = { ok: true };
+        } catch (error) {
+          result = { ok: false, error: error instanceof Error ? error.message : String(error) };
+        }
+
+        await fetch(`${this.baseUrl}/jobs/${id}/complete`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify(result)
+        });
+      }
+    } catch (error) {
+      this.onError?.(error instanceof Error ? error : new Error(String(error)));
+    } finally {
+      this.draining = false;
+    }
+  }
+
+  /**
+   * Journal info for a claimed job, in print orientation like the editor's
+   */
+  private jobInfo(job: EncodedJob, headers: Headers): JournalJobInfo {
+    const pixelsPerMm = this.coordinator.printer.pixelsPerMm;
+    const label = headers.get('X-Job-Label');
+    const lengthMm = Number(headers.get('X-Job-Length-Mm'));
+    return {
+      label: label ? `Spooler: ${decodeURIComponent(label)}` : 'Spooler job',
+      widthMm: (job.bytesPerRow * 8) / pixelsPerMm,
+      heightMm: lengthMm > 0 ? lengthMm : job.lines / pixelsPerMm
+    };
+  }
+}
@@ -0,0 +1,266 @@
+/**
+ * Fit-to-label text layout
+ *
+ * Finds the largest font size (and, optionally, line breaks) at which a
+ * text fits the printable area of the label. Text is measured once per
+ * (font, string) at a reference size and scaled, since canvas metrics are
+ * linear in font size; after that a solve is a binary search over cached
+ * numbers and is cheap enough to run on every keystroke.
+ */
+
+/**
+ * Builds the CSS font string for a font size, e.g. (s) => `italic 400 ${s}px Inter`
+ */
+export type FontAt = (fontSize: number) => string;
+
+/**
+ * The part of a 2D context the measurer needs (browser or @napi-rs/canvas)
+ */
+export interface MeasureContext {
+  font: string;
+  measureText(text: string): TextMetrics;
+}
+
+export interface TextMeasure {
+  width: number;
+  ascent: number;
+  descent: number;
+}
+
+export interface FitConstraints {
+  maxWidth: number; // Pixels; Infinity when the label grows with its content (auto width)
+  maxHeight: number; // Pixels
+  minFontSize?: number;
+  maxFontSize?: number;
+  maxLines?: number; // > 1 allows breaking at spaces; explicit newlines always break
+  lineHeight?: number; // Line advance as a multiple of font size
+  inlineWidth?: number; // Width of non-text content (icons, gaps) per px of font size
+  inlineHeight?: number; // Height of non-text content per px of font size
+}
+
+/**
+ * Fit constraints for the draw methods; the box defaults to the label canvas
+ */
+export type FitOptions = Partial<FitConstraints>;
+
+export interface FittedText {
+  fontSize: number;
+  lines: string[];
+  width: number; // Including inline content
+  height: number;
+  fits: boolean; // false if even minFontSize overflows
+}
+
+const REFERENCE_SIZE = 100;
+const MAX_CACHE_ENTRIES = 5000;
+export const DEFAULT_MIN_FONT_SIZE = 8;
+export const DEFAULT_MAX_FONT_SIZE = 400;
+export const DEFAULT_LINE_HEIGHT = 1.2;
+
+/**
+ * Measures text at the reference size and caches the result per (font, text)
+ */
+export class TextMeasurer {
+  private ctx: MeasureContext;
+  private cache = new Map<string, TextMeasure>();
+
+  constructor(ctx: MeasureContext) {
+    this.ctx = ctx;
+
+    // Metrics taken with a fallback font are wrong once the web font arrives
+    if (typeof document !== 'undefined' && document.fonts) {
+      document.fonts.addEventListener('loadingdone', () => this.clear());
+    }
+  }
+
+  /**
+   * Metrics of a text at the given font size
+   */
+  measure(font: FontAt, text: string, fontSize: number): TextMeasure {
+    const reference = this.measureReference(font(REFERENCE_SIZE), text);
+    const scale = fontSize / REFERENCE_SIZE;
+    return {
+      width: reference.width * scale,
+      ascent: reference.ascent * scale,
+      descent: reference.descent * scale
+    };
+  }
+
+  clear(): void {
+    this.cache.clear();
+  }
+
+  private measureReference(font: string, text: string): TextMeasure {
+    const key = `${font}\u0000${text}`;
+    const cached = this.cache.get(key);
+    if (cached) return cached;
+
+    const savedFont = this.ctx.font;
+    this.ctx.font = font;
+    const metrics = this.ctx.measureText(text);
+    this.ctx.font = savedFont;
+
+    const measure: TextMeasure = {
+      width: metrics.width,
+      ascent: metrics.actualBoundingBoxAscent || metrics.fontBoundingBoxAscent || REFERENCE_SIZE * 0.8,
+      descent: metrics.actualBoundingBoxDescent || metrics.fontBoundingBoxDescent || REFERENCE_SIZE * 0.2
+    };
+
+    // Drop the oldest entries rather than growing without bound
+    if (this.cache.size >= MAX_CACHE_ENTRIES) {
+      this.cache.delete(this.cache.keys().next().value!);
+    }
+    this.cache.set(key, measure);
+    return measure;
+  }
+}
+
+/**
+ * Break text into lines no wider than maxWidth at a font size
+ *
+ * Words are never split. Returns null if more than maxLines are needed or
+ * a single word is too wide.
+ */
+export function breakLines(
+  measurer: TextMeasurer,
+  text: string,
+  font: FontAt,
+  fontSize: number,
+  maxWidth: number,
+  maxLines: number
+): string[] | null {
+  const paragraphs = text.split('\n');
+  if (paragraphs.length > maxLines) return null;
+
+  // Explicit line breaks only: nothing to decide
+  if (maxLines === paragraphs.length || maxWidth === Infinity) {
+    const fits = paragraphs.every(line => measurer.measure(font, line, fontSize).width <= maxWidth);
+    return fits ? paragraphs : null;
+  }
+
+  const spaceWidth = measurer.measure(font, ' ', fontSize).width;
+  const lines: string[] = [];
+
+  for (const paragraph of paragraphs) {
+    let line = '';
+    let lineWidth = 0;
+
+    for (const word of paragraph.split(' ')) {
+      const wordWidth = measurer.measure(font, word, fontSize).width;
+      if (wordWidth > maxWidth) return null;
+
+      if (line && lineWidth + spaceWidth + wordWidth > maxWidth) {
+        lines.push(line);
+        if (lines.length >= maxLines) return null;
+        line = word;
+        lineWidth = wordWidth;
+      } else {
+        lineWidth += (line ? spaceWidth : 0) + wordWidth;
+        line = line ? `${line} ${word}` : word;
+      }
+    }
+
+    lines.push(line);
+    if (lines.length > maxLines) return null;
+  }
+
+  return lines;
+}
+
+/**
+ * Lay out text at a font size, or return null if it does not fit
+ */
+function layoutAt(
+  measurer: TextMeasurer,
+  text: string,
+  font: FontAt,
+  fontSize: number,
+  constraints: FitConstraints
+): FittedText | null {
+  const inlineWidth = (constraints.inlineWidth ?? 0) * fontSize;
+  const inlineHeight = (constraints.inlineHeight ?? 0) * fontSize;
+  const lineHeight = (constraints.lineHeight ?? DEFAULT_LINE_HEIGHT) * fontSize;
+
+  const lines = breakLines(
+    measurer,
+    text,
+    font,
+    fontSize,
+    constraints.maxWidth - inlineWidth,
+    constraints.maxLines ?? 1
+  );
+  if (!lines) return null;
+
+  // Tight bounds for the text block: first line ascent to last line descent
+  const first = measurer.measure(font, lines[0], fontSize);
+  const last = measurer.measure(font, lines[lines.length - 1], fontSize);
+  const textHeight = first.ascent + (lines.length - 1) * lineHeight + last.descent;
+  const height = Math.max(textHeight, inlineHeight);
+  if (height > constraints.maxHeight) return null;
+
+  const width = Math.max(...lines.map(line => measurer.measure(font, line, fontSize).width)) + inlineWidth;
+  return { fontSize, lines, width, height, fits: true };
+}
+
+/**
+ * Binary-search the largest whole font size for which layoutAt succeeds
+ *
+ * layoutAt must return null when the layout does not fit; fitting is
+ * assumed to be monotonic in font size. Returns null if minFontSize
+ * already does not fit.
+ */
+export function searchFontSize<T>(
+  minFontSize: number,
+  maxFontSize: number,
+  layoutAt: (fontSize: number) => T | null
+): T | null {
+  let lo = minFontSize;
+  let hi = maxFontSize;
+  let best = layoutAt(lo);
+  if (!best) return null;
+
+  while (lo < hi) {
+    const mid = Math.ceil((lo + hi) / 2);
+    const layout = layoutAt(mid);
+    if (layout) {
+      best = layout;
+      lo = mid;
+    } else {
+      hi = mid - 1;
+    }
+  }
+
+  return best;
+}
+
+/**
+ * Find the largest whole font size at which the text fits the constraints
+ */
+export function fitText(
+  measurer: TextMeasurer,
+  text: string,
+  font: FontAt,
+  constraints: FitConstraints
+): FittedText {
+  const minFontSize = constraints.minFontSize ?? DEFAULT_MIN_FONT_SIZE;
+  const best = searchFontSize(
+    minFontSize,
+    constraints.maxFontSize ?? DEFAULT_MAX_FONT_SIZE,
+    (fontSize) => layoutAt(measurer, text, font, fontSize, constraints)
+  );
+
+  if (!best) {
+    // Nothing fits: use the smallest size on as few lines as possible
+    const lines = text.split('\n');
+    const width = Math.max(...lines.map(line => measurer.measure(font, line, minFontSize).width));
+    return {
+      fontSize: minFontSize,
+      lines,
+      width: width + (constraints.inlineWidth ?? 0) * minFontSize,
+      height: lines.length * (constraints.lineHeight ?? DEFAULT_LINE_HEIGHT) * minFontSize,
+      fits: false
+    };
+  }
+
+  return best;
+}
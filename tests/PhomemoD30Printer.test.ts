@@ -0,0 +1,50 @@
+import { after, before, describe, it } from 'node:test';
+import assert from 'node:assert/strict';
+import { countLabels } from '../src/lib/escpos';
+import { PhomemoD30Printer } from '../src/lib/PhomemoD30Printer';
+
+// Just enough of a canvas for rotateCanvas and canvasToBytes; every pixel reads as black
+function fakeCanvas(width: number, height: number): HTMLCanvasElement {
+  const context = {
+    translate() {},
+    rotate() {},
+    drawImage() {},
+    getImageData: (_x: number, _y: number, w: number, h: number) => ({ data: new Uint8ClampedArray(w * h * 4) })
+  };
+  return { width, height, getContext: () => context } as unknown as HTMLCanvasElement;
+}
+
+describe('PhomemoD30Printer.encodeBatch', () => {
+  before(() => {
+    Object.assign(globalThis, { document: { createElement: () => fakeCanvas(0, 0) } });
+  });
+
+  after(() => {
+    Reflect.deleteProperty(globalThis, 'document');
+  });
+
+  it('packs different labels and their copies into one job', () => {
+    // Preview canvases are width (along the tape) x height (print head)
+    const job = new PhomemoD30Printer().encodeBatch(
+      [{ canvas: fakeCanvas(300, 96), copies: 2 }, { canvas: fakeCanvas(40, 120) }],
+      { mediaType: 'continuous', labelGapMm: 2 }
+    );
+
+    // 300 rows split into 255 + 45; each copy and the second label start after a 2 mm feed
+    assert.deepEqual(job.blocks.map(block => block.data.length), [255 * 12, 45 * 12, 255 * 12, 45 * 12, 40 * 15]);
+    assert.deepEqual(
+      job.blocks.map(block => (block.separator ? Array.from(block.separator) : null)),
+      [null, null, [0x1b, 0x64, 16], null, [0x1b, 0x64, 16]]
+    );
+    // Each block marker carries its own label's row width
+    assert.deepEqual(job.blocks.map(block => block.marker[4]), [12, 12, 12, 12, 15]);
+    assert.equal(job.lines, 640);
+    assert.equal(countLabels(job), 3);
+    assert.equal(job.coverage.peak, 1);
+  });
+
+  it('separates labels with a form feed on gapped media', () => {
+    const job = new PhomemoD30Printer().encodeBatch([{ canvas: fakeCanvas(40, 96) }, { canvas: fakeCanvas(40, 96) }]);
+    assert.deepEqual(job.blocks.map(block => (block.separator ? Array.from(block.separator) : null)), [null, [0x0c]]);
+  });
+});
@@ -0,0 +1,216 @@
+import { describe, it } from 'node:test';
+import assert from 'node:assert/strict';
+import {
+  countLabels,
+  DEFAULT_PROFILE,
+  encodeJob,
+  encodeLabels,
+  frameRows,
+  getBlockMarker,
+  getLabelSeparator,
+  jobByteLength,
+  MAX_LINES_PER_BLOCK,
+  packPixels,
+  parseJob,
+  serializeJob
+} from '../src/lib/escpos';
+
+// Packed raster with every byte set to value
+function raster(bytesPerRow: number, lines: number, value = 0x0f): Uint8Array {
+  return new Uint8Array(bytesPerRow * lines).fill(value);
+}
+
+describe('packPixels', () => {
+  it('sets a bit for each dark pixel, MSB first', () => {
+    // 10 x 1: black, white, black, then white; the second byte holds 2 pixels
+    const rgba = new Uint8Array(10 * 4).fill(255);
+    for (const x of [0, 2, 9]) rgba.fill(0, x * 4, x * 4 + 3);
+    assert.deepEqual(Array.from(packPixels(rgba, 10, 1)), [0b10100000, 0b01000000]);
+  });
+});
+
+describe('getBlockMarker', () => {
+  it('encodes width and height little-endian', () => {
+    assert.deepEqual(Array.from(getBlockMarker(0x0130, 200)), [0x1d, 0x76, 0x30, 0x00, 0x30, 0x01, 200, 0x00]);
+  });
+});
+
+describe('encodeJob', () => {
+  it('splits rows into blocks of at most 255 lines', () => {
+    const job = encodeJob(raster(12, 600), 12);
+    assert.deepEqual(job.blocks.map(block => block.data.length / 12), [MAX_LINES_PER_BLOCK, MAX_LINES_PER_BLOCK, 90]);
+    assert.deepEqual(job.blocks.map(block => block.marker[6]), [255, 255, 90]);
+    assert.equal(job.lines, 600);
+  });
+
+  it('rejects a raster that is not whole rows', () => {
+    assert.throws(() => encodeJob(raster(12, 1).subarray(1), 12), /not a multiple/);
+  });
+
+  it('measures coverage and passes it to a profile selector', () => {
+    const job = encodeJob(raster(12, 10, 0xff), 12, {
+      profile: coverage => ({ name: 'picked', speed: 3, density: Math.round(coverage.peak * 10) })
+    });
+    assert.equal(job.coverage.peak, 1);
+    assert.deepEqual(job.profile, { name: 'picked', speed: 3, density: 10 });
+  });
+
+  it('uses the default profile when none is given', () => {
+    const job = encodeJob(raster(12, 10), 12);
+    assert.equal(job.coverage.mean, 0.5);
+    assert.deepEqual(job.profile, DEFAULT_PROFILE);
+  });
+});
+
+describe('frameRows', () => {
+  // Rows numbered by their first byte, delivered in chunks of the given line counts
+  async function* chunks(bytesPerRow: number, sizes: number[]): AsyncGenerator<Uint8Array> {
+    let line = 0;
+    for (const size of sizes) {
+      const chunk = new Uint8Array(size * bytesPerRow);
+      for (let i = 0; i < size; i++) chunk[i * bytesPerRow] = (line++) % 256;
+      yield chunk;
+    }
+  }
+
+  async function frame(bytesPerRow: number, sizes: number[]) {
+    const blocks = [];
+    for await (const block of frameRows(chunks(bytesPerRow, sizes), bytesPerRow)) blocks.push(block);
+    return blocks;
+  }
+
+  it('fills 255-line blocks from chunks that straddle block boundaries', async () => {
+    const blocks = await frame(12, [100, 200, 300, 10]);
+    assert.deepEqual(blocks.map(block => Array.from(block.marker)), [
+      Array.from(getBlockMarker(12, 255)),
+      Array.from(getBlockMarker(12, 255)),
+      Array.from(getBlockMarker(12, 100))
+    ]);
+    assert.deepEqual(blocks.map(block => block.data.length), [255 * 12, 255 * 12, 100 * 12]);
+    // Rows stay in order across chunk and block boundaries
+    assert.deepEqual(blocks.map(block => [block.data[0], block.data[block.data.length - 12]]), [[0, 254], [255, 509 % 256], [510 % 256, 609 % 256]]);
+  });
+
+  it('matches encodeBlocks for the same rows', async () => {
+    const blocks = await frame(12, [255, 1, 254, 50]);
+    const rows = new Uint8Array(blocks.reduce((total, block) => total + block.data.length, 0));
+    let offset = 0;
+    for (const block of blocks) {
+      rows.set(block.data, offset);
+      offset += block.data.length;
+    }
+    const job = encodeJob(rows, 12);
+    assert.deepEqual(blocks.map(block => Array.from(block.marker)), job.blocks.map(block => Array.from(block.marker)));
+  });
+
+  it('yields nothing for an empty stream', async () => {
+    assert.deepEqual(await frame(12, []), []);
+  });
+
+  it('rejects chunks with partial rows', async () => {
+    async function* partial(): AsyncGenerator<Uint8Array> {
+      yield new Uint8Array(18);
+    }
+    await assert.rejects(frameRows(partial(), 12).next(), /not a multiple of 12/);
+  });
+});
+
+describe('serializeJob', () => {
+  it('writes header, each marker and its rows, then the footer', () => {
+    const job = encodeJob(raster(12, 300), 12, { footerMode: 'cut' });
+    const bytes = serializeJob(job);
+    assert.equal(bytes.length, jobByteLength(job));
+
+    let offset = 0;
+    const expect = (part: Uint8Array) => {
+      assert.deepEqual(bytes.subarray(offset, offset + part.length), part);
+      offset += part.length;
+    };
+    expect(job.header);
+    for (const block of job.blocks) {
+      expect(block.marker);
+      expect(block.data);
+    }
+    expect(job.footer);
+    assert.equal(offset, bytes.length);
+  });
+});
+
+describe('parseJob', () => {
+  it('round-trips a serialized job', () => {
+    const job = encodeJob(raster(12, 300), 12, { footerMode: 'cut' });
+    const parsed = parseJob(serializeJob(job));
+
+    assert.deepEqual(parsed.header, job.header);
+    assert.deepEqual(parsed.footer, job.footer);
+    assert.equal(parsed.blocks.length, job.blocks.length);
+    assert.equal(parsed.lines, job.lines);
+    assert.equal(parsed.bytesPerRow, 12);
+    assert.deepEqual(serializeJob(parsed), serializeJob(job));
+  });
+
+  it('reads speed and density back from the header', () => {
+    const job = encodeJob(raster(12, 10), 12, { profile: { name: 'slow', speed: 2, density: 9 } });
+    const { profile } = parseJob(serializeJob(job));
+    assert.equal(profile.speed, 2);
+    assert.equal(profile.density, 9);
+  });
+
+  for (const [mediaType, labelGapMm] of [['gaps', 0], ['continuous', 0], ['continuous', 3]] as const) {
+    it(`keeps label boundaries (${mediaType}, ${labelGapMm} mm gap)`, () => {
+      const job = encodeLabels(
+        [{ raster: raster(12, 300), bytesPerRow: 12, copies: 2 }, { raster: raster(8, 40), bytesPerRow: 8 }],
+        { mediaType, labelGapMm }
+      );
+      const parsed = parseJob(serializeJob(job));
+      assert.equal(countLabels(parsed), 3);
+      assert.deepEqual(
+        parsed.blocks.map(block => block.separator ?? null),
+        job.blocks.map(block => block.separator ?? null)
+      );
+      assert.deepEqual(serializeJob(parsed), serializeJob(job));
+    });
+  }
+
+  it('rejects data without raster blocks', () => {
+    assert.throws(() => parseJob(new Uint8Array([0x1b, 0x40])), /No raster blocks/);
+  });
+
+  it('rejects a truncated block', () => {
+    const bytes = serializeJob(encodeJob(raster(12, 10), 12, { footerMode: 'none' }));
+    assert.throws(() => parseJob(bytes.subarray(0, bytes.length - 1)), /Truncated/);
+  });
+});
+
+describe('encodeLabels', () => {
+  it('repeats copies and separates every further label', () => {
+    const job = encodeLabels([{ raster: raster(12, 300), bytesPerRow: 12, copies: 2 }, { raster: raster(8, 40), bytesPerRow: 8 }]);
+    // 300 lines are two blocks per copy
+    assert.equal(job.blocks.length, 5);
+    assert.deepEqual(job.blocks.map(block => Boolean(block.separator)), [false, false, true, false, true]);
+    assert.equal(job.lines, 640);
+    assert.equal(countLabels(job), 3);
+  });
+
+  it('rejects an empty batch', () => {
+    assert.throws(() => encodeLabels([]), /No labels/);
+  });
+
+  for (const copies of [NaN, Infinity, 0, -1]) {
+    it(`rejects ${copies} copies instead of sending an empty job`, () => {
+      assert.throws(() => encodeJob(raster(12, 10), 12, { copies }), /Invalid copies/);
+    });
+  }
+});
+
+describe('getLabelSeparator', () => {
+  it('feeds to the next label on gapped media', () => {
+    assert.deepEqual(Array.from(getLabelSeparator('gaps')), [0x0c]);
+  });
+
+  it('feeds the gap on continuous media, even when it is zero', () => {
+    assert.deepEqual(Array.from(getLabelSeparator('continuous', 0)), [0x1b, 0x64, 0]);
+    assert.deepEqual(Array.from(getLabelSeparator('continuous', 2.5)), [0x1b, 0x64, 20]);
+    assert.deepEqual(Array.from(getLabelSeparator('continuous', 100)), [0x1b, 0x64, 255]);
+  });
+});
@@ -0,0 +1,192 @@
+import { describe, it } from 'node:test';
+import assert from 'node:assert/strict';
+import { encodeJob, EncodedJob } from '../src/lib/escpos';
+import { PhomemoD30Printer } from '../src/lib/PhomemoD30Printer';
+import { PrintCoordinator } from '../src/lib/printCoordinator';
+import { JournalEntry, JournalJobInfo, PrintJournal } from '../src/lib/printJournal';
+
+const INFO: JournalJobInfo = { label: 'Test', widthMm: 12, heightMm: 40 };
+
+// In-memory stand-in for the IndexedDB journal, with the same state rules
+class FakeJournal {
+  entries = new Map<string, JournalEntry>();
+  completeStored: Promise<void> = Promise.resolve(); // Resolves when a completion is durable
+
+  async enqueue(jobs: { job: EncodedJob; info: JournalJobInfo }[]): Promise<string[]> {
+    return jobs.map(({ job, info }, i) => {
+      const id = `job-${this.entries.size + i}`;
+      this.entries.set(id, {
+        ...info,
+        id,
+        state: 'pending',
+        createdAt: 0,
+        updatedAt: 0,
+        byteLength: 0,
+        blockCount: job.blocks.length,
+        checkpoint: 0
+      });
+      return id;
+    });
+  }
+
+  async get(id: string): Promise<JournalEntry> {
+    const entry = this.entries.get(id);
+    if (!entry) throw new Error(`Unknown journal entry ${id}`);
+    return entry;
+  }
+
+  async begin(id: string): Promise<JournalEntry> {
+    const entry = await this.get(id);
+    entry.state = 'sending';
+    return entry;
+  }
+
+  async checkpoint(id: string, units: number): Promise<void> {
+    const entry = await this.get(id);
+    entry.checkpoint = Math.max(entry.checkpoint, units);
+  }
+
+  async complete(id: string): Promise<void> {
+    await this.completeStored;
+    const entry = await this.get(id);
+    entry.state = 'done';
+  }
+
+  async abandon(id: string): Promise<void> {
+    if ((await this.get(id)).state === 'pending') this.entries.delete(id);
+  }
+}
+
+function createPrinter(connected: boolean) {
+  const printer = new PhomemoD30Printer();
+  const journal = new FakeJournal();
+  const writes: Uint8Array[] = [];
+  printer.journal = journal as unknown as PrintJournal;
+
+  if (connected) {
+    // Stands in for the GATT characteristic connect() would set
+    Object.assign(printer, {
+      characteristic: {
+        writeValueWithResponse: async (data: Uint8Array) => {
+          writes.push(data);
+        }
+      }
+    });
+    printer.status = 'connected';
+  }
+  return { printer, journal, writes };
+}
+
+// Coordinator for a tab on its own (no BroadcastChannel, so no cross-tab traffic)
+function createCoordinator(printer: PhomemoD30Printer): PrintCoordinator {
+  const channel = globalThis.BroadcastChannel;
+  Reflect.deleteProperty(globalThis, 'BroadcastChannel');
+  try {
+    return new PrintCoordinator(printer);
+  } finally {
+    globalThis.BroadcastChannel = channel;
+  }
+}
+
+const label = () => encodeJob(new Uint8Array(12 * 40).fill(0x0f), 12);
+
+describe('PrintCoordinator journaling', () => {
+  it('does not journal a job while disconnected', async () => {
+    const { printer, journal } = createPrinter(false);
+    await assert.rejects(createCoordinator(printer).print(label(), INFO), /Not connected/);
+    assert.equal(journal.entries.size, 0);
+  });
+
+  it('does not journal a job the printer cannot take', async () => {
+    const { printer, journal, writes } = createPrinter(true);
+    printer.printerState = { paperLoaded: true, coverOpen: true, batteryPercent: 80, overheated: false, bufferFull: false };
+
+    await assert.rejects(createCoordinator(printer).print(label(), INFO), /Cover open/);
+    assert.equal(journal.entries.size, 0);
+    assert.equal(writes.length, 0);
+  });
+
+  it('journals a printed job as done', async () => {
+    const { printer, journal, writes } = createPrinter(true);
+    const debug = await createCoordinator(printer).print(label(), INFO);
+
+    const [entry] = journal.entries.values();
+    assert.equal(entry.state, 'done');
+    assert.equal(entry.checkpoint, 2);
+    assert.equal(debug.labels, 1);
+    assert.ok(writes.length > 0);
+  });
+});
+
+describe('PrintCoordinator.printStream', () => {
+  it('waits for queued jobs and is not journaled', async () => {
+    const { printer, journal, writes } = createPrinter(true);
+    const coordinator = createCoordinator(printer);
+    let store!: () => void;
+    journal.completeStored = new Promise(resolve => {
+      store = resolve;
+    });
+
+    let streamStarted = false;
+    async function* rows(): AsyncGenerator<Uint8Array> {
+      streamStarted = true;
+      yield new Uint8Array(12 * 300);
+    }
+
+    const printed = coordinator.print(label(), INFO);
+    const streamed = coordinator.printStream(rows(), 12, 'none');
+    // The first job is sent but not yet done, so the stream must not start
+    await new Promise(resolve => setTimeout(resolve, 500));
+    assert.equal(streamStarted, false);
+
+    const sentBefore = writes.length;
+    store();
+    await printed;
+    const debug = await streamed;
+
+    assert.equal(streamStarted, true);
+    assert.ok(writes.length > sentBefore);
+    assert.equal(debug.canvasHeight, 300);
+    assert.equal(journal.entries.size, 1);
+  });
+});
+
+describe('PhomemoD30Printer journaling', () => {
+  it('drops the entry of a job refused before its first byte', async () => {
+    const { printer, journal } = createPrinter(false);
+    const [id] = await journal.enqueue([{ job: label(), info: INFO }]);
+
+    await assert.rejects(printer.printJob(label(), 12, 40, id), /Not connected/);
+    assert.equal(journal.entries.has(id), false);
+  });
+
+  it('keeps an interrupted entry for resume', async () => {
+    const { printer, journal } = createPrinter(false);
+    const [id] = await journal.enqueue([{ job: label(), info: INFO }]);
+    await journal.begin(id);
+
+    await assert.rejects(printer.printJob(label(), 12, 40, id), /Not connected/);
+    assert.equal(journal.entries.get(id)?.state, 'sending');
+  });
+
+  it('reports a job printed only once its done state is stored', async () => {
+    const { printer, journal } = createPrinter(true);
+    const [id] = await journal.enqueue([{ job: label(), info: INFO }]);
+    let store!: () => void;
+    journal.completeStored = new Promise(resolve => {
+      store = resolve;
+    });
+
+    let settled = false;
+    const printed = printer.printJob(label(), 12, 40, id).then(() => {
+      settled = true;
+    });
+    // Everything is sent well within this time; only the journal write is outstanding
+    await new Promise(resolve => setTimeout(resolve, 500));
+    assert.equal(settled, false);
+
+    store();
+    await printed;
+    assert.equal(journal.entries.get(id)?.state, 'done');
+  });
+});
@@ -0,0 +1,41 @@
+import { describe, it } from 'node:test';
+import assert from 'node:assert/strict';
+import { countLabelsFrom, encodeLabels } from '../src/lib/escpos';
+import { resumeStartBlock } from '../src/lib/printJournal';
+
+// Three labels: 300 lines (blocks 0-1), 40 lines (block 2), 600 lines (blocks 3-5)
+const job = encodeLabels([
+  { raster: new Uint8Array(12 * 300), bytesPerRow: 12 },
+  { raster: new Uint8Array(12 * 40), bytesPerRow: 12 },
+  { raster: new Uint8Array(12 * 600), bytesPerRow: 12 }
+]);
+
+describe('resumeStartBlock', () => {
+  it('starts a job that never sent a block from the beginning', () => {
+    assert.equal(resumeStartBlock(job, 0), 0);
+  });
+
+  // The checkpoint written before block n is n + 1 (write-ahead)
+  for (const [checkpoint, start] of [[1, 0], [2, 0], [3, 2], [4, 3], [5, 3], [6, 3]]) {
+    it(`rewinds checkpoint ${checkpoint} to the first block of its label (${start})`, () => {
+      assert.equal(resumeStartBlock(job, checkpoint), start);
+    });
+  }
+
+  it('resends the last label when the footer was not reached', () => {
+    // Checkpoint blockCount + 1 means the footer was in flight; resumeJob marks those done
+    assert.equal(resumeStartBlock(job, job.blocks.length + 1), 3);
+  });
+});
+
+describe('countLabelsFrom', () => {
+  it('counts the label in progress and every later one', () => {
+    assert.equal(countLabelsFrom(job, 0), 3);
+    assert.equal(countLabelsFrom(job, 2), 2);
+    assert.equal(countLabelsFrom(job, 3), 1);
+  });
+
+  it('counts nothing past the last block', () => {
+    assert.equal(countLabelsFrom(job, job.blocks.length), 0);
+  });
+});
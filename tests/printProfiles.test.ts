@@ -0,0 +1,48 @@
+import { describe, it } from 'node:test';
+import assert from 'node:assert/strict';
+import { JobCoverage } from '../src/lib/escpos';
+import { DEFAULT_PROFILE_TABLE, isValidProfileTable, ProfileRule, selectProfile } from '../src/lib/printProfiles';
+
+function coverage(peak: number): JobCoverage {
+  return { blocks: [peak], mean: peak, peak };
+}
+
+describe('selectProfile', () => {
+  it('picks the first rule that covers the densest block', () => {
+    assert.equal(selectProfile(DEFAULT_PROFILE_TABLE, coverage(0)).name, 'light');
+    assert.equal(selectProfile(DEFAULT_PROFILE_TABLE, coverage(0.15)).name, 'light');
+    assert.equal(selectProfile(DEFAULT_PROFILE_TABLE, coverage(0.3)).name, 'normal');
+    assert.equal(selectProfile(DEFAULT_PROFILE_TABLE, coverage(0.9)).name, 'heavy');
+  });
+
+  it('does not depend on the order of the table', () => {
+    const reversed = [...DEFAULT_PROFILE_TABLE].reverse();
+    assert.deepEqual(selectProfile(reversed, coverage(0.3)), selectProfile(DEFAULT_PROFILE_TABLE, coverage(0.3)));
+  });
+
+  it('uses the densest rule when none covers the job', () => {
+    const table: ProfileRule[] = [
+      { name: 'light', maxCoverage: 0.2, speed: 5, density: 10 },
+      { name: 'medium', maxCoverage: 0.5, speed: 4, density: 12 }
+    ];
+    assert.deepEqual(selectProfile(table, coverage(0.8)), { name: 'medium', speed: 4, density: 12 });
+  });
+
+  it('throws on an empty table', () => {
+    assert.throws(() => selectProfile([], coverage(0.1)), /empty/);
+  });
+});
+
+describe('isValidProfileTable', () => {
+  it('accepts the default table', () => {
+    assert.ok(isValidProfileTable(DEFAULT_PROFILE_TABLE));
+  });
+
+  it('rejects values outside the printer ranges', () => {
+    assert.equal(isValidProfileTable([]), false);
+    assert.equal(isValidProfileTable([{ name: 'x', maxCoverage: 1.5, speed: 5, density: 10 }]), false);
+    assert.equal(isValidProfileTable([{ name: 'x', maxCoverage: 1, speed: 6, density: 10 }]), false);
+    assert.equal(isValidProfileTable([{ name: 'x', maxCoverage: 1, speed: 5, density: 16 }]), false);
+    assert.equal(isValidProfileTable([{ maxCoverage: 1, speed: 5, density: 10 }]), false);
+  });
+});
@@ -0,0 +1,139 @@
+import { describe, it } from 'node:test';
+import assert from 'node:assert/strict';
+import { decodeStatusFrames, getBlockedReason, PrinterState, PrinterStatusMonitor } from '../src/lib/printerStatus';
+
+// Notify characteristic that delivers the bytes passed to notify()
+class FakeCharacteristic extends EventTarget {
+  value: DataView | null = null;
+
+  async startNotifications() {
+    return this;
+  }
+
+  async stopNotifications() {
+    return this;
+  }
+
+  notify(bytes: number[]) {
+    this.value = new DataView(new Uint8Array(bytes).buffer);
+    this.dispatchEvent(new Event('characteristicvaluechanged'));
+  }
+}
+
+async function startMonitor() {
+  const characteristic = new FakeCharacteristic();
+  const monitor = new PrinterStatusMonitor(characteristic as unknown as BluetoothRemoteGATTCharacteristic);
+  await monitor.start();
+  return { characteristic, monitor };
+}
+
+const PRINTED = [0x1a, 0x0f, 0x0c];
+
+describe('decodeStatusFrames', () => {
+  it('decodes each frame kind', () => {
+    assert.deepEqual(decodeStatusFrames(new Uint8Array([
+      0x1a, 0x04, 0x50,
+      0x1a, 0x05, 0x98,
+      0x1a, 0x06, 0x89,
+      0x1a, 0x03, 0xa9,
+      0x1a, 0x0f, 0x0c
+    ])), [
+      { type: 'battery', percent: 80 },
+      { type: 'cover', open: true },
+      { type: 'paper', loaded: true },
+      { type: 'overheat', overheated: true },
+      { type: 'printed' }
+    ]);
+  });
+
+  it('decodes XON/XOFF as buffer state', () => {
+    assert.deepEqual(decodeStatusFrames(new Uint8Array([0x13, 0x11])), [
+      { type: 'buffer', full: true },
+      { type: 'buffer', full: false }
+    ]);
+  });
+
+  it('skips unknown frames, unknown values and trailing bytes', () => {
+    assert.deepEqual(decodeStatusFrames(new Uint8Array([0x00, 0x1a, 0x07, 0x01, 0x1a, 0x05, 0x42, 0x1a, 0x04])), []);
+  });
+
+  it('caps the battery level at 100', () => {
+    assert.deepEqual(decodeStatusFrames(new Uint8Array([0x1a, 0x04, 0xff])), [{ type: 'battery', percent: 100 }]);
+  });
+});
+
+describe('getBlockedReason', () => {
+  const ready: PrinterState = { paperLoaded: null, coverOpen: null, batteryPercent: null, overheated: false, bufferFull: false };
+
+  it('is null until the printer reports a problem', () => {
+    assert.equal(getBlockedReason(ready), null);
+  });
+
+  it('reports the first problem', () => {
+    assert.equal(getBlockedReason({ ...ready, coverOpen: true, paperLoaded: false }), 'Cover open');
+    assert.equal(getBlockedReason({ ...ready, paperLoaded: false }), 'Out of paper');
+    assert.equal(getBlockedReason({ ...ready, bufferFull: true }), 'Printer buffer full');
+  });
+});
+
+describe('PrinterStatusMonitor', () => {
+  it('tracks state from notifications', async () => {
+    const { characteristic, monitor } = await startMonitor();
+    assert.equal(monitor.hasReported, false);
+
+    characteristic.notify([0x1a, 0x04, 0x40, 0x1a, 0x06, 0x88]);
+    assert.equal(monitor.hasReported, true);
+    assert.equal(monitor.state.batteryPercent, 64);
+    assert.equal(monitor.state.paperLoaded, false);
+  });
+
+  it('waits until the printer is ready again', async () => {
+    const { characteristic, monitor } = await startMonitor();
+    characteristic.notify([0x13]);
+
+    const ready = monitor.waitUntilReady(1000);
+    characteristic.notify([0x11]);
+    assert.equal(await ready, 'Printer buffer full');
+  });
+
+  it('gives up when the printer stays blocked', async () => {
+    const { characteristic, monitor } = await startMonitor();
+    characteristic.notify([0x1a, 0x05, 0x98]);
+    await assert.rejects(monitor.waitUntilReady(10), /Cover open/);
+  });
+
+  it('waits for one confirmation per label', async () => {
+    const { characteristic, monitor } = await startMonitor();
+    const since = monitor.printedCount;
+
+    // The first label finishes before anyone waits
+    characteristic.notify(PRINTED);
+    const printed = monitor.waitForPrinted(1000, 3, since);
+    characteristic.notify(PRINTED);
+    characteristic.notify(PRINTED);
+
+    assert.equal(await printed, true);
+    assert.equal(monitor.printedCount, 3);
+    assert.equal(monitor.confirmsPrinted, true);
+  });
+
+  it('marks a printer without confirmations after the first timeout', async () => {
+    const { monitor } = await startMonitor();
+    assert.equal(await monitor.waitForPrinted(10), false);
+    assert.equal(monitor.confirmsPrinted, false);
+  });
+
+  it('keeps trusting confirmations after a later timeout', async () => {
+    const { characteristic, monitor } = await startMonitor();
+    characteristic.notify(PRINTED);
+    assert.equal(await monitor.waitForPrinted(10), false);
+    assert.equal(monitor.confirmsPrinted, true);
+  });
+
+  it('releases waiters when stopped', async () => {
+    const { monitor } = await startMonitor();
+    const printed = monitor.waitForPrinted(60_000);
+    monitor.stop();
+    assert.equal(await printed, true);
+  });
+});
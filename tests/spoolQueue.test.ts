@@ -0,0 +1,183 @@
+import { afterEach, beforeEach, describe, it } from 'node:test';
+import assert from 'node:assert/strict';
+import { appendFile, mkdtemp, readFile, rm } from 'node:fs/promises';
+import { tmpdir } from 'node:os';
+import { join } from 'node:path';
+import { SpoolJob, SpoolQueue, SpoolRetention } from '../cli/spoolQueue';
+
+describe('SpoolQueue', () => {
+  let dir: string;
+
+  beforeEach(async () => {
+    dir = await mkdtemp(join(tmpdir(), 'spool-test-'));
+  });
+
+  afterEach(async () => {
+    await rm(dir, { recursive: true, force: true });
+  });
+
+  async function openQueue(retention?: SpoolRetention): Promise<SpoolQueue> {
+    const queue = new SpoolQueue(dir, retention);
+    await queue.open();
+    return queue;
+  }
+
+  it('keeps jobs and their updates across a restart', async () => {
+    const queue = await openQueue();
+    const job = await queue.add({ tab: 'text', text: 'Hello' });
+    await queue.update(job.id, { state: 'ready', bytes: 42, times: { queuedAt: job.times.queuedAt, renderedAt: 5 } });
+
+    const reopened = await openQueue();
+    const restored = reopened.get(job.id);
+    assert.equal(restored?.state, 'ready');
+    assert.equal(restored?.bytes, 42);
+    assert.equal(restored?.template.text, 'Hello');
+    assert.deepEqual(restored?.times, { queuedAt: job.times.queuedAt, renderedAt: 5 });
+  });
+
+  it('compacts the log to one record per job', async () => {
+    const queue = await openQueue();
+    const job = await queue.add({ tab: 'text', text: 'Hello' });
+    await queue.update(job.id, { state: 'rendering' });
+    await queue.update(job.id, { state: 'ready' });
+
+    await openQueue();
+    const log = (await readFile(join(dir, 'queue.jsonl'), 'utf8')).trim().split('\n');
+    assert.equal(log.length, 1);
+    assert.equal(JSON.parse(log[0]).job.state, 'ready');
+  });
+
+  it('puts interrupted renders back in the queue', async () => {
+    const queue = await openQueue();
+    const rendering = await queue.add({ tab: 'text', text: 'a' });
+    await queue.update(rendering.id, { state: 'rendering' });
+
+    const reopened = await openQueue();
+    assert.equal(reopened.get(rendering.id)?.state, 'queued');
+  });
+
+  it('fails jobs interrupted while sending instead of printing them again', async () => {
+    const queue = await openQueue();
+    const sending = await queue.add({ tab: 'text', text: 'b' });
+    await queue.update(sending.id, { state: 'ready', bytes: 3 });
+    await queue.update(sending.id, { state: 'sending', claimExpiresAt: Date.now() + 1000 });
+
+    const reopened = await openQueue();
+    const job = reopened.get(sending.id);
+    assert.equal(job?.state, 'failed');
+    assert.match(job?.error ?? '', /may have printed/);
+    assert.equal(job?.claimExpiresAt, undefined);
+    assert.equal(typeof job?.times.finishedAt, 'number');
+    assert.equal(reopened.next('ready'), undefined);
+  });
+
+  it('fails claimed jobs whose lease expired', async () => {
+    const queue = await openQueue();
+    const expired = await queue.add({ tab: 'text', text: 'a' });
+    const active = await queue.add({ tab: 'text', text: 'b' });
+    await queue.update(expired.id, { state: 'sending', claimExpiresAt: 1000 });
+    await queue.update(active.id, { state: 'sending', claimExpiresAt: 3000 });
+
+    assert.deepEqual((await queue.expireClaims(2000)).map(job => job.id), [expired.id]);
+    assert.equal(expired.state, 'failed');
+    assert.match(expired.error ?? '', /Claim expired/);
+    assert.equal('claimExpiresAt' in expired, false);
+    assert.equal(active.state, 'sending');
+  });
+
+  it('requeues failed jobs explicitly, and keeps that across a restart', async () => {
+    const queue = await openQueue();
+    const rendered = await queue.add({ tab: 'text', text: 'a' });
+    const unrendered = await queue.add({ tab: 'text', text: 'b' });
+    await queue.update(rendered.id, { state: 'ready', bytes: 3 });
+    await queue.update(rendered.id, { state: 'failed', error: 'Claim expired' });
+    await queue.update(unrendered.id, { state: 'failed', error: 'Render failed' });
+
+    await queue.requeue(rendered.id);
+    await queue.requeue(unrendered.id);
+    await assert.rejects(queue.requeue(rendered.id), /Cannot requeue a job that is ready/);
+
+    const reopened = await openQueue();
+    for (const [id, state] of [[rendered.id, 'ready'], [unrendered.id, 'queued']]) {
+      const job = reopened.get(id);
+      assert.equal(job?.state, state);
+      assert.equal(job?.error, undefined);
+      assert.equal(job?.times.finishedAt, undefined);
+    }
+  });
+
+  it('skips corrupt log lines', async () => {
+    const queue = await openQueue();
+    const job = await queue.add({ tab: 'text', text: 'a' });
+    await appendFile(join(dir, 'queue.jsonl'), '{"type":"upd\n');
+
+    const reopened = await openQueue();
+    assert.deepEqual(reopened.list().map(j => j.id), [job.id]);
+  });
+
+  it('hands out jobs oldest first', async () => {
+    const queue = await openQueue();
+    const first = await queue.add({ tab: 'text', text: 'a' });
+    const second = await queue.add({ tab: 'text', text: 'b' });
+    assert.equal(queue.next('queued')?.id, first.id);
+
+    await queue.update(first.id, { state: 'rendering' });
+    assert.equal(queue.next('queued')?.id, second.id);
+    assert.deepEqual(queue.list('rendering').map(job => job.id), [first.id]);
+  });
+
+  it('rejects updates of unknown jobs', async () => {
+    const queue = await openQueue();
+    await assert.rejects(queue.update('missing', { state: 'done' }), /Unknown job/);
+  });
+
+  it('stores and removes job data', async () => {
+    const queue = await openQueue();
+    const job = await queue.add({ tab: 'text', text: 'a' });
+    await queue.saveData(job.id, new Uint8Array([1, 2, 3]));
+    assert.deepEqual(Array.from(await queue.readData(job.id)), [1, 2, 3]);
+
+    await queue.removeData(job.id);
+    await assert.rejects(queue.readData(job.id));
+  });
+
+  it('stamps when a job finished', async () => {
+    const queue = await openQueue();
+    const job = await queue.add({ tab: 'text', text: 'a' });
+    await queue.update(job.id, { state: 'ready' });
+    assert.equal(job.times.finishedAt, undefined);
+
+    await queue.update(job.id, { state: 'failed', error: 'jam' });
+    assert.equal(typeof job.times.finishedAt, 'number');
+  });
+
+  it('drops the oldest finished jobs beyond the limit, with their data', async () => {
+    const queue = await openQueue({ maxFinished: 2 });
+    const jobs: SpoolJob[] = [];
+    for (const text of ['a', 'b', 'c']) {
+      const job = await queue.add({ tab: 'text', text });
+      await queue.saveData(job.id, new Uint8Array([1]));
+      await queue.update(job.id, { state: 'done' });
+      jobs.push(job);
+    }
+    const waiting = await queue.add({ tab: 'text', text: 'd' });
+
+    assert.equal(await queue.prune(), 1);
+    assert.deepEqual(queue.list().map(job => job.id), [jobs[1].id, jobs[2].id, waiting.id]);
+    await assert.rejects(queue.readData(jobs[0].id));
+
+    const reopened = await openQueue({ maxFinished: 2 });
+    assert.equal(reopened.list().length, 3);
+  });
+
+  it('drops finished jobs older than the retention age', async () => {
+    const queue = await openQueue({ maxAgeMs: 1000 });
+    const job = await queue.add({ tab: 'text', text: 'a' });
+    await queue.update(job.id, { state: 'cancelled' });
+    const queued = await queue.add({ tab: 'text', text: 'b' });
+
+    assert.equal(await queue.prune(job.times.finishedAt! + 500), 0);
+    assert.equal(await queue.prune(job.times.finishedAt! + 2000), 1);
+    assert.deepEqual(queue.list().map(j => j.id), [queued.id]);
+  });
+});
@@ -0,0 +1,65 @@
+import { afterEach, describe, it } from 'node:test';
+import assert from 'node:assert/strict';
+import { encodeJob, serializeJob } from '../src/lib/escpos';
+import { PhomemoD30Printer } from '../src/lib/PhomemoD30Printer';
+import { PrintCoordinator } from '../src/lib/printCoordinator';
+import { JournalJobInfo } from '../src/lib/printJournal';
+import { SpoolerClient } from '../src/lib/spoolerClient';
+
+const fetchBefore = globalThis.fetch;
+
+// Spooler with one ready job, recording what the client reports back
+function serveJob(headers: Record<string, string>) {
+  const completed: unknown[] = [];
+  let claimed = false;
+  globalThis.fetch = (async (url: string, init?: RequestInit) => {
+    if (url.endsWith('/claim')) {
+      if (claimed) return new Response(null, { status: 204 });
+      claimed = true;
+      return new Response(serializeJob(encodeJob(new Uint8Array(12 * 320), 12)), { headers: { 'X-Job-Id': 'job-1', ...headers } });
+    }
+    completed.push(JSON.parse(String(init?.body)));
+    return new Response('{}');
+  }) as typeof fetch;
+  return completed;
+}
+
+// Coordinator that records journal info instead of printing
+function createClient() {
+  const printed: JournalJobInfo[] = [];
+  const coordinator = {
+    status: 'connected',
+    printer: new PhomemoD30Printer(),
+    print: async (_job: unknown, info: JournalJobInfo) => {
+      printed.push(info);
+    }
+  } as unknown as PrintCoordinator;
+
+  const client = new SpoolerClient('http://localhost:8630/', coordinator);
+  // Stands in for the event stream start() would open
+  Object.assign(client, { events: {} });
+  return { client, printed };
+}
+
+describe('SpoolerClient', () => {
+  afterEach(() => {
+    globalThis.fetch = fetchBefore;
+  });
+
+  it('journals claimed jobs under the spooler label and length', async () => {
+    const completed = serveJob({ 'X-Job-Label': encodeURIComponent('Barcode: SKU-ü1'), 'X-Job-Length-Mm': '38.5' });
+    const { client, printed } = createClient();
+
+    await client.drain();
+    assert.deepEqual(printed, [{ label: 'Spooler: Barcode: SKU-ü1', widthMm: 12, heightMm: 38.5 }]);
+    assert.deepEqual(completed, [{ ok: true }]);
+  });
+
+  it('falls back to the raster size without headers', async () => {
+    serveJob({});
+    const { client, printed } = createClient();
+
+    await client.drain();
+    assert.deepEqual(printed, [{ label: 'Spooler job', widthMm: 12, heightMm: 40 }]);
+  });
+});
@@ -0,0 +1,120 @@
+import { describe, it } from 'node:test';
+import assert from 'node:assert/strict';
+import { breakLines, fitText, MeasureContext, searchFontSize, TextMeasurer } from '../src/lib/textFit';
+
+// Monospace stand-in for a canvas: every character is half the font size wide
+function fakeContext(): MeasureContext & { calls: number } {
+  return {
+    font: '10px Test',
+    calls: 0,
+    measureText(text: string) {
+      this.calls++;
+      const size = parseFloat(this.font);
+      return {
+        width: text.length * size * 0.5,
+        actualBoundingBoxAscent: size * 0.7,
+        actualBoundingBoxDescent: size * 0.2
+      } as TextMetrics;
+    }
+  };
+}
+
+const font = (size: number) => `${size}px Test`;
+
+describe('TextMeasurer', () => {
+  it('scales the reference measurement and caches it', () => {
+    const ctx = fakeContext();
+    const measurer = new TextMeasurer(ctx);
+
+    assert.equal(measurer.measure(font, 'abcd', 10).width, 20);
+    assert.equal(measurer.measure(font, 'abcd', 30).width, 60);
+    assert.equal(ctx.calls, 1);
+    assert.equal(ctx.font, '10px Test');
+  });
+});
+
+describe('breakLines', () => {
+  const measurer = new TextMeasurer(fakeContext());
+
+  it('keeps text that fits on one line', () => {
+    assert.deepEqual(breakLines(measurer, 'one two', font, 10, 100, 3), ['one two']);
+  });
+
+  it('breaks at spaces', () => {
+    // 5 px per character: "one two" is 35 px, "three" 25 px
+    assert.deepEqual(breakLines(measurer, 'one two three', font, 10, 40, 3), ['one two', 'three']);
+  });
+
+  it('keeps explicit line breaks', () => {
+    assert.deepEqual(breakLines(measurer, 'one\ntwo three', font, 10, 40, 3), ['one', 'two', 'three']);
+    assert.deepEqual(breakLines(measurer, 'one\ntwo', font, 10, Infinity, 2), ['one', 'two']);
+  });
+
+  it('returns null when the text needs more lines', () => {
+    assert.equal(breakLines(measurer, 'one two three', font, 10, 40, 1), null);
+    assert.equal(breakLines(measurer, 'a\nb\nc', font, 10, 100, 2), null);
+  });
+
+  it('returns null when a word is too wide', () => {
+    assert.equal(breakLines(measurer, 'extraordinary', font, 10, 40, 3), null);
+  });
+});
+
+describe('searchFontSize', () => {
+  it('finds the largest size that fits', () => {
+    const tried: number[] = [];
+    const best = searchFontSize(8, 400, size => {
+      tried.push(size);
+      return size <= 123 ? size : null;
+    });
+    assert.equal(best, 123);
+    assert.ok(tried.length <= 10);
+  });
+
+  it('returns null when the smallest size does not fit', () => {
+    assert.equal(searchFontSize(8, 400, () => null), null);
+  });
+
+  it('returns the largest size when everything fits', () => {
+    assert.equal(searchFontSize(8, 400, size => size), 400);
+  });
+});
+
+describe('fitText', () => {
+  const measurer = new TextMeasurer(fakeContext());
+
+  it('is limited by width on one line', () => {
+    // 10 characters at 0.5 em: font size = maxWidth / 5
+    const fitted = fitText(measurer, 'abcdefghij', font, { maxWidth: 200, maxHeight: 1000 });
+    assert.equal(fitted.fontSize, 40);
+    assert.deepEqual(fitted.lines, ['abcdefghij']);
+    assert.ok(fitted.fits);
+  });
+
+  it('is limited by height', () => {
+    // Ascent + descent is 0.9 em
+    const fitted = fitText(measurer, 'ab', font, { maxWidth: 1000, maxHeight: 90 });
+    assert.equal(fitted.fontSize, 100);
+  });
+
+  it('wraps onto more lines when that allows a larger size', () => {
+    const oneLine = fitText(measurer, 'abcd efgh', font, { maxWidth: 180, maxHeight: 200, maxLines: 1 });
+    const twoLines = fitText(measurer, 'abcd efgh', font, { maxWidth: 180, maxHeight: 200, maxLines: 2 });
+    assert.deepEqual(twoLines.lines, ['abcd', 'efgh']);
+    assert.ok(twoLines.fontSize > oneLine.fontSize);
+    assert.ok(twoLines.height <= 200);
+  });
+
+  it('leaves room for inline content', () => {
+    const fitted = fitText(measurer, 'abcd', font, { maxWidth: 300, maxHeight: 1000, inlineWidth: 1 });
+    // 4 characters at 0.5 em plus 1 em of icon
+    assert.equal(fitted.fontSize, 100);
+    assert.equal(fitted.width, 300);
+  });
+
+  it('falls back to the minimum size when nothing fits', () => {
+    const fitted = fitText(measurer, 'abcdefghij', font, { maxWidth: 10, maxHeight: 1000, minFontSize: 8 });
+    assert.equal(fitted.fontSize, 8);
+    assert.equal(fitted.fits, false);
+  });
+});